@@ -11,13 +11,13 @@
   APP_URL（Streamlit 主站網址，待辦連結指向此處）
 其餘（inbound Token、待辦 API URL/Token）由主站 admin 於「設定」寫入 system_settings，本服務即時讀取。
 """
-import os, json, smtplib, hmac, hashlib, base64, urllib.request
+import os, json, smtplib, hmac, hashlib, base64, urllib.request, threading, time
 from datetime import datetime, date, timedelta
 from email.mime.text import MIMEText
 
 import psycopg2
 from fastapi import FastAPI, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, RedirectResponse
 from pydantic import BaseModel
 from typing import Optional
 
@@ -45,6 +45,12 @@ def _db():
     return c
 
 
+def _notify_cache(cur, table, key=None):
+    """通知主站各實例淘汰該表快取（頻道/格式同 app.py 的 _invalidate_cache）。"""
+    cur.execute("SELECT pg_notify('resume_cache', %s)",
+                (json.dumps({"table": table, "key": key, "origin": "api"}, ensure_ascii=False),))
+
+
 def _get_setting(cur, key):
     cur.execute("SELECT value FROM system_settings WHERE key=%s", (key,))
     r = cur.fetchone()
@@ -125,6 +131,64 @@ def healthz():
     return {"ok": True}
 
 
+# ── logo 靜態資產：網址帶內容雜湊，內容永不變 → immutable 長效快取 ─────────
+# 主站設 LOGO_ASSET_BASE=<本服務>/assets/logo 後，側欄改引用此處，不再每次 rerun 傳 base64。
+# 只留目前這一版；每 LOGO_REFRESH_SEC 秒(預設 30)至多讀一次 DB，與請求帶的雜湊無關，
+# 亂帶雜湊的匿名請求不會打到 DB。換 logo 後最晚一個週期生效。
+_LOGO_REFRESH_SEC = float(os.environ.get("LOGO_REFRESH_SEC", "30"))
+_LOGO_LOCK = threading.Lock()
+_LOGO = {"digest": None, "data": None, "mime": None, "loaded": None}
+
+
+def _logo_digest(raw):
+    """同 app.py：對 system_settings.logo 原值取 sha256 前 16 碼。"""
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _decode_logo(raw):
+    mime = "image/png"
+    if raw.startswith("data:"):
+        head, raw = raw.split(",", 1)
+        mime = head[5:].split(";", 1)[0] or mime
+    return base64.b64decode(raw), mime
+
+
+def _current_logo():
+    """目前 logo 的 (雜湊, bytes, mime)；未設定或為外部網址時雜湊為 None。"""
+    with _LOGO_LOCK:
+        now = time.monotonic()
+        if _LOGO["loaded"] is None or now - _LOGO["loaded"] >= _LOGO_REFRESH_SEC:
+            _LOGO["loaded"] = now   # 讀取失敗也等下個週期再試，沿用上一版
+            conn = None
+            try:
+                conn = _db()
+                raw = str(_get_setting(conn.cursor(), "logo") or "").strip()
+                if len(raw) <= 10 or raw.startswith("http"):
+                    _LOGO.update(digest=None, data=None, mime=None)
+                elif _logo_digest(raw) != _LOGO["digest"]:
+                    data, mime = _decode_logo(raw)
+                    _LOGO.update(digest=_logo_digest(raw), data=data, mime=mime)
+            except Exception:
+                pass
+            finally:
+                if conn is not None:
+                    try: conn.close()
+                    except Exception: pass
+        return _LOGO["digest"], _LOGO["data"], _LOGO["mime"]
+
+
+@app.get("/assets/logo/{digest}")
+def logo_asset(digest: str):
+    current, data, mime = _current_logo()
+    if current is None:
+        return Response(status_code=404, headers={"Cache-Control": "no-cache"})
+    if current != digest:   # 舊雜湊(已換 logo)或本服務尚未刷新：導向目前版本，導向本身不快取
+        return RedirectResponse(f"/assets/logo/{current}", status_code=307,
+                                headers={"Cache-Control": "no-cache"})
+    return Response(content=data, media_type=mime,
+                    headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{digest}"'})
+
+
 @app.post("/api/v1/candidate")
 def create_candidate(payload: Candidate, authorization: str = Header(default="")):
     conn = None
@@ -189,6 +253,8 @@ def create_candidate(payload: Candidate, authorization: str = Header(default="")
                             list(rmap.values()) + [email])
             # 更新邀請人歸屬為本次 PM
             cur.execute("UPDATE users SET creator_email=%s WHERE lower(email)=lower(%s)", (pm_email, email))
+        _notify_cache(cur, "users", email)
+        _notify_cache(cur, "resumes", email)
 
         # 寄邀請信給求職者 + 通知 PM
         base = os.environ.get("APP_URL", "https://lcc-resume-sys-780693737981.asia-east1.run.app/")
@@ -10,19 +10,21 @@ import smtplib
 import io
 import os
 import json
+import threading
+import select
+import shutil
+import types
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import gspread
 from google.oauth2.service_account import Credentials
 import re
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as PDFImage
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from cache_versions import CacheVersions, CACHE_TABLES as _CACHE_TABLES, invalidate
+from pg_conn import pg_conn_kwargs as _pg_conn_kwargs
+from blob_store import make_blob_store, content_key, content_sha256, claim_blob, drop_orphan_blobs
+from resume_pdf import (generate_pdf, render_pdf_file, stamp_signature, _zodiac_of, _lang_summary,
+                        PDF_RENDER_VERSION, PDF_RENDERED_FIELDS)
 
 # --- 1. 系統設定 ---
 st.set_page_config(page_title="聯成電腦 - 人才招募系統", layout="wide", page_icon="📝")
@@ -49,6 +51,8 @@ SENDER_PASSWORD = ""
 
 # Logo URL
 LOGO_URL = "https://www.lccnet.com.tw/lccnet/img/nav-logo.png"
+# logo 靜態資產網址前綴(lcc-resume-api 的 /assets/logo)，設定後側欄改引用 {前綴}/{內容雜湊}，瀏覽器長效快取
+LOGO_ASSET_BASE = os.environ.get("LOGO_ASSET_BASE", "").strip().rstrip("/")
 
 # 應徵來源選單（管理系統對應圖二）
 SOURCE_OPTS = ["", "104", "Career", "1111", "yes123", "就業e網", "青年職場",
@@ -59,23 +63,6 @@ LANG_OPTS = ["", "英文", "日文", "韓文", "西班牙文", "法文", "德文
              "印尼文", "馬來文", "俄文", "義大利文", "葡萄牙文", "阿拉伯文", "印地文"]
 LANG_LEVELS = ["", "優", "普通", "略通"]
 
-# 星座（依生日自動對應）；每列 = (月, 該星座起始日, 該月開始的星座)
-_ZODIAC = [(1, 20, "水瓶座"), (2, 19, "雙魚座"), (3, 21, "牡羊座"), (4, 20, "金牛座"),
-           (5, 21, "雙子座"), (6, 22, "巨蟹座"), (7, 23, "獅子座"), (8, 23, "處女座"),
-           (9, 23, "天秤座"), (10, 24, "天蠍座"), (11, 22, "射手座"), (12, 22, "摩羯座")]
-
-def _zodiac_of(d):
-    """由生日(date 或 YYYY-MM-DD 字串)推算星座；無法判定回傳空字串。
-    當日 >= 該月星座起始日 → 該月星座；否則 → 前一個月的星座。"""
-    try:
-        if not isinstance(d, (date, datetime)):
-            d = pd.to_datetime(str(d))
-        m, day = int(d.month), int(d.day)
-    except Exception:
-        return ""
-    _, start_day, name = _ZODIAC[m - 1]
-    return name if day >= start_day else _ZODIAC[m - 2][2]
-
 def _org_label(u):
     """組織單位 → 顯示字串，例：行政群 / 行銷部 / 企劃處、北一區 / 館前。"""
     return " / ".join([p for p in (u.get("l1", ""), u.get("l2", ""), u.get("l3", "")) if str(p).strip()])
@@ -89,16 +76,6 @@ def _org_options(kind_group):
         out += [_org_label(u) for u in sys.get_org_units(k) if _org_label(u)]
     return out
 
-def _lang_summary(data):
-    """語言能力 3 組 → 顯示字串，例：英文(優)、日文(普通)。"""
-    parts = []
-    for i in (1, 2, 3):
-        lg = str(data.get(f'lang_{i}', '') or '').strip()
-        lv = str(data.get(f'lang_{i}_level', '') or '').strip()
-        if lg:
-            parts.append(f"{lg}({lv})" if lv else lg)
-    return "、".join(parts)
-
 def _ym_picker(container, label, saved, key_prefix, min_year=1950, future_years=6):
     """年/月下拉選單，回傳 'YYYY/MM'（未選完整回傳 ''）。取代純手打的 YYYY/MM 文字框。"""
     years = [""] + [str(y) for y in range(date.today().year + future_years, min_year - 1, -1)]
@@ -121,6 +98,14 @@ def _ym_picker(container, label, saved, key_prefix, min_year=1950, future_years=
         return str(saved).strip()
     return ""
 
+def _next_month(ym):
+    """'YYYY-MM' → 下個月 'YYYY-MM'(月份區間上界用)；格式不符回傳 None。"""
+    m = re.fullmatch(r"(\d{4})-(\d{2})", str(ym or "").strip())
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        return None
+    y, mo = int(m.group(1)), int(m.group(2))
+    return f"{y + mo // 12:04d}-{mo % 12 + 1:02d}"
+
 # 分公司區域資料
 BRANCH_DATA = {
     "北一區": ["館前", "公館", "忠孝", "士林", "基隆", "羅東"],
@@ -172,116 +157,445 @@ def _gcp_creds_dict():
 # 機密一律純讀 os.environ（Playbook 踩雷#5：勿用會 fallback st.secrets 的 helper）。
 try:
     import psycopg2 as _psycopg2
+    import psycopg2.extras as _pgextras
     _PSYCOPG2_OK = True
 except ImportError:
     _PSYCOPG2_OK = False
 
-def _pg_conn_kwargs():
-    user = os.environ.get("PG_USER", "resume_app")
-    password = os.environ.get("PG_PASSWORD", "")
-    dbname = os.environ.get("PG_DB", "resume")
-    conn_name = os.environ.get("PG_CONNECTION_NAME") or os.environ.get("INSTANCE_CONNECTION_NAME")
-    host = os.environ.get("PG_HOST")
-    port = int(os.environ.get("PG_PORT", "5432"))
-    if host:            # 本機：Cloud SQL Auth Proxy(TCP)
-        return dict(host=host, port=port, dbname=dbname, user=user, password=password)
-    if conn_name:       # Cloud Run：unix socket /cloudsql/<connection_name>
-        return dict(host=f"/cloudsql/{conn_name}", dbname=dbname, user=user, password=password)
-    return dict(host="127.0.0.1", port=port, dbname=dbname, user=user, password=password)
+class _PGPool:
+    """有上限的執行緒安全連線池（取代單一共用連線）。
+    get_db() 是 cache_resource 單例，同一 instance 的所有 session 執行緒共用它；
+    每次 exec 借一條連線、用完歸還，同時最多 maxconn 條，滿了排隊等並記錄等待時間。
+    借出前做健康檢查（已斷線、或閒置超過 ping_after 秒且 SELECT 1 失敗 → 丟棄換新），
+    取代舊的「OperationalError 斷線重連再試一次」。"""
+    def __init__(self, minconn=1, maxconn=8, timeout=30.0, ping_after=30.0):
+        self.maxconn = max(int(maxconn), int(minconn), 1)
+        self.timeout = float(timeout); self.ping_after = float(ping_after)
+        self._idle = []                      # [(conn, 歸還時間)]；LIFO，優先重用最近用過的連線
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._open = 0
+        self.stats = {"checkouts": 0, "waited": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0,
+                      "timeouts": 0, "replaced": 0, "broken": 0}
+        for _ in range(min(int(minconn), self.maxconn)):
+            self._idle.append((self._new(), time.monotonic()))
+
+    def _new(self):
+        conn = _psycopg2.connect(**_pg_conn_kwargs())
+        conn.autocommit = True
+        with self._lock: self._open += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock: self._open -= 1
+        try: conn.close()
+        except Exception: pass
+
+    def _healthy(self, conn, idle_since):
+        if conn.closed: return False
+        if time.monotonic() - idle_since < self.ping_after: return True
+        try:
+            with conn.cursor() as cur: cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self._new()
+            conn, idle_since = item
+            if self._healthy(conn, idle_since):
+                return conn
+            self._discard(conn)
+            with self._lock: self.stats["replaced"] += 1
+
+    def _checkin(self, conn):
+        try:
+            if not conn.closed and conn.get_transaction_status() != _psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()   # 殘留交易一律回滾再歸還
+            if not conn.closed: conn.autocommit = True
+        except Exception:
+            pass
+        if conn.closed:
+            self._discard(conn); return
+        with self._lock: self._idle.append((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        t0 = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock: self.stats["timeouts"] += 1
+            raise RuntimeError(f"PG 連線池已滿（{self.maxconn} 條），等待逾時 {self.timeout:.0f} 秒")
+        conn = None
+        try:
+            waited = (time.monotonic() - t0) * 1000
+            conn = self._checkout()
+            with self._lock:
+                s = self.stats
+                s["checkouts"] += 1; s["wait_total_ms"] += waited
+                if waited >= 1: s["waited"] += 1
+                s["wait_max_ms"] = max(s["wait_max_ms"], waited)
+            yield conn
+        except (_psycopg2.OperationalError, _psycopg2.InterfaceError):
+            if conn is not None:               # 連線層錯誤：這條不歸還，下次借出自動換新
+                self._discard(conn); conn = None
+                with self._lock: self.stats["broken"] += 1
+            raise
+        finally:
+            if conn is not None: self._checkin(conn)
+            self._slots.release()
+
+    def snapshot(self):
+        """連線池指標（供設定頁診斷顯示）。"""
+        with self._lock:
+            s = dict(self.stats)
+            s.update(max=self.maxconn, open=self._open, idle=len(self._idle))
+        s["in_use"] = s["open"] - s["idle"]
+        s["wait_avg_ms"] = round(s["wait_total_ms"] / s["checkouts"], 2) if s["checkouts"] else 0.0
+        s["wait_total_ms"] = round(s["wait_total_ms"], 1); s["wait_max_ms"] = round(s["wait_max_ms"], 1)
+        return s
+
+def _pg_pool_settings():
+    """連線池大小/逾時（純讀 os.environ）：PG_POOL_MIN / PG_POOL_MAX / PG_POOL_TIMEOUT / PG_POOL_PING_AFTER。"""
+    return dict(minconn=int(os.environ.get("PG_POOL_MIN", "1")),
+                maxconn=int(os.environ.get("PG_POOL_MAX", "8")),
+                timeout=float(os.environ.get("PG_POOL_TIMEOUT", "30")),
+                ping_after=float(os.environ.get("PG_POOL_PING_AFTER", "30")))
 
 class _Cell:
     def __init__(self, row, col, value=""):
         self.row = row; self.col = col; self.value = value
 
+# --- PG schema 版本化遷移 ---
+# 取代每次冷啟動都跑的 ~25 條自癒 DDL：schema_migrations 記已套用版本，啟動時一條 SELECT 比對，
+# 落後才在 advisory lock 下依序補跑（多個 instance 同時冷啟動只有一台執行 DDL，其餘等鎖後發現已最新即跳過）。
+# 新的 schema 變更 = 在 _PG_MIGRATIONS 尾端加一筆 (版本, 說明, 函式)；版本號只增不改，已上線的函式不可再改。
+_PG_MIGRATION_LOCK = 7_316_001   # pg_advisory_lock 鍵（固定值，僅本系統使用）
+_CACHE_CHANNEL = "resume_cache"                        # 快取失效 NOTIFY 頻道(api.py 同名)
+_INSTANCE_ID = f"{os.getpid()}-{os.urandom(4).hex()}"   # 辨識自己發出的 NOTIFY
+
+def _mig_add_columns(cur, table, coldefs):
+    """對既有表補欄(IF NOT EXISTS)；表尚未建立(schema 由搬遷腳本建)就略過，不讓整批遷移失敗。"""
+    cur.execute("SELECT to_regclass(%s)", (f'public."{table}"',))
+    if cur.fetchone()[0] is None:
+        return
+    for col, ddl in coldefs:
+        cur.execute(f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS {col} {ddl}')
+
+def _m001_baseline(cur):
+    """原 PGBackend.__init__ 的自癒 DDL 收斂為第 1 版（全為 IF NOT EXISTS，已上線的 DB 套用即 no-op）。"""
+    for t in ("users", "resumes", "system_settings"):   # _rn：PG 無天然列序，全部 ORDER BY _rn
+        _mig_add_columns(cur, t, [("_rn", "BIGSERIAL")])
+    # 簽名/到職文件/求職條件/語言能力/星座/面試單位/管理系統求職者編號/需求單編號/線上面試/代號
+    _mig_add_columns(cur, "resumes", [(c, "TEXT NOT NULL DEFAULT ''") for c in (
+        "signature", "signed_at", "docs_enabled", "docs_submitted_at", "top3_conditions",
+        "lang_1", "lang_1_level", "lang_2", "lang_2_level", "lang_3", "lang_3_level",
+        "zodiac", "interview_unit", "mgmt_cand_no", "req_no", "online_interview", "cand_code")])
+    # 人員管理欄
+    _mig_add_columns(cur, "users", [("emp_id", "TEXT NOT NULL DEFAULT ''"), ("unit", "TEXT NOT NULL DEFAULT ''"),
+                                    ("active", "TEXT NOT NULL DEFAULT 'Y'")])
+    # 到職文件表：檔案存 bytea，量小、免另建 GCS
+    cur.execute('''CREATE TABLE IF NOT EXISTS onboarding_docs (
+        id BIGSERIAL PRIMARY KEY, email TEXT NOT NULL, category TEXT NOT NULL,
+        slot INT NOT NULL DEFAULT 1, filename TEXT NOT NULL DEFAULT '',
+        mime TEXT NOT NULL DEFAULT '', data BYTEA NOT NULL,
+        uploaded_at TIMESTAMPTZ NOT NULL DEFAULT now())''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_onboarding_email ON onboarding_docs(email)')
+    # 公司組織架構（admin 可維護）：一列 = 一個單位路徑
+    #   HQ        l1=群 / l2=部(可空，處可直屬群) / l3=處(可空)
+    #   Branch    l1=群 / l2=區域 / l3=分公司
+    #   Standalone 獨立單位(總經理室/董事長室)，只用 l3
+    cur.execute('''CREATE TABLE IF NOT EXISTS org_units (
+        id BIGSERIAL PRIMARY KEY,
+        kind TEXT NOT NULL DEFAULT 'HQ',
+        l1 TEXT NOT NULL DEFAULT '',
+        l2 TEXT NOT NULL DEFAULT '',
+        l3 TEXT NOT NULL DEFAULT '',
+        sort_order INT NOT NULL DEFAULT 0
+    )''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_org_kind ON org_units(kind, sort_order, id)')
+    # 首次建立時灌入預設組織（之後由 admin 於「設定」分頁維護，不再覆寫）
+    cur.execute('SELECT count(*) FROM org_units')
+    if cur.fetchone()[0] == 0:
+        seed = []
+        for n in ["行銷部", "技服部", "財務部", "人資部", "總務部", "招生部", "資教部"]:
+            seed.append(("HQ", "", n, ""))
+        for n in ["行政群", "電腦群", "數位群", "行銷群"]:
+            seed.append(("HQ", n, "", ""))
+        for n in ["總經理室", "董事長室"]:
+            seed.append(("Standalone", "", "", n))
+        for _reg, _brs in BRANCH_DATA.items():
+            for _b in _brs:
+                seed.append(("Branch", "", _reg, _b))
+        cur.executemany('INSERT INTO org_units (kind,l1,l2,l3,sort_order) VALUES (%s,%s,%s,%s,%s)',
+                        [(k, a, b, c, i) for i, (k, a, b, c) in enumerate(seed)])
+    # 待辦通知對照：記 (求職者, 事件) → 管理系統回傳的 TodoId，供日後取消
+    cur.execute('''CREATE TABLE IF NOT EXISTS todo_refs (
+        cand_email TEXT NOT NULL, event TEXT NOT NULL,
+        todo_id BIGINT NOT NULL, pm_email TEXT NOT NULL DEFAULT '',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (cand_email, event))''')
+
+def _sig_png_bytes(b64):
+    """簽名 base64(可含 data:image/png;base64, 前綴) → PNG bytes；空字串/壞資料回 None。"""
+    b64 = str(b64 or '').strip()
+    if not b64: return None
+    try:
+        return base64.b64decode(b64.split(',', 1)[1] if b64.startswith('data:') else b64)
+    except Exception:
+        return None
+
+def _m002_resume_signatures(cur):
+    """手寫簽名搬出 resumes：另存 resume_signatures(bytea)，resumes.signature 清空。
+    resumes 列回到純文字欄，列表/快取/PDF 快取 key 不再夾帶數十 KB 的 base64。"""
+    cur.execute('''CREATE TABLE IF NOT EXISTS resume_signatures (
+        email TEXT PRIMARY KEY, png BYTEA NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now())''')
+    cur.execute("SELECT to_regclass('resumes') IS NOT NULL")
+    if not cur.fetchone()[0]: return
+    cur.execute("SELECT email, signature FROM resumes WHERE signature <> ''")
+    moved = [(em, png) for em, png in ((r[0], _sig_png_bytes(r[1])) for r in cur.fetchall()) if em and png]
+    if moved:
+        cur.executemany('INSERT INTO resume_signatures (email, png) VALUES (%s, %s) '
+                        'ON CONFLICT (email) DO UPDATE SET png = EXCLUDED.png, updated_at = now()',
+                        [(em, _psycopg2.Binary(png)) for em, png in moved])
+    cur.execute("UPDATE resumes SET signature = '' WHERE signature <> ''")
+
+def _create_index_concurrently(cur, name, on, unique=False):
+    """CREATE INDEX CONCURRENTLY(建索引期間不擋寫入)；須在 autocommit 連線執行。
+    上次中斷留下的 INVALID 同名索引先刪除再重建，IF NOT EXISTS 才不會把它當成已建好。"""
+    cur.execute("SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = %s", (name,))
+    r = cur.fetchone()
+    if r and r[0]:
+        cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    cur.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {on}')
+
+def _m003_access_indexes(cur):
+    """依實際查詢建索引：api.py/刪除/交接以 lower(email) 查、PM 列表依 creator_email+created_at、
+    表單管理依 status、待辦通知依 emp_id、到職文件依 email 列出並排序。
+    lower(email) 若已有大小寫重複的舊資料則退為一般索引(不讓遷移失敗)，清理後可手動改 UNIQUE。
+    大表建索引不鎖寫入：以 CONCURRENTLY 建立，本版列在 _PG_AUTOCOMMIT_MIGRATIONS(不包交易)。"""
+    for t in ("users", "resumes"):
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (t,))
+        if not cur.fetchone()[0]: continue
+        cur.execute(f'SELECT 1 FROM "{t}" GROUP BY lower(email) HAVING count(*) > 1 LIMIT 1')
+        _create_index_concurrently(cur, f"idx_{t}_email_lower", f'"{t}" (lower(email))',
+                                   unique=cur.fetchone() is None)
+        if t == "users":
+            _create_index_concurrently(cur, "idx_users_creator_created", "users (creator_email, created_at)")
+            _create_index_concurrently(cur, "idx_users_emp_id", "users (emp_id)")
+        else:
+            _create_index_concurrently(cur, "idx_resumes_status", "resumes (status)")
+    # 取代只有 email 的舊索引：docs_list 依 email 篩、依 category/slot/id 排序
+    _create_index_concurrently(cur, "idx_onboarding_email_cat", "onboarding_docs (email, category, slot, id)")
+    cur.execute('DROP INDEX CONCURRENTLY IF EXISTS idx_onboarding_email')
+
+_DELTA_TABLES = ("users", "resumes", "system_settings")
+
+def _m004_change_seq(cur):
+    """列異動序號：全域 row_change_seq，INSERT/UPDATE 由 trigger 蓋上 _seq；DELETE 記 _row_tombstones。
+    load_df 據此只撈上次快照之後異動/刪除的列(增量刷新)，不必整表重讀。"""
+    cur.execute('CREATE SEQUENCE IF NOT EXISTS row_change_seq')
+    cur.execute('''CREATE TABLE IF NOT EXISTS _row_tombstones (
+        tbl TEXT NOT NULL, rn BIGINT NOT NULL,
+        _seq BIGINT NOT NULL DEFAULT nextval('row_change_seq'),
+        deleted_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (tbl, rn))''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_seq ON _row_tombstones (tbl, _seq)')
+    cur.execute('''CREATE OR REPLACE FUNCTION _stamp_row_seq() RETURNS trigger AS $$
+        BEGIN NEW._seq := nextval('row_change_seq'); RETURN NEW; END $$ LANGUAGE plpgsql''')
+    cur.execute('''CREATE OR REPLACE FUNCTION _record_row_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO _row_tombstones (tbl, rn) VALUES (TG_TABLE_NAME, OLD._rn)
+            ON CONFLICT (tbl, rn) DO UPDATE SET _seq = nextval('row_change_seq'), deleted_at = now();
+            RETURN OLD;
+        END $$ LANGUAGE plpgsql''')
+    for t in _DELTA_TABLES:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (t,))
+        if not cur.fetchone()[0]: continue
+        _mig_add_columns(cur, t, [("_seq", "BIGINT NOT NULL DEFAULT nextval('row_change_seq')")])
+        cur.execute(f'CREATE INDEX IF NOT EXISTS idx_{t}_seq ON "{t}" (_seq)')
+        cur.execute(f'DROP TRIGGER IF EXISTS trg_{t}_seq ON "{t}"')
+        cur.execute(f'CREATE TRIGGER trg_{t}_seq BEFORE INSERT OR UPDATE ON "{t}" '
+                    f'FOR EACH ROW EXECUTE FUNCTION _stamp_row_seq()')
+        cur.execute(f'DROP TRIGGER IF EXISTS trg_{t}_tomb ON "{t}"')
+        cur.execute(f'CREATE TRIGGER trg_{t}_tomb AFTER DELETE ON "{t}" '
+                    f'FOR EACH ROW EXECUTE FUNCTION _record_row_tombstone()')
+
+def _m005_pdf_cache(cur):
+    """履歷 PDF 持久快取：依內容雜湊存 bytea，各實例共用、擴縮不流失；依 last_used 做容量上限 LRU 淘汰。
+    email 只供刪除帳號時一併清除該求職者的 PDF。"""
+    cur.execute('''CREATE TABLE IF NOT EXISTS pdf_cache (
+        digest TEXT PRIMARY KEY, email TEXT NOT NULL DEFAULT '', pdf BYTEA NOT NULL, size INT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        last_used TIMESTAMPTZ NOT NULL DEFAULT now())''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_pdf_cache_last_used ON pdf_cache (last_used)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_pdf_cache_email ON pdf_cache (lower(email))')
+
+def _m006_doc_blobs(cur):
+    """到職文件 bytes 搬出 onboarding_docs：改記 storage_key(blob_store 定址)，data 改可為 NULL(舊列搬移前仍讀 data)。
+    doc_blobs 為未設 BLOB_DIR 時 PGBlobStore 的存放表。"""
+    _mig_add_columns(cur, "onboarding_docs", [("storage_key", "TEXT NOT NULL DEFAULT ''"),
+                                              ("size", "INT NOT NULL DEFAULT 0")])
+    cur.execute('ALTER TABLE onboarding_docs ALTER COLUMN data DROP NOT NULL')
+    cur.execute('UPDATE onboarding_docs SET size = octet_length(data) WHERE size = 0 AND data IS NOT NULL')
+    cur.execute('''CREATE TABLE IF NOT EXISTS doc_blobs (
+        key TEXT PRIMARY KEY, data BYTEA NOT NULL, size INT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now())''')
+
+def _m007_doc_sha256(cur):
+    """到職文件內容定址：sha256 欄(docs_list 帶出供上傳前查重)、storage_key 索引(引用計數查詢)。
+    仍在 data 的舊列直接補雜湊；已搬出的舊式隨機 key 列由 blob_store.py migrate-docs 補。"""
+    _mig_add_columns(cur, "onboarding_docs", [("sha256", "TEXT NOT NULL DEFAULT ''")])
+    cur.execute("UPDATE onboarding_docs SET sha256 = encode(sha256(data), 'hex') WHERE sha256 = '' AND data IS NOT NULL")
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_onboarding_storage_key ON onboarding_docs (storage_key)')
+
+_PG_MIGRATIONS = [
+    (1, "baseline: self-heal columns, onboarding_docs, org_units, todo_refs", _m001_baseline),
+    (2, "move handwritten signatures into resume_signatures", _m002_resume_signatures),
+    (3, "indexes: lower(email), creator_email+created_at, status, emp_id, onboarding_docs", _m003_access_indexes),
+    (4, "row change sequence (_seq) + tombstones for delta refresh", _m004_change_seq),
+    (5, "persistent content-addressed pdf_cache", _m005_pdf_cache),
+    (6, "onboarding_docs storage_key + doc_blobs (document bytes out of the metadata table)", _m006_doc_blobs),
+    (7, "onboarding_docs sha256 + storage_key index (content-addressed documents)", _m007_doc_sha256),
+]
+# 不包交易、以 autocommit 執行的版本(CREATE INDEX CONCURRENTLY 不能在交易內)；每句各自生效，
+# 函式須可重跑(IF NOT EXISTS)，全部成功才記版本。
+_PG_AUTOCOMMIT_MIGRATIONS = {3}
+
 class PGBackend:
-    """psycopg2 連線；autocommit（每句即時寫入，語意同 Sheets 逐格寫）。斷線自動重連一次。"""
+    """psycopg2 連線池；autocommit（每句即時寫入，語意同 Sheets 逐格寫）。
+    每次 exec 從 _PGPool 借連線，多個 session 執行緒可同時查詢、不再共用單一連線排隊。
+    啟動時先跑 migrate()(已最新只花一條 SELECT)，再一次載入各表欄位供 PGSpreadsheet 快取。"""
     def __init__(self):
         if not _PSYCOPG2_OK:
             raise RuntimeError("DB_BACKEND=postgres 但未安裝 psycopg2-binary")
         self._connect()
-        for t in ("users", "resumes", "system_settings"):   # _rn 冪等自癒(schema 已建，通常 no-op)
-            try: self.exec(f'ALTER TABLE "{t}" ADD COLUMN IF NOT EXISTS _rn BIGSERIAL')
-            except Exception: pass
-        for c in ("signature", "signed_at", "docs_enabled", "docs_submitted_at", "top3_conditions",
-                  "lang_1", "lang_1_level", "lang_2", "lang_2_level", "lang_3", "lang_3_level",
-                  "zodiac", "interview_unit", "mgmt_cand_no", "req_no", "online_interview", "cand_code"):   # 簽名/到職文件/求職條件/語言能力/星座/面試單位/管理系統求職者編號/需求單編號/線上面試/代號欄自癒(冪等)
-            try: self.exec(f'ALTER TABLE "resumes" ADD COLUMN IF NOT EXISTS {c} TEXT NOT NULL DEFAULT \'\'')
-            except Exception: pass
-        for c, d in (("emp_id", "''"), ("unit", "''"), ("active", "'Y'")):   # 人員管理欄自癒(冪等)
-            try: self.exec(f'ALTER TABLE "users" ADD COLUMN IF NOT EXISTS {c} TEXT NOT NULL DEFAULT {d}')
-            except Exception: pass
-        try:   # 到職文件表自癒(冪等)：檔案存 bytea，量小、免另建 GCS
-            self.exec('''CREATE TABLE IF NOT EXISTS onboarding_docs (
-                id BIGSERIAL PRIMARY KEY, email TEXT NOT NULL, category TEXT NOT NULL,
-                slot INT NOT NULL DEFAULT 1, filename TEXT NOT NULL DEFAULT '',
-                mime TEXT NOT NULL DEFAULT '', data BYTEA NOT NULL,
-                uploaded_at TIMESTAMPTZ NOT NULL DEFAULT now())''')
-            self.exec('CREATE INDEX IF NOT EXISTS idx_onboarding_email ON onboarding_docs(email)')
-        except Exception: pass
-        try:
-            # 公司組織架構（admin 可維護）：一列 = 一個單位路徑
-            #   HQ        l1=群 / l2=部(可空，處可直屬群) / l3=處(可空)
-            #   Branch    l1=群 / l2=區域 / l3=分公司
-            #   Standalone 獨立單位(總經理室/董事長室)，只用 l3
-            self.exec('''CREATE TABLE IF NOT EXISTS org_units (
-                id BIGSERIAL PRIMARY KEY,
-                kind TEXT NOT NULL DEFAULT 'HQ',
-                l1 TEXT NOT NULL DEFAULT '',
-                l2 TEXT NOT NULL DEFAULT '',
-                l3 TEXT NOT NULL DEFAULT '',
-                sort_order INT NOT NULL DEFAULT 0
-            )''')
-            self.exec('CREATE INDEX IF NOT EXISTS idx_org_kind ON org_units(kind, sort_order, id)')
-            # 首次建立時灌入預設組織（之後由 admin 於「設定」分頁維護，不再覆寫）
-            if (self.exec('SELECT count(*) FROM org_units', fetch="one") or [0])[0] == 0:
-                seed = []
-                for n in ["行銷部", "技服部", "財務部", "人資部", "總務部", "招生部", "資教部"]:
-                    seed.append(("HQ", "", n, ""))
-                for n in ["行政群", "電腦群", "數位群", "行銷群"]:
-                    seed.append(("HQ", n, "", ""))
-                for n in ["總經理室", "董事長室"]:
-                    seed.append(("Standalone", "", "", n))
-                for _reg, _brs in BRANCH_DATA.items():
-                    for _b in _brs:
-                        seed.append(("Branch", "", _reg, _b))
-                for i, (k, a, b, c) in enumerate(seed):
-                    self.exec('INSERT INTO org_units (kind,l1,l2,l3,sort_order) VALUES (%s,%s,%s,%s,%s)',
-                              (k, a, b, c, i))
-        except Exception: pass
+        self.migrate_error = None
         try:
-            # 待辦通知對照：記 (求職者, 事件) → 管理系統回傳的 TodoId，供日後取消
-            self.exec('''CREATE TABLE IF NOT EXISTS todo_refs (
-                cand_email TEXT NOT NULL, event TEXT NOT NULL,
-                todo_id BIGINT NOT NULL, pm_email TEXT NOT NULL DEFAULT '',
-                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
-                PRIMARY KEY (cand_email, event))''')
-        except Exception: pass
+            self.migrate()
+        except Exception as e:                 # 遷移失敗不擋服務啟動(同舊自癒 DDL 的容錯)，於設定頁診斷顯示
+            self.migrate_error = str(e)
+        self.catalog = self.load_catalog()
 
     def _connect(self):
-        self.conn = _psycopg2.connect(**_pg_conn_kwargs())
-        self.conn.autocommit = True
+        self.pool = _PGPool(**_pg_pool_settings())
+
+    def load_catalog(self):
+        """public schema 各表欄位(依 ordinal_position，含 _rn)，一次查詢。回傳 {table: [col, ...]}。"""
+        rows = self.exec("SELECT table_name, column_name FROM information_schema.columns "
+                         "WHERE table_schema='public' ORDER BY table_name, ordinal_position",
+                         fetch="all") or []
+        cat = {}
+        for t, c in rows:
+            cat.setdefault(t, []).append(c)
+        return cat
+
+    def schema_version(self):
+        """已套用的最新遷移版本；schema_migrations 尚未建立回 0。"""
+        try:
+            return (self.exec('SELECT max(version) FROM schema_migrations', fetch="one") or [0])[0] or 0
+        except _psycopg2.ProgrammingError:
+            return 0
+
+    def migrate(self):
+        """套用落後的遷移，回傳本次套用的版本清單。已最新時只花一條 SELECT、不發任何 DDL。
+        落後時在 session 級 advisory lock 內重讀版本再逐版執行，每版一個交易(DDL + 記版本同進退)；
+        _PG_AUTOCOMMIT_MIGRATIONS 的版本改以 autocommit 執行。"""
+        latest = _PG_MIGRATIONS[-1][0]
+        if self.schema_version() >= latest:
+            return []
+        applied = []
+        with self.pool.connection() as conn:
+            # 輪詢 try_lock 而非阻塞等鎖：卡在 pg_advisory_lock 的語句持有快照，
+            # 持鎖方的 CREATE INDEX CONCURRENTLY 會等它結束而互相卡住
+            with conn.cursor() as cur:
+                while True:
+                    cur.execute("SELECT pg_try_advisory_lock(%s)", (_PG_MIGRATION_LOCK,))
+                    if cur.fetchone()[0]: break
+                    time.sleep(0.5)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INT PRIMARY KEY, name TEXT NOT NULL,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now())''')
+                    cur.execute('SELECT coalesce(max(version), 0) FROM schema_migrations')
+                    current = cur.fetchone()[0]
+                for ver, name, fn in _PG_MIGRATIONS:
+                    if ver <= current:
+                        continue
+                    conn.autocommit = ver in _PG_AUTOCOMMIT_MIGRATIONS
+                    with conn.cursor() as cur:
+                        fn(cur)
+                        cur.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (ver, name))
+                    if not conn.autocommit: conn.commit()
+                    applied.append(ver)
+            except Exception:
+                if not conn.closed: conn.rollback()
+                raise
+            finally:
+                if not conn.closed:
+                    conn.autocommit = True
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT pg_advisory_unlock(%s)", (_PG_MIGRATION_LOCK,))
+        return applied
+
+    @contextmanager
+    def transaction(self):
+        """借一條連線開交易，yield cursor；區塊正常結束 commit、例外 rollback 後重拋。
+        批次管理動作(離職交接/組織覆寫/批次刪除)用，整批一次往返、全有或全無。"""
+        with self.pool.connection() as conn:
+            conn.autocommit = False
+            try:
+                with conn.cursor() as cur:
+                    yield cur
+                conn.commit()
+            except Exception:
+                if not conn.closed: conn.rollback()
+                raise
+            finally:
+                if not conn.closed: conn.autocommit = True
 
     def exec(self, sql, params=(), fetch=None):
-        for attempt in (1, 2):
-            try:
-                with self.conn.cursor() as cur:
-                    cur.execute(sql, params)
-                    if fetch == "all": return cur.fetchall()
-                    if fetch == "one": return cur.fetchone()
-                    return None
-            except _psycopg2.OperationalError:
-                if attempt == 2: raise
-                self._connect()   # 斷線重連再試一次
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(sql, params)
+            if fetch == "all": return cur.fetchall()
+            if fetch == "one": return cur.fetchone()
+            return None
+
+    def pool_stats(self):
+        return self.pool.snapshot()
+
+    def notify(self, table=None, key=None):
+        """寫入後廣播快取失效(pg_notify)，其他實例的 _CacheListener 收到即淘汰該表/該列快取。
+        key 可為單一字串或清單。"""
+        if key is not None and not isinstance(key, str):
+            key = list(key)
+            if len(json.dumps(key)) > 6000:   # NOTIFY payload 上限 8000 bytes，太多筆改整表失效
+                key = None
+        payload = {"table": table or "*", "key": key, "origin": _INSTANCE_ID}
+        self.exec("SELECT pg_notify(%s, %s)", (_CACHE_CHANNEL, json.dumps(payload, ensure_ascii=False)))
+
+    def explain(self, sql, params=()):
+        """回傳查詢計畫(EXPLAIN 文字行)；不實際執行查詢。"""
+        return [r[0] for r in self.exec(f"EXPLAIN {sql}", params, fetch="all") or []]
 
 class PGWorksheet:
-    """模擬單一 worksheet：列1=表頭(不含 _rn)、資料列依 _rn 排序對映列2起。"""
-    def __init__(self, backend, table):
-        self.b = backend; self.t = table
-        rows = self.b.exec(
-            "SELECT column_name FROM information_schema.columns "
-            "WHERE table_schema='public' AND table_name=%s AND column_name <> '_rn' "
-            "ORDER BY ordinal_position", (table,), fetch="all")
-        self.cols = [r[0] for r in rows]
+    """模擬單一 worksheet：列1=表頭(不含 _rn)、資料列依 _rn 排序對映列2起。
+    1-based 列號介面(find/cell/update_cell…)僅為 gspread 相容；ResumeDB 在 PG 一律走下方
+    get_by_key/update_by_key/delete_by_key 主鍵定址，一條 SQL 直達該列，不再換算列號。"""
+    def __init__(self, backend, table, book):
+        self.b = backend; self.t = table; self.book = book   # book=PGSpreadsheet，持有欄位快取
+
+    @property
+    def schema(self): return self.book.schema(self.t)
+
+    @property
+    def cols(self): return self.schema.cols
 
     def _q(self, name): return '"' + str(name).replace('"', '""') + '"'
 
@@ -290,10 +604,13 @@ class PGWorksheet:
                         (row - 2,), fetch="one")
         return r[0] if r else None
 
-    def get_all_values(self):
-        collist = ", ".join(self._q(c) for c in self.cols)
+    def get_all_values(self, columns=None):
+        """整表讀取；columns 指定時只 SELECT 這些欄(投影，不存在的欄略過)，表頭列同步縮減。"""
+        idx = self.schema.idx
+        cols = [c for c in columns if c in idx] if columns else list(self.cols)
+        collist = ", ".join(self._q(c) for c in cols)
         rows = self.b.exec(f'SELECT {collist} FROM {self._q(self.t)} ORDER BY _rn', fetch="all")
-        out = [list(self.cols)]
+        out = [list(cols)]
         for row in rows:
             out.append(["" if v is None else str(v) for v in row])
         return out
@@ -345,6 +662,58 @@ class PGWorksheet:
             ph = ", ".join(["%s"] * len(rns))
             self.b.exec(f'DELETE FROM {self._q(self.t)} WHERE _rn IN ({ph})', tuple(rns))
 
+    def changes_since(self, since, columns=None):
+        """增量讀取(需 migration 4 的 _seq)：回傳 (欄名, [[_rn, 值...]], 刪除的 _rn, 最大 _seq)。
+        since=0 等於整表讀取(不查刪除記錄)。"""
+        idx = self.schema.idx
+        cols = [c for c in columns if c in idx] if columns else list(self.cols)
+        collist = ", ".join(["_rn", "_seq"] + [self._q(c) for c in cols])
+        rows = self.b.exec(f'SELECT {collist} FROM {self._q(self.t)} WHERE _seq > %s ORDER BY _rn',
+                           (since,), fetch="all") or []
+        top = max([since] + [r[1] for r in rows])
+        deleted = []
+        if since:
+            tomb = self.b.exec('SELECT rn, _seq FROM _row_tombstones WHERE tbl = %s AND _seq > %s',
+                               (self.t, since), fetch="all") or []
+            deleted = [r[0] for r in tomb]
+            top = max([top] + [r[1] for r in tomb])
+        return cols, [[r[0]] + ["" if v is None else str(v) for v in r[2:]] for r in rows], deleted, top
+
+    # ── 主鍵定址（keyed mode）：以 key_col(email/key) 或 _rn 直接讀寫單列 ──
+    # 同鍵多列時取 _rn 最小者，語意同 find() 的「第一個符合」。
+    def _key_where(self, key_col):
+        if key_col == "_rn":
+            return "_rn = %s"
+        return (f'_rn = (SELECT _rn FROM {self._q(self.t)} WHERE {self._q(key_col)} = %s '
+                f'ORDER BY _rn LIMIT 1)')
+
+    def get_by_key(self, key_col, key, columns=None):
+        """回傳該列 {欄名: 字串值}；查無回 None。columns 省略 = 全部欄位。"""
+        idx = self.schema.idx
+        cols = [c for c in (columns or self.cols) if c in idx]
+        if not cols: return None
+        collist = ", ".join(self._q(c) for c in cols)
+        r = self.b.exec(f'SELECT {collist} FROM {self._q(self.t)} WHERE {self._key_where(key_col)}',
+                        (key,), fetch="one")
+        if not r: return None
+        return {c: ("" if v is None else str(v)) for c, v in zip(cols, r)}
+
+    def update_by_key(self, key_col, key, updates):
+        """單條多欄 UPDATE；回傳是否有更新到列。updates: {欄名: 值}(不存在的欄略過)。"""
+        idx = self.schema.idx
+        ups = {c: v for c, v in updates.items() if c in idx}
+        if not ups: return False
+        sets = ", ".join(f'{self._q(c)}=%s' for c in ups)
+        params = ["" if v is None else str(v) for v in ups.values()]
+        r = self.b.exec(f'UPDATE {self._q(self.t)} SET {sets} WHERE {self._key_where(key_col)} RETURNING _rn',
+                        tuple(params) + (key,), fetch="one")
+        return r is not None
+
+    def delete_by_key(self, key_col, key):
+        r = self.b.exec(f'DELETE FROM {self._q(self.t)} WHERE {self._key_where(key_col)} RETURNING _rn',
+                        (key,), fetch="one")
+        return r is not None
+
     def update_cells_row(self, row, updates_by_colidx):
         """一列多欄單條 UPDATE。updates_by_colidx: {1-based colnum: value}。"""
         rn = self._rn_for_row(row)
@@ -354,12 +723,42 @@ class PGWorksheet:
         params = ["" if v is None else str(v) for v in updates_by_colidx.values()]
         self.b.exec(f'UPDATE {self._q(self.t)} SET {sets} WHERE _rn=%s', tuple(params) + (rn,))
 
+class _TableSchema:
+    """單表欄位快取：cols(依 ordinal_position，不含 _rn/_seq 系統欄) + idx(欄名→0-based 位置，O(1) 查詢)。"""
+    __slots__ = ("cols", "idx", "has_seq")
+    def __init__(self, cols):
+        self.cols = [c for c in cols if c not in ("_rn", "_seq")]
+        self.idx = {c: i for i, c in enumerate(self.cols)}
+        self.has_seq = "_seq" in cols
+
 class PGSpreadsheet:
-    """模擬整份試算表：worksheet(title) 回 PGWorksheet。"""
+    """模擬整份試算表：worksheet(title) 回 PGWorksheet。
+    持有各表欄位快取：啟動時沿用 PGBackend 已載入的 catalog，之後 worksheet()/寫入前取表頭都不再
+    查 information_schema；只有自癒 DDL 真的補了欄(或呼叫 refresh_schema)才重載。"""
     def __init__(self):
         self.backend = PGBackend()
+        self._lock = threading.Lock()
+        self._schemas = {}
+        self._build(self.backend.catalog)
+
+    def _build(self, catalog):
+        with self._lock:
+            self._schemas = {t: _TableSchema(cols) for t, cols in catalog.items()}
+
+    def schema(self, table):
+        sch = self._schemas.get(table)
+        if sch is None:                        # 啟動後才建立的表：重載一次，仍無則記空表避免重複查詢
+            self.refresh_schema()
+            with self._lock:
+                sch = self._schemas.setdefault(table, _TableSchema([]))
+        return sch
+
+    def refresh_schema(self):
+        self.backend.catalog = self.backend.load_catalog()
+        self._build(self.backend.catalog)
+
     def worksheet(self, title):
-        return PGWorksheet(self.backend, title)
+        return PGWorksheet(self.backend, title, self)
 
 # --- 2. 資料庫核心 ---
 class ResumeDB:
@@ -385,7 +784,9 @@ class ResumeDB:
             st.error(f"資料庫連線失敗: {e}")
             st.stop()
 
-    def get_df(self, table_name):
+    def get_df(self, table_name, columns=None):
+        """整表讀成 DataFrame。columns 指定時只取這些欄(主鍵欄一律帶上)：
+        PG 直接投影 SELECT；Sheets 整表讀回後再裁欄。"""
         defaults = {
             "users": ["email", "password", "name", "role", "creator_email", "created_at",
                       "emp_id", "unit", "active"],
@@ -413,19 +814,131 @@ class ResumeDB:
         
         ws = self.ws_users if table_name == "users" else (self.ws_resumes if table_name == "resumes" else self.ws_settings)
         
+        key = defaults[table_name][0]
+        cols = [key] + [c for c in columns if c != key] if columns else None
+        empty_cols = cols or defaults[table_name]
         try:
-            data = ws.get_all_values()
-            if len(data) < 2: return pd.DataFrame(columns=defaults[table_name])
+            data = ws.get_all_values(columns=cols) if isinstance(ws, PGWorksheet) else ws.get_all_values()
+            if len(data) < 2: return pd.DataFrame(columns=empty_cols)
             headers = data.pop(0)
             df = pd.DataFrame(data, columns=headers)
             df.columns = df.columns.astype(str).str.strip().str.lower()
-            if defaults[table_name][0] not in df.columns: return pd.DataFrame(columns=defaults[table_name])
+            if key not in df.columns: return pd.DataFrame(columns=empty_cols)
+            if cols:
+                df = df[[c for c in cols if c in df.columns]]
             return df
-        except: return pd.DataFrame(columns=defaults.get(table_name, []))
+        except: return pd.DataFrame(columns=empty_cols)
+
+    def get_resume(self, email):
+        """取單一求職者履歷整列 {欄名: 值}；查無回 None。
+        PG 依主鍵單列查詢；Sheets 讀表後比對(不分大小寫)。"""
+        email = str(email).strip()
+        try:
+            if isinstance(self.ws_resumes, PGWorksheet):
+                return self.ws_resumes.get_by_key("email", email)
+            df = self.get_df("resumes")
+            m = df[df['email'].astype(str).str.strip().str.lower() == email.lower()]
+            return None if m.empty else m.iloc[0].to_dict()
+        except Exception:
+            return None
+
+    def changes_since(self, table_name, since, columns=None):
+        """增量讀取 users/resumes/system_settings：since 之後異動的列 + 已刪除的 _rn。
+        回傳 PGWorksheet.changes_since 的 tuple；Sheets 或尚未有 _seq 欄時回 None(呼叫端改整表讀)。"""
+        ws = {"users": self.ws_users, "resumes": self.ws_resumes, "system_settings": self.ws_settings}[table_name]
+        if not isinstance(ws, PGWorksheet) or not ws.schema.has_seq:
+            return None
+        if columns:
+            key = "key" if table_name == "system_settings" else "email"
+            columns = [key] + [c for c in columns if c != key]
+        if not since:   # 整表重載時順便清掉早已被所有快照消化的刪除記錄
+            self.sh.backend.exec("DELETE FROM _row_tombstones WHERE deleted_at < now() - interval '1 day'")
+        return ws.changes_since(since, columns)
+
+    _CAND_USER_COLS = ("email", "name", "creator_email", "created_at")
+
+    def query_candidates(self, pm_email=None, statuses=None, month_from=None, month_to=None, columns=None):
+        """求職者(users role=candidate) LEFT JOIN 履歷，篩選下推到資料庫：
+        pm_email=建立者(None=全部)、statuses=狀態清單(空履歷視為 New)、month_from/to='YYYY-MM'(依 created_at)、
+        columns=要帶的 resumes 欄(None=全部)。回傳 DataFrame(users 的 email/name/creator_email/created_at + 履歷欄)，
+        順序同舊版表列：依 resumes 列順序，尚無履歷者依 users 列順序接在後面。Sheets 後端讀回後以 pandas 做同樣篩選。"""
+        b = self._pg()
+        if b is None:
+            return self._query_candidates_df(pm_email, statuses, month_from, month_to, columns)
+        sql, params, cols = self.candidates_sql(pm_email, statuses, month_from, month_to, columns)
+        rows = b.exec(sql, params, fetch="all") or []
+        return pd.DataFrame([["" if v is None else str(v) for v in r] for r in rows], columns=cols)
+
+    def candidates_sql(self, pm_email=None, statuses=None, month_from=None, month_to=None, columns=None):
+        """query_candidates 在 PG 實際執行的 (SQL, 參數, 欄名)；診斷頁 EXPLAIN 也用這一份。
+        條件都寫成可走索引的形式：月份轉成 created_at 字串區間(users(creator_email, created_at))，
+        狀態直接比 r.status(resumes(status))，空履歷視為 New 另以 IS NULL / '' 分支表示。"""
+        ucols = self._CAND_USER_COLS
+        ridx = self.ws_resumes.schema.idx
+        rcols = [c for c in (columns or ridx) if c in ridx and c not in ucols]
+        sel = [f'u."{c}"' for c in ucols]
+        for c in rcols:
+            sel.append("coalesce(nullif(r.status, ''), 'New') AS status" if c == "status"
+                       else f'coalesce(r."{c}", \'\') AS "{c}"')
+        where, params = ["u.role = 'candidate'"], []
+        if pm_email:
+            where.append("u.creator_email = %s"); params.append(pm_email)
+        if statuses:
+            where.append("(r.status = ANY(%s) OR r.status IS NULL OR r.status = '')" if "New" in statuses
+                         else "r.status = ANY(%s)")
+            params.append(list(statuses))
+        if month_from:   # 'YYYY-MM' 排在該月所有 'YYYY-MM-DD' 之前
+            where.append("u.created_at >= %s"); params.append(month_from)
+        if month_to:
+            nxt = _next_month(month_to)
+            if nxt:
+                where.append("u.created_at < %s"); params.append(nxt)
+            else:
+                where.append("substr(u.created_at, 1, 7) <= %s"); params.append(month_to)
+        sql = (f'SELECT {", ".join(sel)} FROM users u '
+               f'LEFT JOIN resumes r ON r.email = u.email '
+               f'WHERE {" AND ".join(where)} ORDER BY r._rn NULLS LAST, u._rn')
+        return sql, tuple(params), list(ucols) + rcols
+
+    def _query_candidates_df(self, pm_email, statuses, month_from, month_to, columns):
+        ucols = self._CAND_USER_COLS
+        u = self.get_df("users", columns=ucols + ("role",))
+        u = u[u['role'] == 'candidate'].drop(columns=['role'])
+        if pm_email:
+            u = u[u['creator_email'] == pm_email]
+        r = self.get_df("resumes", columns=(tuple(columns) + ("status",)) if columns else None)
+        r = r[[c for c in r.columns if c == 'email' or c not in ucols]].assign(_ord=range(len(r)))
+        df = u.merge(r, on='email', how='left')
+        df = df.sort_values('_ord', kind='stable', na_position='last').drop(columns=['_ord']).fillna('')
+        df['status'] = df['status'].replace('', 'New') if 'status' in df.columns else 'New'
+        ym = df['created_at'].astype(str).str[:7]
+        keep = pd.Series(True, index=df.index)
+        if statuses:   keep &= df['status'].isin(list(statuses))
+        if month_from: keep &= ym >= month_from
+        if month_to:   keep &= ym <= month_to
+        df = df[keep]
+        if columns and 'status' not in columns:
+            df = df.drop(columns=['status'])
+        return df.reset_index(drop=True)
+
+    def candidate_months(self, pm_email=None):
+        """求職者建立月份('YYYY-MM')，由新到舊、不重複；供月份選單，不必讀整張 users。"""
+        b = self._pg()
+        if b is None:
+            df = self._query_candidates_df(pm_email, None, None, None, ("email",))
+            ym = df['created_at'].astype(str).str[:7]
+            return sorted({m for m in ym if len(m) == 7 and m[4] == '-' and (m[:4] + m[5:]).isdigit()},
+                          reverse=True)
+        sql = ("SELECT DISTINCT substr(created_at, 1, 7) FROM users "
+               "WHERE role = 'candidate' AND created_at ~ '^[0-9]{4}-[0-9]{2}'")
+        params = ()
+        if pm_email:
+            sql += " AND creator_email = %s"; params = (pm_email,)
+        return [r[0] for r in b.exec(sql + " ORDER BY 1 DESC", params, fetch="all") or []]
 
     def verify_login(self, email, password):
         try:
-            df = self.get_df("users")
+            df = self.get_df("users", columns=("email", "password", "name", "role", "creator_email"))
             if df.empty: return None
             email_clean = str(email).strip().lower()
             user = df[df['email'].astype(str).str.strip().str.lower() == email_clean]
@@ -442,10 +955,10 @@ class ResumeDB:
             email = str(email).strip()
             name = str(name).strip()
             creator_email = str(creator_email).strip()
-            df = self.get_df("users")
+            df = self.get_df("users", columns=("email",))
             if not df.empty and email in df['email'].astype(str).values: return False, "Email 已存在"
             # 依真實表頭按欄名放值（避免硬編碼位置放錯欄；新欄 active 預設 Y=在職）
-            _uh = [str(h).strip().lower() for h in self.ws_users.row_values(1)]
+            _uh = self._headers(self.ws_users)
             _urow = [""] * len(_uh)
             for _c, _v in [("email", email), ("password", email), ("name", name), ("role", role),
                            ("creator_email", creator_email), ("created_at", str(date.today())),
@@ -456,7 +969,7 @@ class ResumeDB:
             if role == "candidate":
                 # 依真實表頭「按欄名」放值，避免硬編碼位置放錯欄
                 # (舊 bug：r_type 被放到 index 51=exp_4_co，而非 resume_type@61)
-                headers = [str(h).strip().lower() for h in self.ws_resumes.row_values(1)]
+                headers = self._headers(self.ws_resumes)
                 row_data = [""] * len(headers)
                 _init = [("email", email), ("status", "New"),
                          ("name_cn", name), ("resume_type", r_type), ("interview_unit", unit)]
@@ -468,17 +981,51 @@ class ResumeDB:
                     if col in headers:
                         row_data[headers.index(col)] = val
                 self.ws_resumes.append_row(row_data)
-            _invalidate_cache()
+            _invalidate_cache("users", email)
+            if role == "candidate": _invalidate_cache("resumes", email)
             return True, "建立成功"
         except Exception as e: return False, str(e)
 
     def change_password(self, email, new_password):
         try:
-            cell = self.ws_users.find(email, in_column=1)
-            if cell: self.ws_users.update_cell(cell.row, 2, new_password); return True, "OK"
+            if self._update_row(self.ws_users, email, {"password": new_password}): return True, "OK"
             return False, "Fail"
         except Exception as e: return False, str(e)
 
+    def _headers(self, ws):
+        """表頭(小寫)。PG 直接取 PGSpreadsheet 的欄位快取，不發查詢；Sheets 讀第 1 列。"""
+        if isinstance(ws, PGWorksheet):
+            return list(ws.cols)
+        return [str(h).strip().lower() for h in ws.row_values(1)]
+
+    def _get_row(self, ws, key, key_col="email"):
+        """依第 1 欄主鍵取單列 {欄名: 值}；查無回 None。PG 一條 SQL；Sheets 沿用 find + row_values。"""
+        if isinstance(ws, PGWorksheet):
+            return ws.get_by_key(key_col, str(key))
+        cell = ws.find(str(key), in_column=1)
+        if not cell: return None
+        vals = ws.row_values(cell.row)
+        return {h: (vals[i] if i < len(vals) else "") for i, h in enumerate(self._headers(ws))}
+
+    def _update_row(self, ws, key, updates, key_col="email"):
+        """依第 1 欄主鍵更新單列多欄；回傳是否找到該列。
+        PG 走主鍵單條 UPDATE；Sheets 沿用 find + batch_update(1-based 列號)。"""
+        if isinstance(ws, PGWorksheet):
+            return ws.update_by_key(key_col, str(key), updates)
+        cell = ws.find(str(key), in_column=1)
+        if not cell: return False
+        headers = self._headers(ws)
+        self._apply_updates(ws, cell.row, headers, {c: v for c, v in updates.items() if c in headers})
+        return True
+
+    def _delete_row(self, ws, key, key_col="email"):
+        if isinstance(ws, PGWorksheet):
+            return ws.delete_by_key(key_col, str(key))
+        cell = ws.find(str(key), in_column=1)
+        if not cell: return False
+        ws.delete_rows(cell.row)
+        return True
+
     def _apply_updates(self, ws, row, headers, updates):
         """批次更新一列多欄(單次)。PG 走單條 UPDATE；gspread 用 batch_update(單次 API)。
         取代逐格 update_cell 迴圈，存一次履歷從 ~95 次寫入降為 1 次。"""
@@ -496,51 +1043,63 @@ class ResumeDB:
     # [關鍵修復]：自動移除 Key 後面的 `_in`，以匹配資料庫欄位
     def save_resume(self, email, data, status="Draft"):
         try:
-            cell = self.ws_resumes.find(email, in_column=1)
-            if cell:
-                r = cell.row
-                headers = [h.strip().lower() for h in self.ws_resumes.row_values(1)]
-                updates = {}
-                if 'status' in headers:
-                    updates['status'] = status
-                for key, val in data.items():
-                    clean_key = key.lower()
-                    if clean_key.endswith("_in"):
-                        clean_key = clean_key[:-3]  # 去掉 _in
-                    if clean_key == 'status':
-                        continue
-                    if clean_key in headers:
-                        if isinstance(val, (date, datetime)):
-                            val = str(val)
-                        updates[clean_key] = val
-                # 星座一律由生日重算後覆寫，確保永遠與生日同步(不依賴前端傳入)
-                if 'zodiac' in headers and data.get('dob'):
-                    updates['zodiac'] = _zodiac_of(data.get('dob'))
-                self._apply_updates(self.ws_resumes, r, headers, updates)  # 批次寫入
-                _invalidate_cache()
+            headers = self._headers(self.ws_resumes)
+            updates = {}
+            if 'status' in headers:
+                updates['status'] = status
+            for key, val in data.items():
+                clean_key = key.lower()
+                if clean_key.endswith("_in"):
+                    clean_key = clean_key[:-3]  # 去掉 _in
+                if clean_key == 'status':
+                    continue
+                if clean_key in headers:
+                    if isinstance(val, (date, datetime)):
+                        val = str(val)
+                    updates[clean_key] = val
+            # 星座一律由生日重算後覆寫，確保永遠與生日同步(不依賴前端傳入)
+            if 'zodiac' in headers and data.get('dob'):
+                updates['zodiac'] = _zodiac_of(data.get('dob'))
+            if self._update_row(self.ws_resumes, email, updates):  # 批次寫入
+                _invalidate_cache("resumes", email)
                 return True, "儲存成功"
             return False, "No Data"
         except Exception as e: return False, str(e)
 
     def save_signature(self, email, png_b64):
-        """儲存求職者手寫簽名(base64 PNG) + 簽署時間，單條批次寫入。"""
+        """儲存求職者手寫簽名(base64 PNG) + 簽署時間。
+        PG：PNG 以 bytea 存 resume_signatures，resumes 只更新 signed_at(同一交易，不會只寫一半)；
+        Sheets 照舊寫 signature 欄。"""
         try:
-            cell = self.ws_resumes.find(email, in_column=1)
-            if not cell: return False, "查無履歷資料"
-            headers = [h.strip().lower() for h in self.ws_resumes.row_values(1)]
+            b = self._pg()
+            if b is not None:
+                png = _sig_png_bytes(png_b64)
+                if not png: return False, "簽名影像無效"
+                signed_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+                with b.transaction() as cur:
+                    cur.execute(f'UPDATE resumes SET signed_at = %s WHERE {self.ws_resumes._key_where("email")} '
+                                'RETURNING _rn', (signed_at, email))
+                    if cur.fetchone() is None:
+                        return False, "查無履歷資料"
+                    cur.execute('INSERT INTO resume_signatures (email, png) VALUES (%s, %s) '
+                                'ON CONFLICT (email) DO UPDATE SET png = EXCLUDED.png, updated_at = now()',
+                                (email, _psycopg2.Binary(png)))
+                _invalidate_cache("resumes", email)
+                return True, "OK"
+            headers = self._headers(self.ws_resumes)
             updates = {}
             if 'signature' in headers: updates['signature'] = png_b64
             if 'signed_at' in headers: updates['signed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M')
             if 'signature' not in updates: return False, "資料表缺 signature 欄"
-            self._apply_updates(self.ws_resumes, cell.row, headers, updates)
-            _invalidate_cache()
+            if not self._update_row(self.ws_resumes, email, updates): return False, "查無履歷資料"
+            _invalidate_cache("resumes", email)
             return True, "OK"
         except Exception as e: return False, str(e)
 
     def get_user_by_email(self, email):
         """依 email 取用戶(不驗密碼)，供自動登入連結用。回傳同 verify_login 的 dict 或 None。"""
         try:
-            df = self.get_df("users")
+            df = self.get_df("users", columns=("email", "name", "role", "creator_email", "active"))
             if df.empty: return None
             u = df[df['email'].astype(str).str.strip().str.lower() == str(email).strip().lower()]
             if u.empty: return None
@@ -581,16 +1140,14 @@ class ResumeDB:
     def update_staff(self, email, name=None, emp_id=None, unit=None, password=None):
         """人員管理：更新 PM/admin 基本資料（不改 email 本身，email 為主鍵）。"""
         try:
-            cell = self.ws_users.find(str(email).strip(), in_column=1)
-            if not cell: return False, "查無此帳號"
-            headers = [h.strip().lower() for h in self.ws_users.row_values(1)]
+            headers = self._headers(self.ws_users)
             updates = {}
             for col, val in (("name", name), ("emp_id", emp_id), ("unit", unit), ("password", password)):
                 if val is not None and col in headers:
                     updates[col] = str(val).strip()
             if not updates: return False, "無可更新欄位"
-            self._apply_updates(self.ws_users, cell.row, headers, updates)
-            _invalidate_cache()
+            if not self._update_row(self.ws_users, str(email).strip(), updates): return False, "查無此帳號"
+            _invalidate_cache("users", str(email).strip())
             return True, "已更新"
         except Exception as e: return False, str(e)
 
@@ -601,23 +1158,30 @@ class ResumeDB:
             if not successor_email: return False, "必須指定接手 PM", 0
             if email.lower() == successor_email.lower():
                 return False, "接手 PM 不可為離職者本人", 0
-            df = self.get_df("users")
-            headers = [h.strip().lower() for h in self.ws_users.row_values(1)]
+            b = self._pg()
+            if b is not None:
+                # 集合式：一條 UPDATE 轉移全部求職者 + 一條標記離職，同一交易
+                with b.transaction() as cur:
+                    cur.execute('UPDATE users SET creator_email=%s WHERE lower(creator_email)=lower(%s)',
+                                (successor_email, email))
+                    moved = cur.rowcount
+                    cur.execute("UPDATE users SET active='N' WHERE lower(email)=lower(%s)", (email,))
+                _invalidate_cache("users")
+                return True, f"已將 {moved} 位求職者轉由接手 PM 承接，並標記離職", moved
+            df = self.get_df("users", columns=("email", "creator_email"))
+            headers = self._headers(self.ws_users)
             if 'creator_email' not in headers:
                 return False, "users 表缺 creator_email 欄", 0
             # 逐列把 creator_email 從離職者改為接手者
             moved = 0
             targets = df[df['creator_email'].astype(str).str.strip().str.lower() == email.lower()]
             for _, r in targets.iterrows():
-                c = self.ws_users.find(str(r['email']).strip(), in_column=1)
-                if c:
-                    self._apply_updates(self.ws_users, c.row, headers, {"creator_email": successor_email})
+                if self._update_row(self.ws_users, str(r['email']).strip(), {"creator_email": successor_email}):
                     moved += 1
             # 標記離職
-            cell = self.ws_users.find(email, in_column=1)
-            if cell and 'active' in headers:
-                self._apply_updates(self.ws_users, cell.row, headers, {"active": "N"})
-            _invalidate_cache()
+            if 'active' in headers:
+                self._update_row(self.ws_users, email, {"active": "N"})
+            _invalidate_cache("users")
             return True, f"已將 {moved} 位求職者轉由接手 PM 承接，並標記離職", moved
         except Exception as e: return False, str(e), 0
 
@@ -639,10 +1203,11 @@ class ResumeDB:
         b = self._pg()
         if b is None: return False, "此功能需 PostgreSQL 後端"
         try:
-            b.exec('DELETE FROM org_units WHERE kind=%s', (kind,))
-            for i, (a, c, d) in enumerate(rows):
-                b.exec('INSERT INTO org_units (kind,l1,l2,l3,sort_order) VALUES (%s,%s,%s,%s,%s)',
-                       (kind, a, c, d, i))
+            with b.transaction() as cur:   # 刪除 + 整批寫入同一交易，中途失敗不會留下半套組織
+                cur.execute('DELETE FROM org_units WHERE kind=%s', (kind,))
+                _pgextras.execute_values(cur, 'INSERT INTO org_units (kind,l1,l2,l3,sort_order) VALUES %s',
+                                         [(kind, a, c, d, i) for i, (a, c, d) in enumerate(rows)],
+                                         page_size=500)
             return True, f"已儲存 {len(rows)} 筆"
         except Exception as e:
             return False, str(e)
@@ -650,13 +1215,11 @@ class ResumeDB:
     def _update_resume_fields(self, email, updates):
         """通用：依欄名批次更新 resumes 單列(只寫實際存在的欄)。"""
         try:
-            cell = self.ws_resumes.find(email, in_column=1)
-            if not cell: return False, "查無資料"
-            headers = [h.strip().lower() for h in self.ws_resumes.row_values(1)]
+            headers = self._headers(self.ws_resumes)
             ups = {k: v for k, v in updates.items() if k in headers}
             if not ups: return False, "無可寫欄位"
-            self._apply_updates(self.ws_resumes, cell.row, headers, ups)
-            _invalidate_cache()
+            if not self._update_row(self.ws_resumes, email, ups): return False, "查無資料"
+            _invalidate_cache("resumes", email)
             return True, "OK"
         except Exception as e: return False, str(e)
 
@@ -666,17 +1229,93 @@ class ResumeDB:
     def mark_docs_submitted(self, email):
         return self._update_resume_fields(email, {"docs_submitted_at": datetime.now().strftime('%Y-%m-%d %H:%M')})
 
-    # ── 到職文件（PG bytea；僅 PostgreSQL 後端）─────────────────────
+    # ── 履歷 PDF 持久快取（PG；依內容雜湊，各實例共用）──────────────
+    def pdf_cache_get(self, digest):
+        """取快取的 PDF bytes(無則 None)；last_used 超過 10 分鐘才回寫，避免每次命中都寫入。"""
+        b = self._pg()
+        if b is None: return None
+        try:
+            r = b.exec("SELECT pdf, last_used < now() - interval '10 minutes' FROM pdf_cache WHERE digest=%s",
+                       (digest,), fetch="one")
+            if not r: return None
+            if r[1]:
+                b.exec('UPDATE pdf_cache SET last_used=now() WHERE digest=%s', (digest,))
+            return bytes(r[0])
+        except Exception:
+            return None
+
+    def pdf_cache_put(self, digest, pdf, email=""):
+        """寫入快取後依 PDF_CACHE_MAX_MB(預設 256)容量上限，從最久未用的開始淘汰。"""
+        b = self._pg()
+        if b is None: return
+        try:
+            limit = int(float(os.environ.get("PDF_CACHE_MAX_MB", "256")) * 1024 * 1024)
+            with b.transaction() as cur:
+                cur.execute('INSERT INTO pdf_cache (digest, email, pdf, size) VALUES (%s, %s, %s, %s) '
+                            'ON CONFLICT (digest) DO UPDATE SET last_used = now()',
+                            (digest, str(email or ""), _psycopg2.Binary(pdf), len(pdf)))
+                cur.execute('DELETE FROM pdf_cache WHERE digest IN ('
+                            'SELECT digest FROM (SELECT digest, sum(size) OVER '
+                            '(ORDER BY last_used DESC, digest) AS running FROM pdf_cache) t '
+                            'WHERE running > %s)', (limit,))
+        except Exception:
+            pass
+
+    def signature_version(self, email):
+        """簽名版本(PDF 快取 key 用)：PG 為 resume_signatures.updated_at，Sheets 為 signature 欄雜湊；無簽名回 ""。
+        同一分鐘內重簽 signed_at 不變，靠它換 key。"""
+        try:
+            b = self._pg()
+            if b is not None:
+                r = b.exec('SELECT updated_at FROM resume_signatures WHERE email=%s', (email,), fetch="one")
+                return str(r[0]) if r else ""
+            sig = str((self._get_row(self.ws_resumes, email) or {}).get('signature', '') or '')
+            return hashlib.sha256(sig.encode("utf-8")).hexdigest()[:16] if sig else ""
+        except Exception:
+            return ""
+
+    def get_signature(self, email):
+        """取求職者簽名 PNG bytes(無則 None)；只在 PDF 套印簽名時才讀。"""
+        try:
+            b = self._pg()
+            if b is not None:
+                r = b.exec('SELECT png FROM resume_signatures WHERE email=%s', (email,), fetch="one")
+                return bytes(r[0]) if r else None
+            row = self._get_row(self.ws_resumes, email) or {}
+            return _sig_png_bytes(row.get('signature', ''))
+        except Exception:
+            return None
+
+    # ── 到職文件（中繼資料在 PG、內容在 blob_store 內容定址；僅 PostgreSQL 後端）──
     def _pg(self):
         return getattr(self.sh, "backend", None)   # PGSpreadsheet 才有 .backend
 
+    def _blobs(self):
+        """到職文件 bytes 存放處(blob_store)：BLOB_DIR 有設 → 檔案系統，否則 PG doc_blobs 表(過渡，見 make_blob_store)。"""
+        if getattr(self, "_blob_store", None) is None:
+            b = self._pg()
+            self._blob_store = make_blob_store(b.exec if b is not None else None)
+        return self._blob_store
+
     def docs_add(self, email, category, slot, filename, mime, data_bytes):
+        """內容定址：storage_key = docs/sha256/<雜湊>，同內容已有列引用就不再寫 blob，只新增中繼資料列。
+        在該 key 的 advisory lock 下「查引用 → 寫 blob → 寫列」(claim_blob)，與 docs_delete 的「無引用才刪 blob」互斥。
+        PG blob 走同一交易的 cursor，不另借連線，寫列失敗隨 rollback 一併撤銷。"""
         b = self._pg()
         if b is None: return False, "此功能需 PostgreSQL 後端"
+        sha = content_sha256(data_bytes)
+        key = content_key(sha)
+        store = self._blobs()
         try:
-            b.exec('INSERT INTO onboarding_docs (email,category,slot,filename,mime,data) '
-                   'VALUES (%s,%s,%s,%s,%s,%s)',
-                   (email, category, int(slot), filename, mime, data_bytes))
+            with b.transaction() as cur:
+                wrote = claim_blob(cur, store, key, data_bytes)
+                try:
+                    cur.execute('INSERT INTO onboarding_docs (email,category,slot,filename,mime,storage_key,size,sha256) '
+                                'VALUES (%s,%s,%s,%s,%s,%s,%s,%s)',
+                                (email, category, int(slot), filename, mime, key, len(data_bytes), sha))
+                except Exception:
+                    if wrote and not store.transactional: store.delete(key)   # 仍持鎖：別人不會同時引用這份剛寫的 blob
+                    raise
             return True, "OK"
         except Exception as e: return False, str(e)
 
@@ -685,101 +1324,134 @@ class ResumeDB:
         if b is None: return []
         try:
             rows = b.exec("SELECT id,category,slot,filename,mime,"
-                          "to_char(uploaded_at,'YYYY-MM-DD HH24:MI') "
+                          "to_char(uploaded_at,'YYYY-MM-DD HH24:MI'),sha256 "
                           "FROM onboarding_docs WHERE email=%s ORDER BY category,slot,id",
                           (email,), fetch="all") or []
             return [{"id": r[0], "category": r[1], "slot": r[2], "filename": r[3],
-                     "mime": r[4], "uploaded_at": r[5]} for r in rows]
+                     "mime": r[4], "uploaded_at": r[5], "sha256": r[6]} for r in rows]
         except Exception: return []
 
     def docs_get(self, doc_id):
         b = self._pg()
         if b is None: return None
         try:
-            r = b.exec('SELECT filename,mime,data FROM onboarding_docs WHERE id=%s', (int(doc_id),), fetch="one")
+            r = b.exec('SELECT filename,mime,storage_key,data FROM onboarding_docs WHERE id=%s',
+                       (int(doc_id),), fetch="one")
             if not r: return None
-            return {"filename": r[0], "mime": r[1], "data": bytes(r[2])}
+            data = self._blobs().get(r[2]) if r[2] else (bytes(r[3]) if r[3] is not None else None)   # 未搬移的舊列仍在 data
+            if data is None: return None
+            return {"filename": r[0], "mime": r[1], "data": data}
         except Exception: return None
 
     def docs_delete(self, doc_id):
         b = self._pg()
         if b is None: return False
         try:
-            b.exec('DELETE FROM onboarding_docs WHERE id=%s', (int(doc_id),)); return True
+            with b.transaction() as cur:
+                cur.execute('DELETE FROM onboarding_docs WHERE id=%s RETURNING storage_key', (int(doc_id),))
+                keys = [r[0] for r in cur.fetchall()]
         except Exception: return False
+        self._drop_orphan_blobs(keys)
+        return True
+
+    def _drop_orphan_blobs(self, keys):
+        """刪列 commit 後呼叫：另開短交易持鎖重查引用，無引用的 blob 才刪；失敗只留孤兒 blob，不影響刪除結果。"""
+        try: drop_orphan_blobs(self._pg().transaction, self._blobs(), keys)
+        except Exception: pass
 
     def hr_update_status(self, email, status, details=None):
         try:
-            cell = self.ws_resumes.find(email, in_column=1)
-            if cell:
-                r = cell.row
-                headers = [h.strip().lower() for h in self.ws_resumes.row_values(1)]
-                updates = {}
-                if 'status' in headers:
-                    updates['status'] = status
-                if details:
-                    for k, v in details.items():
-                        if k in headers:
-                            updates[k] = str(v) if v else ""
-                self._apply_updates(self.ws_resumes, r, headers, updates)  # 批次寫入
-                _invalidate_cache()
+            headers = self._headers(self.ws_resumes)
+            updates = {}
+            if 'status' in headers:
+                updates['status'] = status
+            if details:
+                for k, v in details.items():
+                    if k in headers:
+                        updates[k] = str(v) if v else ""
+            if self._update_row(self.ws_resumes, email, updates):  # 批次寫入
+                _invalidate_cache("resumes", email)
                 return True, "OK"
             return False, "Fail"
         except Exception as e: return False, str(e)
 
     def delete_user_account(self, email):
-        """刪除求職者帳號：resumes + users 兩表對應列。防護：已開放到職文件(docs_enabled=Y)不可刪。回傳 (bool, msg)。"""
+        """刪除單一求職者帳號，回傳 (bool, msg)；規則同 delete_user_accounts。"""
+        email = str(email).strip()
+        return self.delete_user_accounts([email]).get(email, (False, "未指定 email"))
+
+    def delete_user_accounts(self, emails):
+        """批次刪除求職者帳號(resumes + users)，回傳 {email: (bool, msg)}。防護：已開放到職文件(docs_enabled=Y)不可刪。
+        PG：同一交易以 lower(email) = ANY(...) 一次刪除，連同簽名、到職文件、待辦對照；Sheets 逐筆刪。"""
+        emails = [str(e).strip() for e in emails if str(e).strip()]
+        b = self._pg()
+        if b is None:
+            out = {e: self._delete_account_rows(e) for e in emails}
+        else:
+            try:
+                keys = sorted({e.lower() for e in emails})
+                blob_keys = []
+                with b.transaction() as cur:
+                    cur.execute("SELECT lower(email) FROM resumes WHERE lower(email) = ANY(%s) "
+                                "AND upper(trim(docs_enabled)) = 'Y'", (keys,))
+                    locked = {r[0] for r in cur.fetchall()}
+                    gone = [k for k in keys if k not in locked]
+                    if gone:
+                        for sql in ('DELETE FROM resumes WHERE lower(email) = ANY(%s)',
+                                    'DELETE FROM users WHERE lower(email) = ANY(%s)',
+                                    'DELETE FROM resume_signatures WHERE lower(email) = ANY(%s)',
+                                    'DELETE FROM todo_refs WHERE lower(cand_email) = ANY(%s)',
+                                    'DELETE FROM pdf_cache WHERE lower(email) = ANY(%s)'):
+                            cur.execute(sql, (gone,))
+                        cur.execute('DELETE FROM onboarding_docs WHERE lower(email) = ANY(%s) RETURNING storage_key',
+                                    (gone,))
+                        blob_keys = [r[0] for r in cur.fetchall()]
+                self._drop_orphan_blobs(blob_keys)
+                out = {e: (False, "已開放到職文件，不可刪除") if e.lower() in locked else (True, "OK")
+                       for e in emails}
+            except Exception as e:
+                out = {x: (False, str(e)) for x in emails}
+        _done = [e for e, (ok, _) in out.items() if ok]
+        if _done:
+            _invalidate_cache("users", _done); _invalidate_cache("resumes", _done)
+        return out
+
+    def _delete_account_rows(self, email):
+        """Sheets：逐表找列刪除。"""
         try:
-            email = str(email).strip()
-            cell_r = self.ws_resumes.find(email, in_column=1)
-            if cell_r:
-                headers = [h.strip().lower() for h in self.ws_resumes.row_values(1)]
-                if 'docs_enabled' in headers:
-                    dv = self.ws_resumes.cell(cell_r.row, headers.index('docs_enabled') + 1).value
-                    if str(dv).strip().upper() == 'Y':
-                        return False, "已開放到職文件，不可刪除"
-                self.ws_resumes.delete_rows(cell_r.row)
-            cell_u = self.ws_users.find(email, in_column=1)
-            if cell_u:
-                self.ws_users.delete_rows(cell_u.row)
-            _invalidate_cache()
+            row_r = self._get_row(self.ws_resumes, email)
+            if row_r is not None:
+                if str(row_r.get('docs_enabled', '')).strip().upper() == 'Y':
+                    return False, "已開放到職文件，不可刪除"
+                self._delete_row(self.ws_resumes, email)
+            self._delete_row(self.ws_users, email)
             return True, "OK"
         except Exception as e:
             return False, str(e)
 
-    def get_logo(self):
-        try:
-            cell = self.ws_settings.find("logo", in_column=1)
-            if cell: return self.ws_settings.cell(cell.row, 2).value
-        except: pass
-        return None
-
     def update_logo(self, base64_str):
         try:
-            try: cell = self.ws_settings.find("logo", in_column=1)
-            except: time.sleep(1); cell = self.ws_settings.find("logo", in_column=1)
-            if cell: self.ws_settings.update_cell(cell.row, 2, base64_str)
-            else: self.ws_settings.append_row(["logo", base64_str])
+            try: found = self._update_row(self.ws_settings, "logo", {"value": base64_str}, key_col="key")
+            except: time.sleep(1); found = self._update_row(self.ws_settings, "logo", {"value": base64_str}, key_col="key")
+            if not found: self.ws_settings.append_row(["logo", base64_str])
+            _invalidate_cache("system_settings", "logo")
             return True
         except: return False
 
-    def get_setting(self, key):
-        """讀 system_settings 單一設定值(字串)；無則 None。"""
+    def get_settings(self):
+        """整張 system_settings 讀成 {key: value}(一條查詢)；供設定快照快取。"""
         try:
-            cell = self.ws_settings.find(str(key), in_column=1)
-            if cell:
-                return self.ws_settings.cell(cell.row, 2).value
+            df = self.get_df("system_settings")
+            return {str(k).strip(): v for k, v in zip(df['key'], df['value']) if str(k).strip()}
         except Exception:
-            pass
-        return None
+            return {}
 
     def set_setting(self, key, value):
         """寫 system_settings 單一設定值(存在則更新，否則新增)。"""
         try:
-            cell = self.ws_settings.find(str(key), in_column=1)
-            if cell: self.ws_settings.update_cell(cell.row, 2, str(value))
-            else: self.ws_settings.append_row([str(key), str(value)])
-            _invalidate_cache()
+            if not self._update_row(self.ws_settings, str(key), {"value": str(value)}, key_col="key"):
+                self.ws_settings.append_row([str(key), str(value)])
+            _invalidate_cache("system_settings", str(key))
             return True
         except Exception:
             return False
@@ -850,7 +1522,7 @@ def _todo_api_post(url, token, payload):
 def _emp_id_of(email):
     """由 PM/admin email 取員工編號(數字字串)；查不到或非數字回 None。"""
     try:
-        df = load_df("users")
+        df = load_df("users", USER_LIST_COLS)
         if df.empty or 'emp_id' not in df.columns:
             return None
         u = df[df['email'].astype(str).str.strip().str.lower() == str(email).strip().lower()]
@@ -898,7 +1570,7 @@ def _todo_notify(cand_email, pm_email, event, desc):
     pm_email = str(pm_email or "").strip()
     if not pm_email or '@' not in pm_email:
         return
-    url = sys.get_setting("todo_create_url"); token = sys.get_setting("todo_create_token")
+    url = _setting("todo_create_url"); token = _setting("todo_create_token")
     if not str(url or "").strip() or not str(token or "").strip():
         return
     eid = _emp_id_of(pm_email)
@@ -918,17 +1590,16 @@ def _mgmt_import(cand_email, cand_no):
     待文件補上後，於此組裝 payload 並呼叫 API（建議 URL/Token 存 system_settings：
     mgmt_import_url / mgmt_import_token，比照待辦 API 作法；文件與影像用 docs 逐一上傳）：
 
-        url   = sys.get_setting("mgmt_import_url")
-        token = sys.get_setting("mgmt_import_token")
-        row   = load_df("resumes") 取該 cand_email 的整列人員資料
+        url   = _setting("mgmt_import_url")
+        token = _setting("mgmt_import_token")
+        row   = sys.get_resume(cand_email)           # 該求職者的整列人員資料
         docs  = sys.docs_list(cand_email)          # 逐一取 _cached_doc(id)['data'] 上傳
         payload = { "CandNo": cand_no, ...人員資料..., ...文件... }
         r = _todo_api_post(url, token, payload)    # 或改用專用 client
     """
     cand_no = str(cand_no).strip()
     sys._update_resume_fields(cand_email, {"mgmt_cand_no": cand_no})
-    _invalidate_cache()
-    url = sys.get_setting("mgmt_import_url"); token = sys.get_setting("mgmt_import_token")
+    url = _setting("mgmt_import_url"); token = _setting("mgmt_import_token")
     if not str(url or "").strip() or not str(token or "").strip():
         return True, f"已儲存求職者編號 {cand_no}；管理系統匯入 API 尚未設定（接口已預留，待技術文件補上後啟用）"
     # TODO：技術文件補上後於此組裝 payload 並呼叫 API
@@ -936,7 +1607,7 @@ def _mgmt_import(cand_email, cand_no):
 
 def _todo_cancel(cand_email, event):
     """取消 (求職者,事件) 對應的待辦（呼叫管理系統 Cancel API 並清對照）。"""
-    url = sys.get_setting("todo_cancel_url"); token = sys.get_setting("todo_cancel_token")
+    url = _setting("todo_cancel_url"); token = _setting("todo_cancel_token")
     if not str(url or "").strip() or not str(token or "").strip():
         return   # 未設定取消 API → 不動對照，避免遺失 TodoId
     tid = sys.todo_ref_pop(cand_email, event)
@@ -965,291 +1636,489 @@ def send_email(to_email, subject, body, html_body=None):
     except Exception as e:
         return False, str(e)
 
-# --- PDF Generation ---
-def generate_pdf(data):
-    buffer = io.BytesIO()
+# --- 效能：DB 讀取快取 + PDF 快取（寫入時自動失效）---
+# 各分頁實際用到的欄位（投影讀取）：列表頁只撈要顯示的欄，不把 signature(base64 PNG)、
+# self_intro、top3_conditions 等大欄位拉進記憶體與快取。整列內容(PDF/審核明細)才讀全欄。
+USER_LIST_COLS = ("email", "name", "role", "creator_email", "created_at", "emp_id", "unit", "active")
+RESUME_FORM_COLS = ("email", "status", "name_cn", "interview_dept", "resume_type", "hr_comment",
+                    "docs_enabled", "signed_at", "mgmt_cand_no")
+RESUME_DOCS_COLS = ("email", "status", "name_cn", "docs_enabled", "docs_submitted_at")
+
+# 跨實例快取失效：版本號見 cache_versions.py；本檔負責 LISTEN 執行緒與寫入後的 NOTIFY。
+class _CacheListener(threading.Thread):
+    """專用連線(不佔連線池) LISTEN resume_cache；斷線指數退避重連，重連後全部表視為過期(期間可能漏接通知)。"""
+    def __init__(self, versions):
+        super().__init__(name="cache-listener", daemon=True)
+        self.v = versions
+
+    def _handle(self, payload):
+        try: d = json.loads(payload or "{}")
+        except ValueError: d = {}
+        if d.get("origin") == _INSTANCE_ID:
+            return   # 本實例寫入時已自行遞增
+        self.v.received += 1
+        t = d.get("table")
+        if t in _CACHE_TABLES:
+            self.v.bump(t, d.get("key"))
+        else:
+            self.v.bump()
 
-    # ── 字型（先決定，供頁首頁尾 callback 使用）─────────────────────
-    font_name = 'Helvetica'
-    try:
-        pdfmetrics.registerFont(TTFont('TaipeiSans', 'TaipeiSansTCBeta-Regular.ttf'))
-        font_name = 'TaipeiSans'
-    except: pass
-
-    # ── 頁首頁尾 callback（D2）────────────────────────────────────
-    def _draw_page(c, doc):
-        c.saveState()
-        c.setFont(font_name, 7)
-        c.setFillColor(colors.HexColor('#1F3864'))
-        c.drawString(30, A4[1] - 16, "聯成電腦 人才招募系統")
-        c.drawRightString(A4[0] - 30, A4[1] - 16, datetime.now().strftime('%Y/%m/%d'))
-        c.setStrokeColor(colors.HexColor('#AAAAAA'))
-        c.setLineWidth(0.3)
-        c.line(30, A4[1] - 20, A4[0] - 30, A4[1] - 20)
-        c.line(30, 20, A4[0] - 30, 20)
-        c.setFont(font_name, 7)
-        c.setFillColor(colors.HexColor('#888888'))
-        c.drawCentredString(A4[0] / 2, 8, f"第 {doc.page} 頁")
-        c.restoreState()
-
-    _title_text = "聯成電腦面試人員履歷表" if data.get('resume_type') != 'Branch' else "聯成電腦 (分公司) 面試人員履歷表"
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=42, bottomMargin=30)
-    # ── PDF Metadata（D4）─────────────────────────────────────────
-    doc.title = _title_text
-    doc.author = "聯成電腦 人資部"
-    doc.subject = "面試人員履歷表"
-    doc.creator = "聯成電腦人才招募系統"
-    elements = []
-
-    # ── 色彩 ──────────────────────────────────────────────────────
-    HDR_BG = colors.HexColor('#1F3864')   # 深藍 – 區塊標題背景
-    LBL_BG = colors.HexColor('#BDD7EE')   # 淡藍 – 標籤欄背景
-
-    # ── 樣式 ──────────────────────────────────────────────────────
-    styleN = ParagraphStyle('Normal', fontName=font_name, fontSize=10, leading=14)
-    styleH = ParagraphStyle('Heading1', fontName=font_name, fontSize=16, leading=20, alignment=TA_CENTER)
-    styleS = ParagraphStyle('Small',   fontName=font_name, fontSize=9,  leading=13)
-
-    # ── 輔助：深藍色區塊標題列 ────────────────────────────────────
-    def sec_hdr(text, width=535):
-        t = Table([[text]], colWidths=[width])
-        t.setStyle(TableStyle([
-            ('BACKGROUND',    (0,0), (-1,-1), HDR_BG),
-            ('TEXTCOLOR',     (0,0), (-1,-1), colors.white),
-            ('FONTNAME',      (0,0), (-1,-1), font_name),
-            ('FONTSIZE',      (0,0), (-1,-1), 10),
-            ('TOPPADDING',    (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-            ('LEFTPADDING',   (0,0), (-1,-1), 8),
-            ('RIGHTPADDING',  (0,0), (-1,-1), 8),
-        ]))
-        return t
-
-    # ── 共用標籤欄樣式（4欄表格：col 0, col 2 為標籤）────────────
-    lbl_style = TableStyle([
-        ('FONTNAME',      (0,0), (-1,-1), font_name),
-        ('FONTSIZE',      (0,0), (-1,-1), 9),
-        ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND',    (0,0), (0,-1),  LBL_BG),
-        ('BACKGROUND',    (2,0), (2,-1),  LBL_BG),
-        ('ALIGN',         (0,0), (-1,-1), 'LEFT'),
-        ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING',    (0,0), (-1,-1), 5),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 5),
-        ('LEFTPADDING',   (0,0), (-1,-1), 6),
-    ])
-
-    # ── 輔助：把文字包成 Paragraph，長文字自動換行不超出格線 ────────
-    styleC = ParagraphStyle('Cell', fontName=font_name, fontSize=8, leading=11)
-
-    def wp(text):
-        return Paragraph(str(text) if text else '', styleC)
-
-    # ── 標題 ──────────────────────────────────────────────────────
-    title = "聯成電腦面試人員履歷表" if data.get('resume_type') != 'Branch' else "聯成電腦 (分公司) 面試人員履歷表"
-    elements.append(Paragraph(title, styleH))
-    elements.append(Spacer(1, 8))
-
-    # ── 1. 基本資料（全寬 535pt，無照片欄）──────────────────────
-    elements.append(sec_hdr("▌ 基本資料"))
-    elements.append(Spacer(1, 2))
-
-    p_data = [
-        ["姓　名",   wp(f"{data.get('name_cn','')}  {data.get('name_en','')}"),
-         "面試單位", wp(str(data.get('interview_unit','') or '一般人員'))],
-        ["電子信箱", wp(data.get('email','')),
-         "聯絡電話", wp(data.get('phone',''))],
-        ["出生日期", wp(f"{data.get('dob','')}  {_zodiac_of(data.get('dob',''))}"),
-         "婚姻/血型", wp(f"{data.get('marital_status','')} / {data.get('blood_type','')}")],
-        ["通訊地址", wp(data.get('address','')),
-         "緊急聯絡", wp(f"{data.get('emergency_contact','')} {data.get('emergency_phone','')}")],
-        ["語言能力", wp(_lang_summary(data)),
-         "交通方式", wp(f"{data.get('commute_method','')} 約{data.get('commute_time','')}分")],
-    ]
-    info_tbl = Table(p_data, colWidths=[75, 192, 75, 193])
-    info_tbl.setStyle(lbl_style)
-    elements.append(info_tbl)
-    elements.append(Spacer(1, 8))
-
-    # ── 2. 學歷 ───────────────────────────────────────────────────
-    elements.append(sec_hdr("▌ 學歷"))
-    edu_data = [["起訖年月", "學校名稱", "科系", "學位", "狀態"]]
-    for i in range(1, 4):
-        s = data.get(f'edu_{i}_school', '')
-        if not s: continue
-        s_date = f"{data.get(f'edu_{i}_start','')} ~ {data.get(f'edu_{i}_end','')}"
-        edu_data.append([wp(s_date), wp(s), wp(data.get(f'edu_{i}_major','')),
-                         wp(data.get(f'edu_{i}_degree','')), wp(data.get(f'edu_{i}_state',''))])
-    t2 = Table(edu_data, colWidths=[100, 155, 130, 80, 70])
-    t2.setStyle(TableStyle([
-        ('FONTNAME',      (0,0), (-1,-1), font_name),
-        ('FONTSIZE',      (0,0), (-1,-1), 9),
-        ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND',    (0,0), (-1, 0), LBL_BG),
-        ('ALIGN',         (0,0), (-1,-1), 'LEFT'),
-        ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING',    (0,0), (-1,-1), 4),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-    ]))
-    elements.append(Spacer(1, 2))
-    elements.append(t2)
-    elements.append(Spacer(1, 8))
-
-    # ── 3. 工作經歷 ───────────────────────────────────────────────
-    elements.append(sec_hdr("▌ 工作經歷"))
-    styleXS = ParagraphStyle('XS', fontName=font_name, fontSize=7, leading=10)
-    def wpx(text):
-        return Paragraph(str(text) if text else '', styleXS)
-    exp_data = [["起訖年月", "公司名稱", "職稱", "主管/電話", "薪資", "離職原因"]]
-    for i in range(1, 5):
-        co = data.get(f'exp_{i}_co', '')
-        if not co: continue
-        s_date = f"{data.get(f'exp_{i}_start','')} ~ {data.get(f'exp_{i}_end','')}"
-        boss = f"{data.get(f'exp_{i}_boss','')} {data.get(f'exp_{i}_phone','')}"
-        exp_data.append([wpx(s_date), wpx(co), wpx(data.get(f'exp_{i}_title','')),
-                         wpx(boss), wpx(data.get(f'exp_{i}_salary','')),
-                         wpx(data.get(f'exp_{i}_reason',''))])
-    t3 = Table(exp_data, colWidths=[80, 100, 70, 110, 55, 120])
-    t3.setStyle(TableStyle([
-        ('FONTNAME',      (0,0), (-1,-1), font_name),
-        ('FONTSIZE',      (0,0), (-1,-1), 8),
-        ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND',    (0,0), (-1, 0), LBL_BG),
-        ('ALIGN',         (0,0), (-1,-1), 'LEFT'),
-        ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING',    (0,0), (-1,-1), 4),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-    ]))
-    elements.append(Spacer(1, 2))
-    elements.append(t3)
-    elements.append(Spacer(1, 8))
-
-    # ── 4. 其他資料 ───────────────────────────────────────────────
-    elements.append(sec_hdr("▌ 其他資料"))
-    other_data = [
-        ["應徵管道", wp(data.get('source','')),         "任職親友", wp(data.get('relative_name',''))],
-        ["補教經驗", wp(data.get('teach_exp','')),       "出國史",   wp(data.get('travel_history',''))],
-        ["兵　　役", wp(data.get('military_status','')), "慢性病",   wp(data.get('chronic_disease',''))],
-        ["獨力扶養", wp(data.get('family_support','')),  "獨力負擔", wp(data.get('family_debt',''))],
-    ]
-    t4 = Table(other_data, colWidths=[65, 202, 65, 203])
-    t4.setStyle(lbl_style)
-    elements.append(Spacer(1, 2))
-    elements.append(t4)
-    elements.append(Spacer(1, 8))
-
-    # ── 5. 分公司排班（Branch 限定）──────────────────────────────
-    if data.get('resume_type') == 'Branch':
-        elements.append(sec_hdr("▌ 分公司排班意願調查"))
-        br_data = [
-            ["希望區域",             data.get('branch_region','')],
-            ["希望分校",             data.get('branch_location','')],
-            ["配合輪調",             data.get('accept_rotation','')],
-            ["配合輪班",             data.get('shift_avail','')],
-            ["國定假日輪值",         data.get('holiday_shift','')],
-            ["早晚輪班(9-18/14-22)", data.get('rotate_shift','')],
-            ["家人同意輪班",         data.get('family_support_shift','')],
-            ["經濟/扶養需求",        f"扶養: {data.get('care_dependent','')} / 負擔: {data.get('financial_burden','')}"],
-        ]
-        t5 = Table(br_data, colWidths=[150, 385])
-        t5.setStyle(TableStyle([
-            ('FONTNAME',      (0,0), (-1,-1), font_name),
-            ('FONTSIZE',      (0,0), (-1,-1), 9),
-            ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND',    (0,0), (0,-1),  LBL_BG),
-            ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-            ('TOPPADDING',    (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-            ('LEFTPADDING',   (0,0), (-1,-1), 6),
-        ]))
-        elements.append(Spacer(1, 2))
-        elements.append(t5)
-        elements.append(Spacer(1, 8))
-
-    # ── 6. 專業技能與自傳 ─────────────────────────────────────────
-    elements.append(sec_hdr("▌ 專業技能與自傳"))
-    bio_data = [
-        ["專業技能", Paragraph(str(data.get('skills','')),    styleS)],
-        ["成就特質", Paragraph(str(data.get('self_intro','')), styleS)],
-        ["條件優勢", Paragraph(str(data.get('top3_conditions','')), styleS)],
-    ]
-    t6 = Table(bio_data, colWidths=[65, 470])
-    t6.setStyle(TableStyle([
-        ('FONTNAME',      (0,0), (-1,-1), font_name),
-        ('FONTSIZE',      (0,0), (-1,-1), 9),
-        ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND',    (0,0), (0,-1),  LBL_BG),
-        ('VALIGN',        (0,0), (-1,-1), 'TOP'),
-        ('TOPPADDING',    (0,0), (-1,-1), 5),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 5),
-        ('LEFTPADDING',   (0,0), (-1,-1), 6),
-    ]))
-    elements.append(Spacer(1, 2))
-    elements.append(t6)
-    elements.append(Spacer(1, 16))
-
-    # ── 7. 簽名行 ─────────────────────────────────────────────────
-    elements.append(Paragraph("─" * 60, styleN))
-    elements.append(Spacer(1, 6))
-    elements.append(Paragraph("本人所填資料均屬事實，若有不實，願接受免職處分。", styleN))
-    _sig_b64 = str(data.get('signature', '')).strip()
-    _signed_at = str(data.get('signed_at', '')).strip()
-    _blank_sign = "應徵人員親簽：＿＿＿＿＿＿＿＿＿　日期：　　　年　　月　　日"
-    if _sig_b64:
-        try:
-            _raw = _sig_b64.split(',', 1)[1] if _sig_b64.startswith('data:') else _sig_b64
-            _sig_buf = io.BytesIO(base64.b64decode(_raw))
-            elements.append(Spacer(1, 4))
-            elements.append(Paragraph("應徵人員親簽：", styleN))
-            elements.append(PDFImage(_sig_buf, width=160, height=60))
-            elements.append(Paragraph(f"簽署日期：{_signed_at}", styleN))
-        except Exception:
-            elements.append(Paragraph(_blank_sign, styleN))
-    else:
-        elements.append(Paragraph(_blank_sign, styleN))
+    def run(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = _psycopg2.connect(**_pg_conn_kwargs())
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {_CACHE_CHANNEL}")
+                self.v.bump()
+                self.v.listening = True
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 60)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            self._handle(conn.notifies.pop(0).payload)
+                    else:
+                        with conn.cursor() as cur:   # 閒置時確認連線仍活著
+                            cur.execute("SELECT 1")
+            except Exception:
+                self.v.listening = False
+                self.v.reconnects += 1
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if conn is not None:
+                    try: conn.close()
+                    except Exception: pass
+
+@st.cache_resource
+def _cache_versions():
+    v = CacheVersions()
+    if os.environ.get("DB_BACKEND", "").strip().lower() == "postgres" and _PSYCOPG2_OK:
+        _CacheListener(v).start()
+    return v
+
+class _DeltaSnapshots:
+    """load_df 的增量快照(PG + migration 4)：每個 (表, 投影) 保留一份 DataFrame(index=_rn)。
+    版本號沒變直接回快照；變了只撈 _seq 之後異動的列與刪除記錄，就地補丁(一次存檔 ≈ 一列傳輸)。
+    下限採「前一次」的水位，讓讀取當下尚未 commit 的交易在下一次刷新補上；每小時整表重載一次兜底。"""
+    FULL_RELOAD_SEC = 3600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._snaps = {}
+        self.full = 0
+        self.delta = 0
+        self.delta_rows = 0
+
+    def get(self, table, columns, stamp):
+        """回傳最新快照 DataFrame(index=_rn)；不支援增量時回 None。"""
+        key = (table, columns)
+        with self._lock:
+            klock = self._key_locks.setdefault(key, threading.Lock())
+        with klock:
+            snap = self._snaps.get(key)
+            if snap is not None and snap["stamp"] == stamp:
+                return snap["df"]
+            if snap is not None and time.time() - snap["loaded"] <= self.FULL_RELOAD_SEC:
+                snap = self._patch(snap, table, columns, stamp)
+            else:
+                snap = None
+            if snap is None:
+                res = sys.changes_since(table, 0, columns)
+                if res is None: return None
+                cols, rows, _, top = res
+                snap = {"df": self._frame(cols, rows), "seq": top, "floor": top,
+                        "loaded": time.time(), "stamp": stamp}
+                self.full += 1
+            self._snaps[key] = snap
+            return snap["df"]
+
+    def _patch(self, snap, table, columns, stamp):
+        """套用 floor 之後的異動；欄位結構變了回 None(改整表重載)。"""
+        res = sys.changes_since(table, snap["floor"], columns)
+        if res is None: return None
+        cols, rows, deleted, top = res
+        df = snap["df"]
+        if list(cols) != list(df.columns):
+            return None
+        if deleted:
+            df = df.drop(index=[rn for rn in deleted if rn in df.index])
+        if rows:
+            ch = self._frame(cols, rows)
+            df = pd.concat([df.drop(index=ch.index, errors="ignore"), ch]).sort_index()
+        self.delta += 1
+        self.delta_rows += len(rows) + len(deleted)
+        return dict(snap, df=df, floor=snap["seq"], seq=max(top, snap["seq"]), stamp=stamp)
+
+    @staticmethod
+    def _frame(cols, rows):
+        return pd.DataFrame([r[1:] for r in rows], columns=cols, index=[r[0] for r in rows])
 
+@st.cache_resource
+def _delta_snapshots():
+    return _DeltaSnapshots()
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def _load_df(table_name, columns, stamp):
+    return sys.get_df(table_name, columns=columns)
+
+def load_df(table_name, columns=None):
+    """快取版讀取；依該表版本號判斷是否過期，任何實例寫入後版本遞增即刷新，確保即時。
+    PG 走增量快照(只補異動列)，Sheets/舊 schema 走整表讀取快取。
+    取代散落各頁的 sys.get_df()，避免每次 Streamlit rerun(每個 widget 互動)重複整表讀取。
+    columns(tuple) 指定投影欄位，不同投影各自快取。"""
+    stamp = _cache_versions().stamp(table_name)
+    try:
+        df = _delta_snapshots().get(table_name, columns, stamp)
+    except Exception:
+        df = None
+    if df is None:
+        return _load_df(table_name, columns, stamp)
+    return df.reset_index(drop=True)
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def _load_resume(email, stamp):
+    return sys.get_resume(email)
+
+@st.cache_resource(ttl=3600, max_entries=4, show_spinner=False)
+def _load_settings(stamp):
+    """唯讀快照，所有 session 共用同一物件(cache_resource 不複製)；_setting 每次呼叫不再整份反序列化(含 base64 logo)。"""
+    return types.MappingProxyType(sys.get_settings())
+
+def _setting(key):
+    """讀設定值(無則 None)：整張 system_settings 一份快照，set_setting/update_logo(含其他實例)遞增版本才重讀；
+    待辦通知、API Token、logo 等每次互動都會讀的設定不再逐鍵查 DB。"""
+    return _load_settings(_cache_versions().stamp("system_settings")).get(str(key))
+
+@st.cache_data(ttl=3600, max_entries=2048, show_spinner=False)
+def _load_signature_version(email, stamp):
+    return sys.signature_version(email)
+
+def signature_version(email):
+    """快取版 sys.signature_version：save_signature 失效該求職者的 resumes 列版本，key 同 load_resume；
+    審核列表每次 rerun 不再逐筆已簽名列查 DB。"""
+    email = str(email).strip()
+    return _load_signature_version(email, _cache_versions().key_stamp("resumes", email))
+
+def load_resume(email):
+    """快取版 sys.get_resume：每位求職者一份小快取，只有該列(或整表批次)寫入才失效；
+    求職者頁每次 rerun 只讀自己那一列。"""
+    email = str(email).strip()   # 保留原大小寫：PG 主鍵精確比對；key_stamp 自行正規化
+    return _load_resume(email, _cache_versions().key_stamp("resumes", email))
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def _load_candidates(pm_email, statuses, month_from, month_to, columns, stamp):
+    return sys.query_candidates(pm_email, statuses, month_from, month_to, columns)
+
+def load_candidates(pm_email=None, statuses=None, month_from=None, month_to=None, columns=None):
+    """快取版 sys.query_candidates；statuses/columns 請傳 tuple(可雜湊)。"""
+    return _load_candidates(pm_email, statuses, month_from, month_to, columns,
+                            _cache_versions().stamp("users", "resumes"))
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def _load_candidate_months(pm_email, stamp):
+    return sys.candidate_months(pm_email)
+
+def load_candidate_months(pm_email=None):
+    return _load_candidate_months(pm_email, _cache_versions().stamp("users"))
+
+def _invalidate_cache(table=None, key=None):
+    """寫入後呼叫：本實例立即遞增版本(舊快取不再命中)，並 NOTIFY 其他實例。
+    依寫入範圍指定 table(+key)：只淘汰依賴該表/該列的快取，其他分頁與 session 的快取照常命中。
+    table=None 代表全部表；key=None 代表整表(批次改多列)。"""
     try:
-        qr = PDFImage("qrcode.png", width=60, height=60)
-        elements.append(Spacer(1, 10))
-        elements.append(qr)
-    except: pass
+        b = sys._pg()
+    except Exception:
+        b = None
+    invalidate(_cache_versions(), b, table, key)
+
+# 到職文件下載快取：每份最多 MAX_DOC_MB，st.cache_data 只能限筆數不能限容量，PM 連續調閱多位求職者會讓記憶體一路長到被 Cloud Run 砍掉。
+# 改用本實例共用(cache_resource)、依總 bytes 上限(DOC_CACHE_MAX_MB，預設 64)淘汰最久未用的 LRU。
+# 文件依 id 不可變(只有新增/刪除)，不需 ttl；刪除時 discard。
+class _ByteLRU:
+    """依總位元組數設上限的 LRU，統計命中/未命中/淘汰次數。"""
+    def __init__(self, max_bytes):
+        from collections import OrderedDict
+        self.max_bytes = max_bytes
+        self._d = OrderedDict()   # key → (值, 大小)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, loader, sizeof=len):
+        with self._lock:
+            if key in self._d:
+                self._d.move_to_end(key)
+                self.hits += 1
+                return self._d[key][0]
+            self.misses += 1
+        val = loader()   # 讀 DB 不持鎖，其他 session 的命中不必等
+        if val is None:
+            return None
+        size = sizeof(val)
+        if size > self.max_bytes:
+            return val
+        with self._lock:
+            if key in self._d:
+                self.bytes -= self._d.pop(key)[1]
+            self._d[key] = (val, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, sz) = self._d.popitem(last=False)
+                self.bytes -= sz
+                self.evictions += 1
+        return val
 
-    doc.build(elements, onFirstPage=_draw_page, onLaterPages=_draw_page)
-    buffer.seek(0)
-    return buffer
+    def discard(self, key):
+        with self._lock:
+            if key in self._d:
+                self.bytes -= self._d.pop(key)[1]
 
-# --- 效能：DB 讀取快取 + PDF 快取（寫入時自動失效）---
-@st.cache_data(ttl=30, show_spinner=False)
-def load_df(table_name):
-    """快取版讀取(ttl 30s)；任何寫入後由 _invalidate_cache() 清除，確保即時。
-    取代散落各頁的 sys.get_df()，避免每次 Streamlit rerun(每個 widget 互動)重複整表讀取。"""
-    return sys.get_df(table_name)
+    def stats(self):
+        with self._lock:
+            return dict(entries=len(self._d), bytes=self.bytes, max_bytes=self.max_bytes,
+                        hits=self.hits, misses=self.misses, evictions=self.evictions)
 
-def _invalidate_cache():
-    try: load_df.clear()
-    except Exception: pass
+@st.cache_resource
+def _doc_cache():
+    return _ByteLRU(int(float(os.environ.get("DOC_CACHE_MAX_MB", "64")) * 1024 * 1024))
 
-@st.cache_data(ttl=300, show_spinner=False)
 def _cached_doc(doc_id):
-    """依 doc_id 快取到職文件 bytes(下載用)，避免每次 rerun 重讀 bytea。"""
-    return sys.docs_get(doc_id)
+    """依 doc_id 快取到職文件 {filename, mime, data}(下載用)，避免每次 rerun 重讀 bytea。"""
+    return _doc_cache().get(int(doc_id), lambda: sys.docs_get(doc_id), sizeof=lambda d: len(d['data']))
+
+@st.cache_data(ttl=600, max_entries=128, show_spinner=False)
+def _cached_pdf_bytes(digest, _data):
+    """程序內 PDF 快取，key 只有內容雜湊(_data 不參與雜湊)；資料一變動雜湊就變、自動重建，
+    避免審核列表每次 rerun 都對每筆履歷重跑 generate_pdf(高 CPU)。未命中再查 PG 持久快取。"""
+    return _pdf_bytes(digest, _data)
+
+def _pdf_bytes(digest, data):
+    """PG 持久快取(各實例共用)只存未簽名底稿 → 沒有才 generate_pdf 並寫回。
+    已簽名(有 signed_at)者讀底稿後疊上簽名圖層(stamp_signature，毫秒級)；簽名/重簽不必重排整份履歷。"""
+    email = data.get('email', '')
+    signed_at = str(data.get('signed_at', '')).strip()
+    base = _pdf_base(*(_pdf_base_key(data) if signed_at else (digest, data)))
+    sig = sys.get_signature(email) if signed_at else None
+    return _stamp_or_base(base, sig, signed_at)
+
+def _pdf_base(digest, data):
+    """未簽名底稿：PG 持久快取沒有才 generate_pdf 並寫回。"""
+    base = sys.pdf_cache_get(digest)
+    if base is None:
+        base = generate_pdf(data).getvalue()
+        sys.pdf_cache_put(digest, base, data.get('email', ''))
+    return base
+
+def _stamp_or_base(base, sig, signed_at):
+    """疊簽名圖層；簽名圖壞掉或底稿無錨點時退回未簽名底稿(同舊版套印失敗印空白簽名欄)。"""
+    if not sig:
+        return base
+    try:
+        return stamp_signature(base, sig, signed_at)
+    except Exception:
+        return base
 
-@st.cache_data(ttl=600, show_spinner=False)
-def _cached_pdf_bytes(row_items):
-    """依整列內容快取 PDF bytes；資料一變動 key 就變、自動重建，
-    避免審核列表每次 rerun 都對每筆履歷重跑 generate_pdf(高 CPU)。"""
-    return generate_pdf(dict(row_items)).getvalue()
+def _pdf_key(row):
+    """整列 → (內容雜湊, 欄位 dict)，供 _cached_pdf_bytes(*_pdf_key(row))；只取 PDF_RENDERED_FIELDS，
+    signature(Sheets 後端仍帶 base64)與審核/文件狀態欄不進雜湊；已簽名者另帶簽名版本，
+    同一分鐘內重簽(signed_at 相同)也會換 key，不會拿到舊簽名的 PDF。"""
+    data = _pdf_fields(row)
+    parts = [PDF_RENDER_VERSION, sorted(data.items())]
+    if data['signed_at'].strip():
+        parts.append(signature_version(data['email']))
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest(), data
+
+def _pdf_fields(row):
+    """整列 → PDF_RENDERED_FIELDS 的字串 dict。"""
+    row = dict(row)
+    return {k: ("" if row.get(k) is None else str(row.get(k))) for k in PDF_RENDERED_FIELDS}
+
+def _pdf_base_key(data):
+    """未簽名底稿的 (雜湊, 欄位)：signed_at 清空；簽名前後、重簽共用同一份底稿。"""
+    return _pdf_key(dict(data, signed_at=""))
+
+# 背景預先產生 PDF：送出/核准/簽名後立即排入，PM 從通知信點進來時 PDF 已在 PG 持久快取，不必當場等 ReportLab。
+# 只在 PG 後端啟用(預產結果寫入各實例共用的 pdf_cache)；Sheets 無持久快取，排入即略過。
+class _PdfPrerender:
+    """單一背景執行緒池(PDF_PRERENDER_WORKERS，預設 1，0=停用)。同一 email(不分大小寫)排隊中不重複排入；
+    執行時才讀最新履歷，連續存檔只會產一次最後的版本。只產未簽名底稿，簽名圖層下載時才疊。"""
+    def __init__(self, workers):
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-prerender") if workers > 0 else None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.done = 0
+        self.cached = 0
+        self.failed = 0
+        self.skipped = 0
+        self.last_error = ""
+
+    def enqueue(self, email):
+        email = str(email or "").strip()   # 保留原大小寫：get_resume 在 PG 是主鍵精確比對
+        if self._pool is None or not email or sys._pg() is None:
+            return
+        with self._lock:
+            if email.lower() in self._pending:
+                return
+            self._pending.add(email.lower())
+        self._pool.submit(self._run, email)
+
+    def _run(self, email):
+        with self._lock:
+            self._pending.discard(email.lower())
+        try:
+            row = sys.get_resume(email)
+            if not row:   # 查無履歷(已刪除或 email 不符)：計入略過，診斷頁看得到
+                self.skipped += 1
+                self.last_error = f"{email}: 查無履歷"
+                return
+            digest, data = _pdf_base_key(row)   # 持久快取只存未簽名底稿；簽名下載時才疊圖層
+            if sys.pdf_cache_get(digest) is not None:
+                self.cached += 1
+                return
+            _pdf_base(digest, data)
+            self.done += 1
+        except Exception as e:   # 背景工作失敗不影響使用者；下載時仍會同步產生
+            self.failed += 1
+            self.last_error = f"{email}: {e}"
+
+    def stats(self):
+        with self._lock:
+            return dict(pending=len(self._pending), done=self.done, cached=self.cached,
+                        failed=self.failed, skipped=self.skipped)
+
+@st.cache_resource
+def _pdf_prerender():
+    return _PdfPrerender(int(os.environ.get("PDF_PRERENDER_WORKERS", "1")))
+
+# 批次匯出 PDF(ZIP)：ReportLab 是純 Python、受 GIL 限制，執行緒無法吃滿多核，改用子程序池平行產生。
+# spawn 子程序只 import resume_pdf 及其相依(pandas/reportlab/pypdf)，不載入 streamlit/app(tests/test_resume_pdf_imports.py 把關)；子程序直接寫暫存檔，主程序逐檔寫入磁碟上的 ZIP 後刪除，
+# 記憶體裡同時只有一份 PDF。ZIP 放在 /tmp(Cloud Run 為記憶體檔案系統)：下載後即刪，
+# 沒下載就離開的 session 由 _sweep_pdf_exports 依 PDF_EXPORT_TTL_SEC(預設 3600)清掉。
+@st.cache_resource
+def _pdf_process_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        cpus = len(os.sched_getaffinity(0))   # 本程序可用的 CPU(容器限制)，os.cpu_count() 是整台主機
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    n = int(os.environ.get("PDF_EXPORT_PROCS", "0")) or cpus
+    return ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn"))
+
+def _sweep_pdf_exports():
+    """刪除超過 PDF_EXPORT_TTL_SEC 的 pdf-export-* 暫存目錄(放棄下載的 session 留下的)。"""
+    import tempfile
+    ttl = float(os.environ.get("PDF_EXPORT_TTL_SEC", "3600"))
+    root = tempfile.gettempdir()
+    try:
+        names = [n for n in os.listdir(root) if n.startswith("pdf-export-")]
+    except OSError:
+        return
+    for n in names:
+        path = os.path.join(root, n)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def _drop_pdf_zip():
+    """下載鈕 on_click：檔案已交給瀏覽器，刪暫存目錄；保留筆數與失敗清單供畫面顯示。"""
+    z = st.session_state.get('pdfzip')
+    if z and z[0]:
+        shutil.rmtree(os.path.dirname(z[0]), ignore_errors=True)
+        st.session_state['pdfzip'] = (None,) + tuple(z[1:])
+
+def _pdf_zip_name(row):
+    nm = re.sub(r'[\\/:*?"<>|\s]+', '_', str(row.get('name_cn') or row.get('name') or '').strip())
+    return f"{nm or 'resume'}_{str(row.get('email', '')).strip()}.pdf"
+
+def _export_pdf_zip(rows, progress=None):
+    """rows=履歷列(dict) → (ZIP 暫存檔路徑, 失敗清單[(email, 原因)])。
+    底稿已在 PG 持久快取者直接用；其餘交子程序池產生底稿並寫回快取。已簽名者由主程序疊簽名圖層。
+    progress(完成數, 總數) 回報進度。"""
+    import tempfile, zipfile
+    from concurrent.futures import as_completed
+    from concurrent.futures.process import BrokenProcessPool
+    _sweep_pdf_exports()
+    tmpdir = tempfile.mkdtemp(prefix="pdf-export-")
+    zpath = os.path.join(tmpdir, "resumes.zip")
+    failures, total, done = [], len(rows), 0
+
+    def _tick():
+        nonlocal done
+        done += 1
+        if progress: progress(done, total)
+
+    with zipfile.ZipFile(zpath, "w", zipfile.ZIP_DEFLATED) as zf:
+        futs = {}
+        for i, row in enumerate(rows):
+            email = str(row.get('email', '')).strip()
+            try:
+                data = _pdf_fields(row)
+                signed_at = data['signed_at'].strip()
+                digest, base_data = _pdf_base_key(data)
+                sig = sys.get_signature(email) if signed_at else None
+                base = sys.pdf_cache_get(digest)
+                if base is not None:
+                    zf.writestr(_pdf_zip_name(row), _stamp_or_base(base, sig, signed_at)); _tick(); continue
+                path = os.path.join(tmpdir, f"{i}.pdf")
+                fut = _pdf_process_pool().submit(render_pdf_file, base_data, path)
+                futs[fut] = (email, _pdf_zip_name(row), digest, path, sig, signed_at)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool): _pdf_process_pool.clear()
+                failures.append((email, str(e))); _tick()
+        for fut in as_completed(futs):
+            email, name, digest, path, sig, signed_at = futs[fut]
+            try:
+                fut.result()
+                if sig or sys._pg() is not None:
+                    with open(path, "rb") as f:
+                        base = f.read()
+                    sys.pdf_cache_put(digest, base, email)
+                    zf.writestr(name, _stamp_or_base(base, sig, signed_at))
+                else:
+                    zf.write(path, name)
+            except Exception as e:   # 子程序崩潰(BrokenProcessPool)時換新池，下次匯出不受影響
+                if isinstance(e, BrokenProcessPool): _pdf_process_pool.clear()
+                failures.append((email, str(e) or type(e).__name__))
+            finally:
+                if os.path.exists(path): os.remove(path)
+                _tick()
+        if failures:
+            zf.writestr("_failures.txt", "\n".join(f"{e}\t{m}" for e, m in failures))
+    return zpath, failures
 
 # --- UI Components ---
+def _logo_digest(raw):
+    """logo 內容雜湊(對 system_settings 存的原值；api.py 算法相同)。"""
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _logo_bytes(digest, _raw):
+    """logo 影像 bytes，以內容雜湊為 key：同一張 logo 整個 process 只解碼一次。"""
+    return base64.b64decode(_raw.split(",", 1)[1] if _raw.startswith("data:") else _raw)
+
 def _logo_src():
-    """取得 logo 來源：優先讀 DB(system_settings.logo)，正確處理已含 data: 前綴的值，失敗才 fallback 到 LOGO_URL。"""
+    """取得 logo 來源：優先讀 DB(system_settings.logo)，失敗才 fallback 到 LOGO_URL。
+    有 LOGO_ASSET_BASE → 回內容雜湊網址(api 服務以 immutable 長效快取供圖，換 logo 雜湊即變)；
+    否則回解碼後的 bytes(st.image 以內容雜湊的 media 網址送出)，不再每次 rerun 夾帶 base64 data URI。"""
     try:
-        raw = sys.get_logo()
-        lg = str(raw).strip() if raw else ""
-        if lg.startswith("http") or lg.startswith("data:"):
+        lg = str(_setting("logo") or "").strip()
+        if lg.startswith("http"):
             return lg
         if len(lg) > 10:
-            return f"data:image/png;base64,{lg}"
+            digest = _logo_digest(lg)
+            if LOGO_ASSET_BASE:
+                return f"{LOGO_ASSET_BASE}/{digest}"
+            return _logo_bytes(digest, lg)
     except Exception:
         pass
     return LOGO_URL
@@ -1449,134 +2318,130 @@ def admin_page():
 
     with current_tab[1]:
         st.subheader("履歷審核列表")
-        df = load_df("resumes")
-        df_users = load_df("users")
-        
-        if not df.empty and not df_users.empty:
-            merged_df = df.merge(df_users[['email', 'creator_email']], on='email', how='left')
-            
-            if user['role'] == 'admin':
-                filtered_df = merged_df
-            else:
-                filtered_df = merged_df[merged_df['creator_email'] == user['email']]
-            
-            submitted = filtered_df[filtered_df['status'].isin(['Submitted', 'Approved', 'Returned'])].copy()
-            
-            if not submitted.empty:
-                for i, row in submitted.iterrows():
-                    r_badge = "🏢" if row['resume_type'] == "HQ" else "🏪"
-                    status_badge = "✅" if row['status'] == "Approved" else "⏳" if row['status'] == "Submitted" else "↩️"
+        # PM 範圍與狀態篩選下推到 SQL，只撈待審/已審的整列履歷(PDF 需全欄)
+        submitted = load_candidates(None if user['role'] == 'admin' else user['email'],
+                                    ("Submitted", "Approved", "Returned"))
+
+        if not submitted.empty:
+            for i, row in submitted.iterrows():
+                r_badge = "🏢" if row['resume_type'] == "HQ" else "🏪"
+                status_badge = "✅" if row['status'] == "Approved" else "⏳" if row['status'] == "Submitted" else "↩️"
+                
+                with st.expander(f"{status_badge} {r_badge} {row['name_cn']} ({row['email']})"):
                     
-                    with st.expander(f"{status_badge} {r_badge} {row['name_cn']} ({row['email']})"):
-                        
-                        pdf_data = _cached_pdf_bytes(tuple(sorted(row.to_dict().items())))
-                        btn_c1, btn_c2 = st.columns(2)
+                    btn_c1, btn_c2 = st.columns(2)
+                    # 延遲產生：按「產生 PDF」才跑 generate_pdf，避免列表每次 rerun 對每一筆都產生(冷快取時高 CPU)
+                    if st.session_state.get(f"want_pdf_{row['email']}"):
+                        pdf_data = _cached_pdf_bytes(*_pdf_key(row.to_dict()))
                         btn_c1.download_button("📥 下載完整 PDF", pdf_data, f"{row['name_cn']}_履歷.pdf", "application/pdf", key=f"dl_pdf_{row['email']}")
-                        if btn_c2.button("🤖 AI 履歷分析", key=f"ai_{row['email']}"):
-                            with st.spinner("Claude AI 分析中..."):
-                                _analysis, _err = _ai_analyze_resume(row.to_dict())
-                            if _analysis:
-                                st.info(_analysis)
-                            else:
-                                st.warning(f"AI 分析未啟用：{_err}")
-                        st.divider()
-
-                        st.markdown("#### 📄 履歷內容 (唯讀)")
+                    elif btn_c1.button("📄 產生 PDF", key=f"prep_pdf_{row['email']}"):
+                        st.session_state[f"want_pdf_{row['email']}"] = True; st.rerun()
+                    if btn_c2.button("🤖 AI 履歷分析", key=f"ai_{row['email']}"):
+                        with st.spinner("Claude AI 分析中..."):
+                            _analysis, _err = _ai_analyze_resume(row.to_dict())
+                        if _analysis:
+                            st.info(_analysis)
+                        else:
+                            st.warning(f"AI 分析未啟用：{_err}")
+                    st.divider()
+
+                    st.markdown("#### 📄 履歷內容 (唯讀)")
+                    
+                    # [關鍵修正] 完整顯示所有欄位
+                    st.markdown("**【基本資料】**")
+                    c1, c2, c3, c4 = st.columns(4)
+                    c1.write(f"**姓名**: {row['name_cn']} ({row.get('name_en','')})")
+                    c2.write(f"**電話**: {row['phone']} / {row.get('home_phone')}")
+                    c3.write(f"**Email**: {row['email']}")
+                    c4.write(f"**生日**: {row['dob']}　**星座**: {_zodiac_of(row.get('dob',''))}")
+
+                    c5, c6, c7, c8 = st.columns(4)
+                    c5.write(f"**地址**: {row['address']}")
+                    c6.write(f"**市話**: {row.get('home_phone')}")
+                    c7.write(f"**婚姻**: {row.get('marital_status')}")
+                    c8.write(f"**血型**: {row.get('blood_type')}")
+
+                    c9, c10 = st.columns(2)
+                    c9.write(f"**緊急聯絡**: {row.get('emergency_contact')} ({row.get('emergency_phone')})")
+                    c10.write(f"**通勤**: {row.get('commute_method')} ({row.get('commute_time')}分)")
+                    st.write(f"**語言能力**: {_lang_summary(row) or '—'}")
+
+                    st.markdown("**【學歷】**")
+                    for x in range(1, 4):
+                        s = row.get(f'edu_{x}_school')
+                        if s: 
+                            date_range = f"{row.get(f'edu_{x}_start','')} ~ {row.get(f'edu_{x}_end','')}"
+                            st.write(f"**{x}. {s}** ({date_range}) | {row.get(f'edu_{x}_major')} | {row.get(f'edu_{x}_degree')} | {row.get(f'edu_{x}_state')}")
+                    
+                    st.markdown("**【工作經歷】**")
+                    for x in range(1, 5):
+                        co = row.get(f'exp_{x}_co')
+                        if co:
+                            date_range = f"{row.get(f'exp_{x}_start','')} ~ {row.get(f'exp_{x}_end','')}"
+                            st.markdown(f"**{x}. {co}** ({date_range})")
+                            st.write(f"- 職稱: {row.get(f'exp_{x}_title')} | 薪資: {row.get(f'exp_{x}_salary')}")
+                            st.write(f"- 主管: {row.get(f'exp_{x}_boss')} ({row.get(f'exp_{x}_phone')}) | 離職: {row.get(f'exp_{x}_reason')}")
+                    
+                    if row.get('resume_type') == 'Branch':
+                        st.markdown("**【分公司意願】**")
+                        st.write(f"區域: {row.get('branch_region')} | 地點: {row.get('branch_location')}")
+                        st.write(f"輪調: {row.get('accept_rotation')} | 輪班: {row.get('shift_avail')}")
+                        st.write(f"排班: 假日({row.get('holiday_shift')}) | 早晚({row.get('rotate_shift')}) | 家人({row.get('family_support_shift')})")
+                        st.write(f"經濟: 扶養({row.get('care_dependent')}) | 負擔({row.get('financial_burden')})")
+
+                    st.markdown("**【其他】**")
+                    st.write(f"應徵管道: {row.get('source')} | 親友: {row.get('relative_name')}")
+                    st.write(f"補教: {row.get('teach_exp')} | 出國: {row.get('travel_history')} | 兵役: {row.get('military_status')}")
+                    st.write(f"病史: 住院({row.get('hospitalization')}) | 慢性病({row.get('chronic_disease')})")
+                    st.write(f"經濟: 扶養({row.get('family_support')}) | 負擔({row.get('family_debt')})")
+
+                    st.markdown("**【自傳】**")
+                    st.write(f"**技能**: {row.get('skills')}")
+                    st.text_area("工作成就及個性特質(優缺點)", value=str(row.get('self_intro','')),
+                                 disabled=True, height=150, key=f"intro_ta_{row['email']}")
+                    st.write(f"**最重視的3個條件及適任優勢**: {row.get('top3_conditions','')}")
+
+                    st.divider()
+                    st.write("#### 👨‍⚖️ 審核決定")
+                    
+                    with st.form(f"hr_review_{row['email']}"):
+                        st.caption("若核准，請填寫面試資訊 (將寄送給面試者)")
+                        c1, c2 = st.columns(2)
+                        int_date = c1.date_input("日期", value=date.today())
+                        int_time = c2.text_input("時間", placeholder="例如：14:30")
                         
-                        # [關鍵修正] 完整顯示所有欄位
-                        st.markdown("**【基本資料】**")
-                        c1, c2, c3, c4 = st.columns(4)
-                        c1.write(f"**姓名**: {row['name_cn']} ({row.get('name_en','')})")
-                        c2.write(f"**電話**: {row['phone']} / {row.get('home_phone')}")
-                        c3.write(f"**Email**: {row['email']}")
-                        c4.write(f"**生日**: {row['dob']}　**星座**: {_zodiac_of(row.get('dob',''))}")
-
-                        c5, c6, c7, c8 = st.columns(4)
-                        c5.write(f"**地址**: {row['address']}")
-                        c6.write(f"**市話**: {row.get('home_phone')}")
-                        c7.write(f"**婚姻**: {row.get('marital_status')}")
-                        c8.write(f"**血型**: {row.get('blood_type')}")
-
-                        c9, c10 = st.columns(2)
-                        c9.write(f"**緊急聯絡**: {row.get('emergency_contact')} ({row.get('emergency_phone')})")
-                        c10.write(f"**通勤**: {row.get('commute_method')} ({row.get('commute_time')}分)")
-                        st.write(f"**語言能力**: {_lang_summary(row) or '—'}")
-
-                        st.markdown("**【學歷】**")
-                        for x in range(1, 4):
-                            s = row.get(f'edu_{x}_school')
-                            if s: 
-                                date_range = f"{row.get(f'edu_{x}_start','')} ~ {row.get(f'edu_{x}_end','')}"
-                                st.write(f"**{x}. {s}** ({date_range}) | {row.get(f'edu_{x}_major')} | {row.get(f'edu_{x}_degree')} | {row.get(f'edu_{x}_state')}")
+                        c3, c4 = st.columns(2)
+                        int_loc = c3.text_input("地點", placeholder="總公司 502 會議室")
+                        int_dept = c4.text_input("單位", placeholder="行銷部")
                         
-                        st.markdown("**【工作經歷】**")
-                        for x in range(1, 5):
-                            co = row.get(f'exp_{x}_co')
-                            if co:
-                                date_range = f"{row.get(f'exp_{x}_start','')} ~ {row.get(f'exp_{x}_end','')}"
-                                st.markdown(f"**{x}. {co}** ({date_range})")
-                                st.write(f"- 職稱: {row.get(f'exp_{x}_title')} | 薪資: {row.get(f'exp_{x}_salary')}")
-                                st.write(f"- 主管: {row.get(f'exp_{x}_boss')} ({row.get(f'exp_{x}_phone')}) | 離職: {row.get(f'exp_{x}_reason')}")
+                        c5, c6 = st.columns(2)
+                        int_mgr = c5.text_input("主管", placeholder="王經理")
+                        int_note = c6.text_input("注意事項", placeholder="請攜帶作品集")
                         
-                        if row.get('resume_type') == 'Branch':
-                            st.markdown("**【分公司意願】**")
-                            st.write(f"區域: {row.get('branch_region')} | 地點: {row.get('branch_location')}")
-                            st.write(f"輪調: {row.get('accept_rotation')} | 輪班: {row.get('shift_avail')}")
-                            st.write(f"排班: 假日({row.get('holiday_shift')}) | 早晚({row.get('rotate_shift')}) | 家人({row.get('family_support_shift')})")
-                            st.write(f"經濟: 扶養({row.get('care_dependent')}) | 負擔({row.get('financial_burden')})")
-
-                        st.markdown("**【其他】**")
-                        st.write(f"應徵管道: {row.get('source')} | 親友: {row.get('relative_name')}")
-                        st.write(f"補教: {row.get('teach_exp')} | 出國: {row.get('travel_history')} | 兵役: {row.get('military_status')}")
-                        st.write(f"病史: 住院({row.get('hospitalization')}) | 慢性病({row.get('chronic_disease')})")
-                        st.write(f"經濟: 扶養({row.get('family_support')}) | 負擔({row.get('family_debt')})")
-
-                        st.markdown("**【自傳】**")
-                        st.write(f"**技能**: {row.get('skills')}")
-                        st.text_area("工作成就及個性特質(優缺點)", value=str(row.get('self_intro','')),
-                                     disabled=True, height=150, key=f"intro_ta_{row['email']}")
-                        st.write(f"**最重視的3個條件及適任優勢**: {row.get('top3_conditions','')}")
-
-                        st.divider()
-                        st.write("#### 👨‍⚖️ 審核決定")
+                        hr_comment = st.text_input("評語 / 退件原因", value=row['hr_comment'])
                         
-                        with st.form(f"hr_review_{row['email']}"):
-                            st.caption("若核准，請填寫面試資訊 (將寄送給面試者)")
-                            c1, c2 = st.columns(2)
-                            int_date = c1.date_input("日期", value=date.today())
-                            int_time = c2.text_input("時間", placeholder="例如：14:30")
-                            
-                            c3, c4 = st.columns(2)
-                            int_loc = c3.text_input("地點", placeholder="總公司 502 會議室")
-                            int_dept = c4.text_input("單位", placeholder="行銷部")
-                            
-                            c5, c6 = st.columns(2)
-                            int_mgr = c5.text_input("主管", placeholder="王經理")
-                            int_note = c6.text_input("注意事項", placeholder="請攜帶作品集")
-                            
-                            hr_comment = st.text_input("評語 / 退件原因", value=row['hr_comment'])
-                            
-                            c_ok, c_no = st.columns(2)
-                            
-                            if c_ok.form_submit_button("✅ 核准 (發送通知)"):
-                                if not int_loc or not int_time:
-                                    st.error("核准請填寫時間與地點")
-                                else:
-                                    details = {
-                                        'hr_comment': hr_comment,
-                                        'interview_date': str(int_date),
-                                        'interview_time': int_time,
-                                        'interview_location': int_loc,
-                                        'interview_dept': int_dept,
-                                        'interview_manager': int_mgr,
-                                        'interview_notes': int_note
-                                    }
-                                    sys.hr_update_status(row['email'], "Approved", details)
-                                    _todo_cancel(row['email'], 'submit')
-
-                                    _sign_url = _secret("APP_URL", "email", "app_url",
-                                                        default="https://lcc-resume-sys-780693737981.asia-east1.run.app/")
-                                    body = f"""
+                        c_ok, c_no = st.columns(2)
+                        
+                        if c_ok.form_submit_button("✅ 核准 (發送通知)"):
+                            if not int_loc or not int_time:
+                                st.error("核准請填寫時間與地點")
+                            else:
+                                details = {
+                                    'hr_comment': hr_comment,
+                                    'interview_date': str(int_date),
+                                    'interview_time': int_time,
+                                    'interview_location': int_loc,
+                                    'interview_dept': int_dept,
+                                    'interview_manager': int_mgr,
+                                    'interview_notes': int_note
+                                }
+                                sys.hr_update_status(row['email'], "Approved", details)
+                                _todo_cancel(row['email'], 'submit')
+                                _pdf_prerender().enqueue(row['email'])
+
+                                _sign_url = _secret("APP_URL", "email", "app_url",
+                                                    default="https://lcc-resume-sys-780693737981.asia-east1.run.app/")
+                                body = f"""
 {row['name_cn']} 您好，
 
 恭喜您通過履歷初審！我們誠摯邀請您前來參加面試。
@@ -1609,28 +2474,28 @@ def admin_page():
 
 聯成電腦 人資部
                                     """
-                                    _ok, _err = send_email(row['email'], "【聯成電腦】面試通知", body)
-                                    if _ok:
-                                        st.success("已核准並發送通知信！")
-                                    else:
-                                        st.warning(f"已核准，但通知信發送失敗：{_err}")
-                                    time.sleep(2); st.rerun()
-
-                            if c_no.form_submit_button("↩️ 退件 (通知修改)"):
-                                if not hr_comment:
-                                    st.error("請填寫退件原因")
+                                _ok, _err = send_email(row['email'], "【聯成電腦】面試通知", body)
+                                if _ok:
+                                    st.success("已核准並發送通知信！")
+                                else:
+                                    st.warning(f"已核准，但通知信發送失敗：{_err}")
+                                time.sleep(2); st.rerun()
+
+                        if c_no.form_submit_button("↩️ 退件 (通知修改)"):
+                            if not hr_comment:
+                                st.error("請填寫退件原因")
+                            else:
+                                details = {'hr_comment': hr_comment}
+                                sys.hr_update_status(row['email'], "Returned", details)
+                                _todo_cancel(row['email'], 'submit')
+                                _ok2, _err2 = send_email(row['email'], "【聯成電腦】履歷需修改", f"您的履歷被退回。\n原因：{hr_comment}\n請登入修改後重送。")
+                                if _ok2:
+                                    st.warning("已退件通知")
                                 else:
-                                    details = {'hr_comment': hr_comment}
-                                    sys.hr_update_status(row['email'], "Returned", details)
-                                    _todo_cancel(row['email'], 'submit')
-                                    _ok2, _err2 = send_email(row['email'], "【聯成電腦】履歷需修改", f"您的履歷被退回。\n原因：{hr_comment}\n請登入修改後重送。")
-                                    if _ok2:
-                                        st.warning("已退件通知")
-                                    else:
-                                        st.warning(f"已退件，但通知信發送失敗：{_err2}")
-                                    time.sleep(2); st.rerun()
-
-            else: st.info("無待審履歷")
+                                    st.warning(f"已退件，但通知信發送失敗：{_err2}")
+                                time.sleep(2); st.rerun()
+
+        else: st.info("無待審履歷")
 
     # ── 表單管理 ──────────────────────────────────────────────────
     with current_tab[2]:
@@ -1644,207 +2509,221 @@ def admin_page():
             "Returned":  ("已退件",    "↩️"),
         }
 
-        df_u2 = load_df("users")
-        df_r2 = load_df("resumes")
-
-        if df_u2.empty:
-            st.info("尚無資料")
+        # 月份選單只查 DISTINCT 月份；求職者依 PM/月份區間在 SQL 端篩選，不再整表讀 users/resumes
+        _pm_scope = user['email'] if user['role'] == 'pm' else None
+        def _mlabel(m):
+            try:    return datetime.strptime(m, '%Y-%m').strftime('%Y 年 %m 月')
+            except: return m
+        _months = load_candidate_months(_pm_scope)
+        _lo = _hi = None
+        # ── 起訖月份查詢（預設近 2 個月，避免過多月份塞滿畫面）──────────
+        if _months:
+            _si = 1 if len(_months) > 1 else 0   # 預設起始=次新月 → 近 2 個月
+            fcs, fce = st.columns(2)
+            _mstart = fcs.selectbox("起始月份", _months, index=_si, format_func=_mlabel, key="fm_start")
+            _mend   = fce.selectbox("結束月份", _months, index=0,   format_func=_mlabel, key="fm_end")
+            _lo, _hi = sorted([_mstart, _mend])
+        # 用 signed_at(短字串)判斷是否已簽名；RESUME_FORM_COLS 投影讀取，根本不撈 signature
+        merged2 = load_candidates(_pm_scope, None, _lo, _hi, RESUME_FORM_COLS)
+
+        if merged2.empty and not _months:
+            st.info("尚無邀請記錄")
         else:
-            cands = df_u2[df_u2['role'] == 'candidate'].copy()
-            if user['role'] == 'pm':
-                cands = cands[cands['creator_email'] == user['email']]
-
-            if cands.empty:
-                st.info("尚無邀請記錄")
-            else:
-                if not df_r2.empty:
-                    # 用 signed_at(短字串)判斷是否已簽名，不撈 signature(base64 大字串)以免拖慢
-                    r_cols = [c for c in ['email','status','name_cn','interview_dept','resume_type','hr_comment','docs_enabled','signed_at','mgmt_cand_no'] if c in df_r2.columns]
-                    merged2 = cands.merge(df_r2[r_cols], on='email', how='left')
-                else:
-                    merged2 = cands.copy()
-                    for col in ['status','name_cn','interview_dept','resume_type','hr_comment','docs_enabled','signed_at']:
-                        merged2[col] = ''
-
-                merged2['status'] = merged2['status'].fillna('New').replace('', 'New')
-                for _c in ('docs_enabled', 'signed_at'):
-                    if _c not in merged2.columns:
-                        merged2[_c] = ''
-                merged2['name_cn'] = merged2.apply(lambda r: r['name_cn'] if str(r.get('name_cn','')).strip() else r['name'], axis=1)
-                merged2['interview_dept'] = merged2.apply(
-                    lambda r: r.get('interview_dept','') if str(r.get('interview_dept','')).strip()
-                              else ("總公司" if str(r.get('resume_type','')) == 'HQ' else
-                                    "分公司" if str(r.get('resume_type','')) == 'Branch' else '—'),
-                    axis=1
-                )
-                merged2['created_at'] = pd.to_datetime(merged2['created_at'], errors='coerce')
-                merged2['ym'] = merged2['created_at'].dt.strftime('%Y-%m').fillna('未知')
-                merged2 = merged2.sort_values('created_at', ascending=False)
-
-                # ── 起訖月份查詢（預設近 2 個月，避免過多月份塞滿畫面）──────────
-                def _mlabel(m):
-                    try:    return datetime.strptime(m, '%Y-%m').strftime('%Y 年 %m 月')
-                    except: return m
-                _months = sorted([m for m in merged2['ym'].unique() if m and m != '未知'], reverse=True)
-                if _months:
-                    _si = 1 if len(_months) > 1 else 0   # 預設起始=次新月 → 近 2 個月
-                    fcs, fce = st.columns(2)
-                    _mstart = fcs.selectbox("起始月份", _months, index=_si, format_func=_mlabel, key="fm_start")
-                    _mend   = fce.selectbox("結束月份", _months, index=0,   format_func=_mlabel, key="fm_end")
-                    _lo, _hi = sorted([_mstart, _mend])
-                    merged2 = merged2[(merged2['ym'] >= _lo) & (merged2['ym'] <= _hi)]
-                    st.caption(f"顯示 {_mlabel(_lo)} ～ {_mlabel(_hi)}，共 {len(merged2)} 筆")
-                    if merged2.empty:
-                        st.info("此區間無資料")
-
-                app_url = _secret("APP_URL", "email", "app_url", default="https://lcc-resume-sys-780693737981.asia-east1.run.app/")
-
-                for ym, grp in merged2.groupby('ym', sort=False):
-                    try:    mlabel = datetime.strptime(ym, '%Y-%m').strftime('%Y 年 %m 月')
-                    except: mlabel = ym
-                    is_first = (ym == merged2['ym'].iloc[0])
-                    with st.expander(f"📅 {mlabel}（共 {len(grp)} 筆）", expanded=is_first):
-                        # 表頭（欄寬比例依內容調整：狀態/操作內容較多故加寬）
-                        _col_ratio = [0.6, 1, 1.6, 1.8, 1.8, 2.2]
-                        hc = st.columns(_col_ratio)
-                        for h, t in zip(hc, ["選取", "發送日期", "求職者", "面試單位", "狀態", "操作"]):
-                            h.markdown(f"**{t}**")
-                        st.divider()
-
-                        for _row_idx, fr in grp.iterrows():
-                            raw_st  = str(fr.get('status', 'New'))
-                            lbl, badge = STATUS_MAP.get(raw_st, (raw_st, "❓"))
-                            sent_date = fr['created_at'].strftime('%m/%d') if pd.notna(fr['created_at']) else '—'
-                            cand_email = str(fr['email']).strip()
-                            cand_name  = str(fr.get('name_cn', fr['name'])).strip()
-
-                            rc = st.columns(_col_ratio)
-                            # 勾選：僅「未開放到職文件」(docs_enabled != Y) 可刪
-                            _locked = str(fr.get('docs_enabled', '')).strip().upper() == 'Y'
-                            if not _locked:
-                                rc[0].checkbox("選取", key=f"del_chk_{cand_email}", label_visibility="collapsed")
-                            else:
-                                rc[0].write("🔒")
-                            rc[1].write(sent_date)
-                            rc[2].write(cand_name)
-                            rc[3].write(str(fr.get('interview_dept', '—')))
-                            rc[4].write(f"{badge} {lbl}")
-
-                            btn_key = f"resend_{cand_email}_{_row_idx}"
-                            if raw_st in ('New', 'Draft'):
-                                if rc[5].button("📧 催促填寫", key=btn_key):
-                                    body = (f"{cand_name} 您好，\n\n"
-                                            f"提醒您尚未完成履歷填寫，請盡快登入系統填寫並送出。\n"
-                                            f"系統連結：{app_url}\n"
-                                            f"帳號：{cand_email}\n密碼：{cand_email}\n\n"
-                                            f"如有任何問題，歡迎聯繫人資部。\n聯成電腦 人資部")
-                                    ok, _ = send_email(cand_email, "【聯成電腦】提醒您完成履歷填寫", body)
-                                    if ok: st.toast(f"已發送催促通知給 {cand_name}", icon="✅")
-                                    else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
-                            elif raw_st == 'Returned':
-                                reason = str(fr.get('hr_comment', '')).strip()
-                                if rc[5].button("📧 催促修改", key=btn_key):
-                                    body = (f"{cand_name} 您好，\n\n"
-                                            f"您的履歷已被退回，請登入系統依照退件原因修改後重新送出。\n"
-                                            f"退件原因：{reason or '請參閱系統說明'}\n\n"
-                                            f"系統連結：{app_url}\n"
-                                            f"帳號：{cand_email}\n\n"
-                                            f"請盡快完成修改，謝謝。\n聯成電腦 人資部")
-                                    ok, _ = send_email(cand_email, "【聯成電腦】請修改履歷後重新送出", body)
-                                    if ok: st.toast(f"已發送催促通知給 {cand_name}", icon="✅")
-                                    else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
-                            elif raw_st == 'Approved':
-                                # 已核可但尚未簽名 → 在狀態下方出現「提醒簽名」；已簽名則顯示簽署時間
-                                _signed_at = str(fr.get('signed_at', '') or '').strip()
-                                if _signed_at:
-                                    rc[4].caption(f"✍️ 已簽名 {_signed_at}")
-                                elif rc[4].button("✍️ 提醒簽名", key=f"remind_sign_{cand_email}_{_row_idx}"):
-                                    body = (f"{cand_name} 您好，\n\n"
-                                            f"您的履歷已審核通過，尚未完成親筆簽名，提醒您盡快完成：\n\n"
-                                            f"1. 點擊系統連結登入：{app_url}\n"
-                                            f"   帳號：{cand_email}　密碼：{cand_email}\n"
-                                            f"2. 進入「🖋️ 履歷查詢/確認」分頁\n"
-                                            f"3. 按「📧 寄送驗證碼至我的信箱」，系統會寄一組 6 位數驗證碼到本信箱\n"
-                                            f"   （驗證碼 5 分鐘內有效）\n"
-                                            f"4. 輸入驗證碼後，即可在簽名方框內完成簽名\n"
-                                            f"   （手機可用手指、電腦可用滑鼠或手寫板）\n\n"
-                                            f"簽名完成後會自動套印至您的履歷表。\n\n"
-                                            f"如有任何問題，歡迎聯繫人資部。\n聯成電腦 人資部")
-                                    ok, _ = send_email(cand_email, "【聯成電腦】提醒您完成履歷簽名", body)
-                                    if ok: st.toast(f"已發送簽名提醒給 {cand_name}", icon="✅")
-                                    else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
-                                _den = str(fr.get('docs_enabled', '')).strip().upper() == 'Y'
-                                rc[5].checkbox("開放到職文件", value=_den, key=f"docen_{cand_email}",
-                                               on_change=_toggle_docs_enabled, args=(cand_email,))
-                                # 提醒上傳：僅在「已開放到職文件」時可按，未開放/取消則反灰
-                                if rc[5].button("📤 提醒上傳", key=f"remind_up_{cand_email}_{_row_idx}",
-                                                disabled=not _den):
-                                    body = (f"{cand_name} 您好，\n\n"
-                                            f"恭喜您通過面試審核！系統已開放到職文件上傳，"
-                                            f"請登入系統上傳所需的到職文件。\n"
-                                            f"系統連結：{app_url}\n"
-                                            f"帳號：{cand_email}\n\n"
-                                            f"如有任何問題，歡迎聯繫人資部。\n聯成電腦 人資部")
-                                    ok, _ = send_email(cand_email, "【聯成電腦】提醒您上傳到職文件", body)
-                                    if ok: st.toast(f"已發送上傳提醒給 {cand_name}", icon="✅")
-                                    else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
-                                # 匯入系統：收進每列展開區，僅「已開放到職文件」時出現
-                                if _den:
-                                    with st.expander(f"📥 匯入系統 — {cand_name}"):
-                                        _cur_no = str(fr.get('mgmt_cand_no', '') or '')
-                                        _no = st.text_input("求職者編號（管理系統查詢）", value=_cur_no,
-                                                            key=f"mgmtno_{cand_email}_{_row_idx}",
-                                                            placeholder="輸入編號")
-                                        if st.button("📥 匯入管理系統", key=f"mgmtimp_{cand_email}_{_row_idx}"):
-                                            if not str(_no).strip():
-                                                st.toast("請先輸入求職者編號", icon="⚠️")
-                                            else:
-                                                _ok, _msg = _mgmt_import(cand_email, _no)
-                                                st.toast(_msg, icon="✅" if _ok else "⚠️")
-
-                # ── 刪除求職者帳號（勾選 → 確認 → 摘要）──────────────
-                st.divider()
-                st.caption("🗑️ 勾選上方求職者後可刪除其帳號與履歷資料（僅限**未開放到職文件**者；🔒 表示已開放到職文件、不可刪）")
-                if st.button("🗑️ 刪除勾選的帳號"):
-                    _deletable = merged2[
-                        merged2['docs_enabled'].fillna('').astype(str).str.strip().str.upper() != 'Y'
-                    ]
-                    _sel = [(str(r['email']).strip(), str(r.get('name_cn') or r['name']).strip())
-                            for _, r in _deletable.iterrows()
-                            if st.session_state.get(f"del_chk_{str(r['email']).strip()}")]
-                    if not _sel:
-                        st.warning("尚未勾選任何求職者")
+            for _c in RESUME_FORM_COLS:
+                if _c not in merged2.columns:
+                    merged2[_c] = ''
+            merged2['name_cn'] = merged2['name_cn'].where(merged2['name_cn'].astype(str).str.strip() != '', merged2['name'])
+            _dept_fallback = merged2['resume_type'].map({'HQ': "總公司", 'Branch': "分公司"}).fillna('—')
+            merged2['interview_dept'] = merged2['interview_dept'].where(
+                merged2['interview_dept'].astype(str).str.strip() != '', _dept_fallback)
+            merged2['created_at'] = pd.to_datetime(merged2['created_at'], errors='coerce')
+            merged2['ym'] = merged2['created_at'].dt.strftime('%Y-%m').fillna('未知')
+            merged2 = merged2.sort_values('created_at', ascending=False)
+            if _months:
+                st.caption(f"顯示 {_mlabel(_lo)} ～ {_mlabel(_hi)}，共 {len(merged2)} 筆")
+                if merged2.empty:
+                    st.info("此區間無資料")
+
+            app_url = _secret("APP_URL", "email", "app_url", default="https://lcc-resume-sys-780693737981.asia-east1.run.app/")
+
+            for ym, grp in merged2.groupby('ym', sort=False):
+                try:    mlabel = datetime.strptime(ym, '%Y-%m').strftime('%Y 年 %m 月')
+                except: mlabel = ym
+                is_first = (ym == merged2['ym'].iloc[0])
+                with st.expander(f"📅 {mlabel}（共 {len(grp)} 筆）", expanded=is_first):
+                    # 表頭（欄寬比例依內容調整：狀態/操作內容較多故加寬）
+                    _col_ratio = [0.6, 1, 1.6, 1.8, 1.8, 2.2]
+                    hc = st.columns(_col_ratio)
+                    for h, t in zip(hc, ["選取", "發送日期", "求職者", "面試單位", "狀態", "操作"]):
+                        h.markdown(f"**{t}**")
+                    st.divider()
+
+                    for _row_idx, fr in grp.iterrows():
+                        raw_st  = str(fr.get('status', 'New'))
+                        lbl, badge = STATUS_MAP.get(raw_st, (raw_st, "❓"))
+                        sent_date = fr['created_at'].strftime('%m/%d') if pd.notna(fr['created_at']) else '—'
+                        cand_email = str(fr['email']).strip()
+                        cand_name  = str(fr.get('name_cn', fr['name'])).strip()
+
+                        rc = st.columns(_col_ratio)
+                        # 勾選：僅「未開放到職文件」(docs_enabled != Y) 可刪
+                        _locked = str(fr.get('docs_enabled', '')).strip().upper() == 'Y'
+                        if not _locked:
+                            rc[0].checkbox("選取", key=f"del_chk_{cand_email}", label_visibility="collapsed")
+                        else:
+                            rc[0].write("🔒")
+                        rc[1].write(sent_date)
+                        rc[2].write(cand_name)
+                        rc[3].write(str(fr.get('interview_dept', '—')))
+                        rc[4].write(f"{badge} {lbl}")
+
+                        btn_key = f"resend_{cand_email}_{_row_idx}"
+                        if raw_st in ('New', 'Draft'):
+                            if rc[5].button("📧 催促填寫", key=btn_key):
+                                body = (f"{cand_name} 您好，\n\n"
+                                        f"提醒您尚未完成履歷填寫，請盡快登入系統填寫並送出。\n"
+                                        f"系統連結：{app_url}\n"
+                                        f"帳號：{cand_email}\n密碼：{cand_email}\n\n"
+                                        f"如有任何問題，歡迎聯繫人資部。\n聯成電腦 人資部")
+                                ok, _ = send_email(cand_email, "【聯成電腦】提醒您完成履歷填寫", body)
+                                if ok: st.toast(f"已發送催促通知給 {cand_name}", icon="✅")
+                                else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
+                        elif raw_st == 'Returned':
+                            reason = str(fr.get('hr_comment', '')).strip()
+                            if rc[5].button("📧 催促修改", key=btn_key):
+                                body = (f"{cand_name} 您好，\n\n"
+                                        f"您的履歷已被退回，請登入系統依照退件原因修改後重新送出。\n"
+                                        f"退件原因：{reason or '請參閱系統說明'}\n\n"
+                                        f"系統連結：{app_url}\n"
+                                        f"帳號：{cand_email}\n\n"
+                                        f"請盡快完成修改，謝謝。\n聯成電腦 人資部")
+                                ok, _ = send_email(cand_email, "【聯成電腦】請修改履歷後重新送出", body)
+                                if ok: st.toast(f"已發送催促通知給 {cand_name}", icon="✅")
+                                else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
+                        elif raw_st == 'Approved':
+                            # 已核可但尚未簽名 → 在狀態下方出現「提醒簽名」；已簽名則顯示簽署時間
+                            _signed_at = str(fr.get('signed_at', '') or '').strip()
+                            if _signed_at:
+                                rc[4].caption(f"✍️ 已簽名 {_signed_at}")
+                            elif rc[4].button("✍️ 提醒簽名", key=f"remind_sign_{cand_email}_{_row_idx}"):
+                                body = (f"{cand_name} 您好，\n\n"
+                                        f"您的履歷已審核通過，尚未完成親筆簽名，提醒您盡快完成：\n\n"
+                                        f"1. 點擊系統連結登入：{app_url}\n"
+                                        f"   帳號：{cand_email}　密碼：{cand_email}\n"
+                                        f"2. 進入「🖋️ 履歷查詢/確認」分頁\n"
+                                        f"3. 按「📧 寄送驗證碼至我的信箱」，系統會寄一組 6 位數驗證碼到本信箱\n"
+                                        f"   （驗證碼 5 分鐘內有效）\n"
+                                        f"4. 輸入驗證碼後，即可在簽名方框內完成簽名\n"
+                                        f"   （手機可用手指、電腦可用滑鼠或手寫板）\n\n"
+                                        f"簽名完成後會自動套印至您的履歷表。\n\n"
+                                        f"如有任何問題，歡迎聯繫人資部。\n聯成電腦 人資部")
+                                ok, _ = send_email(cand_email, "【聯成電腦】提醒您完成履歷簽名", body)
+                                if ok: st.toast(f"已發送簽名提醒給 {cand_name}", icon="✅")
+                                else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
+                            _den = str(fr.get('docs_enabled', '')).strip().upper() == 'Y'
+                            rc[5].checkbox("開放到職文件", value=_den, key=f"docen_{cand_email}",
+                                           on_change=_toggle_docs_enabled, args=(cand_email,))
+                            # 提醒上傳：僅在「已開放到職文件」時可按，未開放/取消則反灰
+                            if rc[5].button("📤 提醒上傳", key=f"remind_up_{cand_email}_{_row_idx}",
+                                            disabled=not _den):
+                                body = (f"{cand_name} 您好，\n\n"
+                                        f"恭喜您通過面試審核！系統已開放到職文件上傳，"
+                                        f"請登入系統上傳所需的到職文件。\n"
+                                        f"系統連結：{app_url}\n"
+                                        f"帳號：{cand_email}\n\n"
+                                        f"如有任何問題，歡迎聯繫人資部。\n聯成電腦 人資部")
+                                ok, _ = send_email(cand_email, "【聯成電腦】提醒您上傳到職文件", body)
+                                if ok: st.toast(f"已發送上傳提醒給 {cand_name}", icon="✅")
+                                else:  st.toast("發送失敗，請確認 Email 設定", icon="⚠️")
+                            # 匯入系統：收進每列展開區，僅「已開放到職文件」時出現
+                            if _den:
+                                with st.expander(f"📥 匯入系統 — {cand_name}"):
+                                    _cur_no = str(fr.get('mgmt_cand_no', '') or '')
+                                    _no = st.text_input("求職者編號（管理系統查詢）", value=_cur_no,
+                                                        key=f"mgmtno_{cand_email}_{_row_idx}",
+                                                        placeholder="輸入編號")
+                                    if st.button("📥 匯入管理系統", key=f"mgmtimp_{cand_email}_{_row_idx}"):
+                                        if not str(_no).strip():
+                                            st.toast("請先輸入求職者編號", icon="⚠️")
+                                        else:
+                                            _ok, _msg = _mgmt_import(cand_email, _no)
+                                            st.toast(_msg, icon="✅" if _ok else "⚠️")
+
+            # ── 批次匯出 PDF（同上方 PM／月份區間，可再選狀態）──────────
+            st.divider()
+            with st.expander("📦 批次匯出履歷 PDF（ZIP）"):
+                _sweep_pdf_exports()
+                _zs = st.multiselect("狀態", ["Submitted", "Approved", "Returned"], default=["Approved"],
+                                     format_func=lambda k: STATUS_MAP[k][0], key="pdfzip_status")
+                if st.button("📦 產生 ZIP", key="pdfzip_go", disabled=not _zs):
+                    _zrows = sys.query_candidates(_pm_scope, tuple(_zs), _lo, _hi, PDF_RENDERED_FIELDS)
+                    if _zrows.empty:
+                        st.info("此條件下沒有履歷")
                     else:
-                        st.session_state['pending_del'] = _sel
-                        st.rerun()
-
-                if st.session_state.get('pending_del'):
-                    _sel = st.session_state['pending_del']
-                    st.warning(f"⚠️ 確定刪除以下 {len(_sel)} 個求職者的帳號與履歷資料？**此動作無法復原。**")
-                    for _em, _nm in _sel:
-                        st.write(f"- {_nm}（{_em}）")
-                    _c1, _c2, _ = st.columns([1, 1, 3])
-                    if _c1.button("✅ 確認刪除", type="primary"):
-                        _results = [(_nm, _em) + sys.delete_user_account(_em) for _em, _nm in _sel]
-                        st.session_state['del_summary'] = _results
-                        del st.session_state['pending_del']
-                        st.rerun()
-                    if _c2.button("取消"):
-                        del st.session_state['pending_del']
-                        st.rerun()
-
-                if st.session_state.get('del_summary'):
-                    _results = st.session_state['del_summary']
-                    _ok = sum(1 for r in _results if r[2])
-                    _fail = len(_results) - _ok
-                    st.success(f"刪除完成：成功 {_ok} 筆" + (f"、失敗 {_fail} 筆" if _fail else ""))
+                        _bar = st.progress(0.0, text=f"0 / {len(_zrows)}")
+                        _zpath, _zfail = _export_pdf_zip(
+                            _zrows.to_dict("records"),
+                            lambda d, t: _bar.progress(d / t, text=f"{d} / {t}"))
+                        _drop_pdf_zip()
+                        st.session_state['pdfzip'] = (_zpath, len(_zrows), _zfail)
+                if st.session_state.get('pdfzip'):
+                    _zpath, _zn, _zfail = st.session_state['pdfzip']
+                    st.caption(f"共 {_zn} 份，成功 {_zn - len(_zfail)} 份")
+                    if _zpath and os.path.exists(_zpath):
+                        with open(_zpath, "rb") as _zf:
+                            st.download_button("📥 下載 ZIP", _zf, f"履歷_{datetime.now().strftime('%Y%m%d_%H%M')}.zip",
+                                               "application/zip", key="pdfzip_dl", on_click=_drop_pdf_zip)
+                    elif _zpath:   # 已逾時被清掉
+                        st.caption("ZIP 已過期，請重新產生")
+                    if _zfail:
+                        st.warning(f"{len(_zfail)} 份產生失敗（ZIP 內附 _failures.txt）：")
+                        for _em, _msg in _zfail:
+                            st.write(f"- {_em}：{_msg}")
+
+            # ── 刪除求職者帳號（勾選 → 確認 → 摘要）──────────────
+            st.divider()
+            st.caption("🗑️ 勾選上方求職者後可刪除其帳號與履歷資料（僅限**未開放到職文件**者；🔒 表示已開放到職文件、不可刪）")
+            if st.button("🗑️ 刪除勾選的帳號"):
+                _deletable = merged2[
+                    merged2['docs_enabled'].fillna('').astype(str).str.strip().str.upper() != 'Y'
+                ]
+                _sel = [(str(r['email']).strip(), str(r.get('name_cn') or r['name']).strip())
+                        for _, r in _deletable.iterrows()
+                        if st.session_state.get(f"del_chk_{str(r['email']).strip()}")]
+                if not _sel:
+                    st.warning("尚未勾選任何求職者")
+                else:
+                    st.session_state['pending_del'] = _sel
+                    st.rerun()
+
+            if st.session_state.get('pending_del'):
+                _sel = st.session_state['pending_del']
+                st.warning(f"⚠️ 確定刪除以下 {len(_sel)} 個求職者的帳號與履歷資料？**此動作無法復原。**")
+                for _em, _nm in _sel:
+                    st.write(f"- {_nm}（{_em}）")
+                _c1, _c2, _ = st.columns([1, 1, 3])
+                if _c1.button("✅ 確認刪除", type="primary"):
+                    _res = sys.delete_user_accounts([_em for _em, _nm in _sel])   # 一個交易整批刪
+                    _results = [(_nm, _em) + _res.get(_em, (False, "未處理")) for _em, _nm in _sel]
+                    st.session_state['del_summary'] = _results
+                    del st.session_state['pending_del']
+                    st.rerun()
+                if _c2.button("取消"):
+                    del st.session_state['pending_del']
+                    st.rerun()
+
+            if st.session_state.get('del_summary'):
+                _results = st.session_state['del_summary']
+                _ok = sum(1 for r in _results if r[2])
+                _fail = len(_results) - _ok
+                st.success(f"刪除完成：成功 {_ok} 筆" + (f"、失敗 {_fail} 筆" if _fail else ""))
+                for _nm, _em, _okf, _msg in _results:
+                    st.write(f"✅ {_nm}（{_em}）已刪除" if _okf else f"❌ {_nm}（{_em}）失敗：{_msg}")
+                if st.button("關閉摘要"):
                     for _nm, _em, _okf, _msg in _results:
-                        st.write(f"✅ {_nm}（{_em}）已刪除" if _okf else f"❌ {_nm}（{_em}）失敗：{_msg}")
-                    if st.button("關閉摘要"):
-                        for _nm, _em, _okf, _msg in _results:
-                            st.session_state.pop(f"del_chk_{_em}", None)
-                        del st.session_state['del_summary']
-                        st.rerun()
+                        st.session_state.pop(f"del_chk_{_em}", None)
+                    del st.session_state['del_summary']
+                    st.rerun()
 
     with current_tab[3]:
         _render_docs_admin(user)
@@ -1861,6 +2740,8 @@ def admin_page():
             _render_org_admin()
             st.divider()
             _render_todo_admin()
+            st.divider()
+            _render_db_diag()
 
         with current_tab[5]:
             _render_staff_admin(user)
@@ -1872,10 +2753,10 @@ def _render_todo_admin():
         st.error("此功能需 PostgreSQL 後端。"); return
     st.caption("聯成電腦管理系統待辦 API。**Token 欄留空＝維持原設定不變更**；"
                "URL 直接編輯即可。四項都設定後，待辦通知才會實際發送。")
-    _curl = str(sys.get_setting("todo_create_url") or "")
-    _xurl = str(sys.get_setting("todo_cancel_url") or "")
-    _ctok_set = bool(str(sys.get_setting("todo_create_token") or "").strip())
-    _xtok_set = bool(str(sys.get_setting("todo_cancel_token") or "").strip())
+    _curl = str(_setting("todo_create_url") or "")
+    _xurl = str(_setting("todo_cancel_url") or "")
+    _ctok_set = bool(str(_setting("todo_create_token") or "").strip())
+    _xtok_set = bool(str(_setting("todo_cancel_token") or "").strip())
     with st.form("todo_api_form"):
         st.markdown("**① 發送待辦**")
         curl = st.text_input("發送 API URL", value=_curl,
@@ -1898,7 +2779,7 @@ def _render_todo_admin():
     st.subheader("🔑 新增求職者 API（供管理系統打入）")
     st.caption("供聯成電腦管理系統呼叫『新增求職者 API』所用的存取 Token。"
                "管理系統呼叫時需帶 `Authorization: Bearer <此 Token>`。留空＝不變更。")
-    _in_set = bool(str(sys.get_setting("inbound_api_token") or "").strip())
+    _in_set = bool(str(_setting("inbound_api_token") or "").strip())
     with st.form("inbound_api_form"):
         st.caption(f"目前 Token：{'🟢 已設定' if _in_set else '🔴 未設定'}")
         _intok = st.text_input("新增求職者 API Token（留空＝不變更）", type="password", key="inbound_tok")
@@ -1915,10 +2796,69 @@ def _render_todo_admin():
             st.success("已產生新 Token。請至下方複製並交給管理系統（僅顯示這一次）。")
             st.code(_new, language=None)
 
+def _render_db_diag():
+    """admin：資料庫連線診斷（連線池使用量與等待時間）。"""
+    st.subheader("🩺 資料庫診斷")
+    b = sys._pg()
+    if b is None:
+        st.caption("目前為 Google Sheets 後端，無連線池資訊。"); return
+    ps = b.pool_stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("使用中 / 上限", f"{ps['in_use']} / {ps['max']}")
+    c2.metric("閒置連線", ps['idle'])
+    c3.metric("平均等待", f"{ps['wait_avg_ms']} ms")
+    c4.metric("最長等待", f"{ps['wait_max_ms']} ms")
+    st.caption(f"借出 {ps['checkouts']} 次（需排隊 {ps['waited']} 次、逾時 {ps['timeouts']} 次）；"
+               f"健康檢查換新 {ps['replaced']} 條、斷線丟棄 {ps['broken']} 條。"
+               "上限由環境變數 PG_POOL_MAX 設定。")
+    _cv = _cache_versions()
+    st.caption(f"跨實例快取失效：{'🟢 LISTEN 中' if _cv.listening else '🔴 未連線（暫以 30 秒時效運作）'}；"
+               f"收到其他實例通知 {_cv.received} 次、重連 {_cv.reconnects} 次。")
+    _ds = _delta_snapshots()
+    st.caption(f"load_df 增量快照：整表載入 {_ds.full} 次、增量刷新 {_ds.delta} 次（共補 {_ds.delta_rows} 列）。")
+    if sys._blobs().kind == "pg":
+        st.warning("到職文件 bytes 目前存於 PG `doc_blobs` 表（未設 `BLOB_DIR` 的過渡做法），仍佔用 Cloud SQL 容量、備份與 VACUUM；"
+                   "請以 volume 掛載 Cloud Storage 並設定 `BLOB_DIR`，再執行 `python blob_store.py migrate-docs`。")
+    _dc = _doc_cache().stats()
+    st.caption(f"到職文件快取：{_dc['entries']} 份、{_dc['bytes'] / 1048576:.1f} / {_dc['max_bytes'] / 1048576:.0f} MB；"
+               f"命中 {_dc['hits']}、未命中 {_dc['misses']}、淘汰 {_dc['evictions']} 次（上限 DOC_CACHE_MAX_MB）。")
+    _pp = _pdf_prerender()
+    _pps = _pp.stats()
+    st.caption(f"PDF 背景預產：排隊 {_pps['pending']}、已產生 {_pps['done']}、已在快取 {_pps['cached']}、"
+               f"查無履歷略過 {_pps['skipped']}、失敗 {_pps['failed']}。"
+               + (f" 最近錯誤：{_pp.last_error}" if _pp.last_error else ""))
+    st.caption(f"Schema 版本：{b.schema_version()} / {_PG_MIGRATIONS[-1][0]}")
+    if b.migrate_error:
+        st.error(f"啟動時 schema 遷移失敗（服務仍以現有 schema 運作）：{b.migrate_error}")
+    with st.expander("🔎 熱門查詢計畫（EXPLAIN）"):
+        st.caption("應看到 Index Scan / Bitmap Index Scan；出現 Seq Scan 且資料量已大時，請檢查索引是否建立。")
+        sample = str((st.session_state.get('user') or {}).get('email', '') or 'x@example.com')
+        for label, sql, params in _pg_hot_queries(sample):
+            try:
+                plan = b.explain(sql, params)
+            except Exception as e:
+                plan = [f"EXPLAIN 失敗：{e}"]
+            st.markdown(f"**{label}**")
+            st.code("\n".join(plan), language="text")
+
+def _pg_hot_queries(email):
+    """診斷用：登入/API/列表頁的熱門查詢 (標籤, SQL, 參數)；求職者列表取 query_candidates 實際送出的 SQL。"""
+    ym = datetime.now().strftime('%Y-%m')
+    pm_sql, pm_params, _ = sys.candidates_sql(email, None, ym, ym, ("email", "status"))
+    st_sql, st_params, _ = sys.candidates_sql(None, ("Submitted",), None, None, ("email", "status"))
+    return [
+        ("登入 / API 建檔：users 依 email", "SELECT 1 FROM users WHERE lower(email)=lower(%s)", (email,)),
+        ("API 建檔：resumes 依 email", "SELECT 1 FROM resumes WHERE lower(email)=lower(%s)", (email,)),
+        ("PM 求職者列表：依建立者＋本月(query_candidates)", pm_sql, pm_params),
+        ("表單管理：依狀態(query_candidates)", st_sql, st_params),
+        ("待辦通知：users 依員工編號", "SELECT email FROM users WHERE emp_id=%s", ("0",)),
+        ("到職文件列表", "SELECT id FROM onboarding_docs WHERE email=%s ORDER BY category,slot,id", (email,)),
+    ]
+
 def _render_staff_admin(user):
     """admin：人員管理 — 維護 PM/admin 資料、PM 離職與交接。"""
     st.subheader("👥 人員管理")
-    df_u = load_df("users")
+    df_u = load_df("users", USER_LIST_COLS)
     if df_u.empty:
         st.info("尚無帳號資料"); return
     staff = df_u[df_u['role'].isin(['admin', 'pm'])].copy()
@@ -1998,7 +2938,7 @@ def _render_staff_admin(user):
 
 @st.dialog("確認離職交接")
 def _confirm_resign_dialog(em, nm, suc, suc_label=None):
-    df_u = load_df("users")
+    df_u = load_df("users", USER_LIST_COLS)
     _n = 0
     if not df_u.empty and 'creator_email' in df_u.columns:
         _n = int((df_u['creator_email'].astype(str).str.strip().str.lower() == em.lower()).sum())
@@ -2342,6 +3282,7 @@ def _render_fill(user, my_resume, status, r_type):
                 _z_new = _zodiac_of(dob)
                 _z_old = str(my_resume.get('zodiac', '') or '').strip()
                 sys.save_resume(user['email'], form_data, "Submitted")
+                _pdf_prerender().enqueue(user['email'])
                 hr = user.get('creator', '')
                 if hr and '@' in str(hr): send_email(hr, f"履歷送審: {n_cn}", f"求職者 {n_cn} 已送出履歷，請登入系統審閱。")
                 _todo_notify(user['email'], hr, 'submit', f"履歷待審：{n_cn}")
@@ -2380,7 +3321,7 @@ def _render_confirm(user, my_resume, status):
     st.subheader("🔎 履歷查詢 / 調閱")
     if status in ("Submitted", "Approved", "Returned"):
         try:
-            pdf_bytes = _cached_pdf_bytes(tuple(my_resume.items()))
+            pdf_bytes = _cached_pdf_bytes(*_pdf_key(my_resume))
             st.download_button("📥 下載我的履歷 PDF", pdf_bytes,
                                f"{my_resume.get('name_cn','履歷')}_履歷.pdf", "application/pdf",
                                key="dl_my_pdf")
@@ -2398,8 +3339,7 @@ def _render_confirm(user, my_resume, status):
         st.warning("履歷經人資審核**通過後**才可進行簽名，以確保履歷內容已填寫完成。")
         return
 
-    existing = str(my_resume.get('signature', '')).strip()
-    if existing:
+    if str(my_resume.get('signed_at', '')).strip():   # signed_at 判斷，不必讀簽名影像
         st.success(f"✅ 您已於 {my_resume.get('signed_at','')} 完成簽名。如需重簽，請重新取得驗證碼。")
 
     # 2a. Email 驗證碼閘門
@@ -2447,6 +3387,7 @@ def _render_confirm(user, my_resume, status):
             b64 = _canvas_to_png_b64(img)
             ok, msg = sys.save_signature(email, b64)
             if ok:
+                _pdf_prerender().enqueue(email)
                 st.session_state['sig_verified'] = False
                 # 通知發送邀請的人資 PM/admin：該求職者已完成簽名
                 _hr = str(user.get('creator', '') or '').strip()
@@ -2487,7 +3428,7 @@ def _render_docs(user, my_resume, status):
         if str(my_resume.get('signed_at', '') or '').strip():
             st.caption(f"您已於 {my_resume.get('signed_at')} 完成簽名，以下為含簽名的履歷。")
             try:
-                _pdf = _cached_pdf_bytes(tuple(my_resume.items()))
+                _pdf = _cached_pdf_bytes(*_pdf_key(my_resume))
                 st.download_button("📄 查閱 / 下載簽名履歷", _pdf,
                                    f"{my_resume.get('name_cn','履歷')}_簽名履歷.pdf",
                                    "application/pdf", key="dl_signed_resume")
@@ -2530,20 +3471,29 @@ def _render_docs(user, my_resume, status):
                 elif cc[1].button("調閱", key=f"prep_doc_{d['id']}"):
                     st.session_state[f"want_doc_{d['id']}"] = True; st.rerun()
                 if cc[2].button("刪除", key=f"del_doc_{d['id']}"):
-                    sys.docs_delete(d['id']); _cached_doc.clear()
+                    sys.docs_delete(d['id']); _doc_cache().discard(int(d['id']))
                     st.toast("已刪除", icon="🗑️"); st.rerun()
             if len(existing) < cat_max:
                 up = st.file_uploader(f"新增{cat_label}", type=ALLOWED_DOC_EXT,
                                       key=f"up_{cat_key}", label_visibility="collapsed")
                 if up is not None:
                     data = up.getvalue()
+                    # 上傳前查重(比對本人已上傳文件的 sha256)：同類別擋下；他類別提示(內容只存一份，不佔空間)
+                    _sha = content_sha256(data)
+                    _dup = [d for d in docs if d.get('sha256') == _sha]
                     if len(data) > MAX_DOC_MB * 1024 * 1024:
                         st.error(f"「{up.name}」超過 {MAX_DOC_MB}MB，請壓縮後再上傳。")
-                    elif st.button(f"⬆️ 上傳至「{cat_label}」", key=f"btn_up_{cat_key}"):
-                        slot = max([d['slot'] for d in existing], default=0) + 1
-                        ok, msg = sys.docs_add(email, cat_key, slot, up.name, up.type or "", data)
-                        if ok: st.toast("已上傳", icon="✅"); st.rerun()
-                        else:  st.error(f"上傳失敗：{msg}")
+                    elif any(d['category'] == cat_key for d in _dup):
+                        st.warning(f"「{up.name}」與本類別已上傳的檔案內容相同，無需重複上傳。")
+                    else:
+                        if _dup:
+                            st.caption("ℹ️ 此檔案已上傳於「" + "、".join(
+                                DOC_CAT_LABEL.get(d['category'], d['category']) for d in _dup) + "」，仍可再歸到本類別。")
+                        if st.button(f"⬆️ 上傳至「{cat_label}」", key=f"btn_up_{cat_key}"):
+                            slot = max([d['slot'] for d in existing], default=0) + 1
+                            ok, msg = sys.docs_add(email, cat_key, slot, up.name, up.type or "", data)
+                            if ok: st.toast("已上傳", icon="✅"); st.rerun()
+                            else:  st.error(f"上傳失敗：{msg}")
             else:
                 st.caption("已達上限，如需更換請先刪除。")
 
@@ -2583,12 +3533,8 @@ def _render_docs_admin(user):
     st.subheader("📁 到職文件管理")
     if sys._pg() is None:
         st.error("此功能需 PostgreSQL 後端。"); return
-    df_u = load_df("users"); df_r = load_df("resumes")
-    if df_r.empty: st.info("尚無資料"); return
-    appr = df_r[df_r['status'] == 'Approved'].copy()
-    appr = appr.merge(df_u[['email', 'creator_email', 'name']], on='email', how='left')
-    if user['role'] == 'pm':
-        appr = appr[appr['creator_email'] == user['email']]
+    appr = load_candidates(user['email'] if user['role'] == 'pm' else None, ("Approved",),
+                           columns=RESUME_DOCS_COLS)
     if appr.empty:
         st.info("目前沒有已審查核可的求職者。"); return
 
@@ -2643,11 +3589,8 @@ def candidate_page():
     render_sidebar(user)
     st.header("📝 我的履歷")
 
-    df = load_df("resumes")
-    if df.empty: st.error("DB Error"); return
-    my_df = df[df['email'].astype(str).str.strip().str.lower() == str(user['email']).strip().lower()]
-    if my_df.empty: st.error("無履歷資料"); return
-    my_resume = my_df.iloc[0]
+    my_resume = load_resume(user['email'])
+    if not my_resume: st.error("無履歷資料"); return
     status = my_resume['status']
     r_type = my_resume.get('resume_type', 'HQ')
 
@@ -0,0 +1,239 @@
+"""到職文件內容(bytes)存放層。
+
+PG 的 onboarding_docs 只留中繼資料與 storage_key，檔案本體交給 BlobStore：
+- LocalBlobStore：檔案系統目錄(環境變數 BLOB_DIR)。本機/離線可測；Cloud Run 可把 Cloud Storage bucket
+  以 volume 掛載(gcsfuse)到該目錄，即等同物件儲存，不需另加 SDK。
+- PGBlobStore：未設 BLOB_DIR 時的過渡做法，存獨立的 doc_blobs 表(migration 6)，與中繼資料分離；
+  但仍在同一個 Cloud SQL，容量、備份與 VACUUM 負擔都還在，啟動時記錄警告、資料庫診斷頁也會提示。
+日後改接物件儲存 SDK 只需再實作一個 BlobStore 子類別並在 make_blob_store 選用。
+
+內容定址：storage_key = docs/sha256/<內容雜湊>，同內容只存一份，多列共用；
+新增/刪除以 pg_advisory_xact_lock(hashtext(storage_key)) 序列化(claim_blob / drop_orphan_blobs)，
+最後一筆引用刪除並 commit 後才刪 blob(見 app.py docs_*)。
+
+不依賴 streamlit：app.py 與本檔的搬移指令都直接使用。
+    python blob_store.py migrate-docs [--batch 50] [--limit 0]
+"""
+import abc
+import hashlib
+import logging
+import os
+import re
+import uuid
+
+log = logging.getLogger(__name__)
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_.-]+(/[A-Za-z0-9_.-]+)*$")
+
+
+def content_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_key(sha):
+    """內容雜湊 → storage_key。"""
+    return f"docs/sha256/{sha}"
+
+
+class BlobStore(abc.ABC):
+    """put/get/delete 以 storage_key 定址；get 查無回 None，delete 查無不報錯。
+    cur=呼叫端交易的 cursor：transactional 的實作在該交易內寫入(隨 commit/rollback)，不另借連線；
+    其他實作忽略它、立即生效。"""
+    kind = "base"
+    transactional = False
+
+    @abc.abstractmethod
+    def put(self, key, data, cur=None):
+        ...
+
+    @abc.abstractmethod
+    def get(self, key):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key, cur=None):
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    """root/<storage_key>；先寫暫存檔再 os.replace，讀取端不會看到寫一半的檔案。"""
+    kind = "local"
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        if not _KEY_RE.match(key) or ".." in key.split("/"):
+            raise ValueError(f"不合法的 storage_key：{key!r}")
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key, data, cur=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key, cur=None):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class PGBlobStore(BlobStore):
+    """doc_blobs 表；exec_fn 同 PGBackend.exec(sql, params, fetch)。
+    給 cur 時走呼叫端交易：持有交易連線時再經 exec_fn 借第二條連線，連線池滿載時會互等到逾時。"""
+    kind = "pg"
+    transactional = True
+
+    def __init__(self, exec_fn):
+        self._exec = exec_fn
+
+    def _run(self, cur, sql, params):
+        if cur is not None:
+            cur.execute(sql, params)
+        else:
+            self._exec(sql, params)
+
+    def put(self, key, data, cur=None):
+        self._run(cur, "INSERT INTO doc_blobs (key, data, size) VALUES (%s, %s, %s) ON CONFLICT (key) DO NOTHING",
+                  (key, data, len(data)))
+
+    def get(self, key):
+        r = self._exec("SELECT data FROM doc_blobs WHERE key=%s", (key,), fetch="one")
+        return bytes(r[0]) if r else None
+
+    def delete(self, key, cur=None):
+        self._run(cur, "DELETE FROM doc_blobs WHERE key=%s", (key,))
+
+
+def make_blob_store(exec_fn=None):
+    """BLOB_DIR 有設 → LocalBlobStore(正式環境應如此)；否則有 PG → PGBlobStore(過渡，記錄警告)；都沒有回 None。"""
+    root = os.environ.get("BLOB_DIR", "").strip()
+    if root:
+        return LocalBlobStore(root)
+    if exec_fn is not None:
+        log.warning("BLOB_DIR 未設定：到職文件 bytes 改存 PG doc_blobs 表(過渡做法)，仍佔用 Cloud SQL 容量、備份與 VACUUM；"
+                    "正式環境請以 volume 掛載 Cloud Storage 並設定 BLOB_DIR")
+        return PGBlobStore(exec_fn)
+    return None
+
+
+def lock_keys(cur, keys):
+    """交易內依序取各 storage_key 的 advisory xact lock(排序避免互等)，commit/rollback 自動釋放。"""
+    for k in sorted({k for k in keys if k}):
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (k,))
+
+
+def unreferenced(cur, keys):
+    """keys 中已無任何 onboarding_docs 列引用者。"""
+    keys = sorted({k for k in keys if k})
+    if not keys:
+        return []
+    cur.execute("SELECT k FROM unnest(%s::text[]) AS k WHERE NOT EXISTS "
+                "(SELECT 1 FROM onboarding_docs d WHERE d.storage_key = k)", (keys,))
+    return [r[0] for r in cur.fetchall()]
+
+
+def claim_blob(cur, store, key, data):
+    """新增文件列之前、在同一交易內呼叫：鎖住 key，尚無列引用才寫 blob。回傳是否寫了新 blob。
+    鎖到 commit 才放，drop_orphan_blobs 不會在寫列前把它當孤兒刪掉。"""
+    lock_keys(cur, [key])
+    cur.execute("SELECT 1 FROM onboarding_docs WHERE storage_key=%s LIMIT 1", (key,))
+    if cur.fetchone() is not None:
+        return False
+    store.put(key, data, cur=cur)
+    return True
+
+
+def drop_orphan_blobs(transaction, store, keys):
+    """刪列的交易 commit 之後呼叫：另開一個短交易(transaction 同 PGBackend.transaction)，持鎖重查引用，
+    已無引用的 blob 才刪。PG store 的刪除與重查同一交易；刪列若 rollback 根本不會走到這裡，不會留下指向已刪 blob 的列。
+    這一步失敗只留下無人引用的 blob(佔空間，不影響讀取)。回傳已刪除的 keys。"""
+    keys = sorted({k for k in keys if k})
+    if not keys:
+        return []
+    with transaction() as cur:
+        lock_keys(cur, keys)
+        gone = unreferenced(cur, keys)
+        for k in gone:
+            store.delete(k, cur=cur)
+    return gone
+
+
+def migrate_docs(exec_fn, store, batch=50, limit=0, log=print):
+    """把尚未內容定址的列(data 仍在表內，或 storage_key 為舊式隨機 key)逐批改存 docs/sha256/<雜湊>，
+    補上 sha256 並清空 data。每列在該 key 的 advisory lock 下寫 blob 再以原 storage_key 為條件更新，
+    搬移中被刪掉的列不會留下無人引用的 blob；依 id 遞增續跑，可重複執行、中斷後續跑。回傳已搬移筆數。"""
+    moved, last_id = 0, 0
+    while True:
+        n = batch if not limit else min(batch, limit - moved)
+        if n <= 0:
+            break
+        rows = exec_fn("SELECT id, storage_key, data FROM onboarding_docs "
+                       "WHERE id > %s AND (sha256 = '' OR data IS NOT NULL) ORDER BY id LIMIT %s",
+                       (last_id, n), fetch="all") or []
+        if not rows:
+            break
+        for doc_id, old_key, data in rows:
+            last_id = doc_id
+            data = bytes(data) if data is not None else (store.get(old_key) if old_key else None)
+            if data is None:
+                log(f"id={doc_id} 找不到檔案內容，略過"); continue
+            sha = content_sha256(data)
+            key = content_key(sha)
+            exec_fn("SELECT pg_advisory_lock(hashtext(%s))", (key,))
+            try:
+                store.put(key, data)
+                r = exec_fn("UPDATE onboarding_docs SET storage_key=%s, sha256=%s, size=%s, data=NULL "
+                            "WHERE id=%s AND storage_key=%s RETURNING id",
+                            (key, sha, len(data), doc_id, old_key), fetch="one")
+                if r:
+                    moved += 1
+                if not exec_fn("SELECT 1 FROM onboarding_docs WHERE storage_key=%s LIMIT 1", (key,), fetch="one"):
+                    store.delete(key)
+            finally:
+                exec_fn("SELECT pg_advisory_unlock(hashtext(%s))", (key,))
+            if r and old_key and old_key != key:   # 舊式隨機 key 只有這一列引用
+                store.delete(old_key)
+        log(f"已搬移 {moved} 筆（最後 id={last_id}）")
+    return moved
+
+
+if __name__ == "__main__":
+    import argparse
+    import psycopg2
+    from pg_conn import pg_conn_kwargs
+
+    ap = argparse.ArgumentParser(description="到職文件 bytes 搬出 onboarding_docs.data")
+    ap.add_argument("command", choices=["migrate-docs"])
+    ap.add_argument("--batch", type=int, default=50, help="每批筆數")
+    ap.add_argument("--limit", type=int, default=0, help="最多搬幾筆(0=全部)")
+    args = ap.parse_args()
+
+    conn = psycopg2.connect(**pg_conn_kwargs())
+    conn.autocommit = True
+
+    def _exec(sql, params=(), fetch=None):
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            if fetch == "all": return cur.fetchall()
+            if fetch == "one": return cur.fetchone()
+            return None
+
+    if not _exec("SELECT 1 FROM information_schema.columns "
+                 "WHERE table_name='onboarding_docs' AND column_name='sha256'", fetch="one"):
+        raise SystemExit("onboarding_docs 尚無 sha256 欄：請先啟動主站套用 schema migration 7")
+    store = make_blob_store(_exec)
+    print(f"目的地：{store.kind}" + (f"（{store.root}）" if store.kind == "local" else "（doc_blobs 表）"))
+    total = migrate_docs(_exec, store, batch=args.batch, limit=args.limit)
+    print(f"完成，共搬移 {total} 筆。搬完建議對 onboarding_docs 執行 VACUUM 釋放空間。")
@@ -0,0 +1,65 @@
+"""快取版本號(跨實例失效用)。
+
+Cloud Run 多實例 + lcc-resume-api 共用同一個 DB，只清本機快取會讓其他實例讀到舊資料。
+作法：每表一個版本號，快取 key 帶版本號；寫入時本機遞增並 NOTIFY，各實例背景 LISTEN 收到即遞增該表版本。
+LISTEN 連線正常時快取可長效(1 小時)；斷線期間版本號另加 30 秒時間桶，退回原本 ttl=30 的語意。
+
+不依賴 streamlit：app.py 使用，tests/ 可直接 import。
+"""
+import threading
+import time
+
+CACHE_TABLES = ("users", "resumes", "system_settings")
+
+
+class CacheVersions:
+    """資料版本號(本實例)，三層：
+    表版本 — 該表任一列異動即遞增，整表快取(load_df/load_candidates)依此；
+    全表版本 — 只在未指定 key 的寫入(批次改多列)遞增；
+    列版本 — (表, key) 單列異動遞增。單列快取依「全表版本 + 列版本」，別列存檔不會淘汰它。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._v = {}
+        self._wide = {}
+        self._k = {}
+        self.listening = False
+        self.received = 0
+        self.reconnects = 0
+
+    def bump(self, table=None, key=None):
+        """table=None 代表全部表；key 可為單一字串或清單，None 代表整表。"""
+        keys = [] if key is None else ([key] if isinstance(key, str) else list(key))
+        with self._lock:
+            for t in ([table] if table else set(self._v) | set(CACHE_TABLES)):
+                self._v[t] = self._v.get(t, 0) + 1
+                if not keys:
+                    self._wide[t] = self._wide.get(t, 0) + 1
+                for k in keys:
+                    kk = (t, str(k).strip().lower())
+                    self._k[kk] = self._k.get(kk, 0) + 1
+
+    def _bucket(self, vs):
+        return vs if self.listening else vs + (int(time.time() // 30),)
+
+    def stamp(self, *tables):
+        """整表快取用：各表版本。"""
+        with self._lock:
+            vs = tuple(self._v.get(t, 0) for t in tables)
+        return self._bucket(vs)
+
+    def key_stamp(self, table, key):
+        """單列快取用：(全表版本, 該列版本)。"""
+        with self._lock:
+            vs = (self._wide.get(table, 0), self._k.get((table, str(key).strip().lower()), 0))
+        return self._bucket(vs)
+
+
+def invalidate(versions, backend, table=None, key=None):
+    """寫入後呼叫：本實例立即遞增版本(舊快取不再命中)，再由 backend(PGBackend；Sheets 為 None)NOTIFY 其他實例。
+    table=None 代表全部表；key=None 代表整表(批次改多列)，指定 key 時其他列的單列快取照常命中。"""
+    versions.bump(table, key)
+    if backend is not None:
+        try:
+            backend.notify(table, key)
+        except Exception:
+            pass
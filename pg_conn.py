@@ -0,0 +1,16 @@
+"""PostgreSQL 連線參數(環境變數)。app.py 與 blob_store.py 的搬移指令共用；不依賴 streamlit。"""
+import os
+
+
+def pg_conn_kwargs():
+    user = os.environ.get("PG_USER", "resume_app")
+    password = os.environ.get("PG_PASSWORD", "")
+    dbname = os.environ.get("PG_DB", "resume")
+    conn_name = os.environ.get("PG_CONNECTION_NAME") or os.environ.get("INSTANCE_CONNECTION_NAME")
+    host = os.environ.get("PG_HOST")
+    port = int(os.environ.get("PG_PORT", "5432"))
+    if host:            # 本機：Cloud SQL Auth Proxy(TCP)
+        return dict(host=host, port=port, dbname=dbname, user=user, password=password)
+    if conn_name:       # Cloud Run：unix socket /cloudsql/<connection_name>
+        return dict(host=f"/cloudsql/{conn_name}", dbname=dbname, user=user, password=password)
+    return dict(host="127.0.0.1", port=port, dbname=dbname, user=user, password=password)
@@ -0,0 +1,438 @@
+"""履歷 PDF 產生（ReportLab）。
+
+不依賴 streamlit：app.py 與批次匯出的子程序(spawn)都直接 import 本模組。
+"""
+import io
+import os
+import threading
+import time
+from datetime import datetime, date
+
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib import colors
+from reportlab.pdfgen import canvas
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable, Image as PDFImage
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+from pypdf import PdfReader, PdfWriter
+
+# 星座（依生日自動對應）；每列 = (月, 該星座起始日, 該月開始的星座)
+_ZODIAC = [(1, 20, "水瓶座"), (2, 19, "雙魚座"), (3, 21, "牡羊座"), (4, 20, "金牛座"),
+           (5, 21, "雙子座"), (6, 22, "巨蟹座"), (7, 23, "獅子座"), (8, 23, "處女座"),
+           (9, 23, "天秤座"), (10, 24, "天蠍座"), (11, 22, "射手座"), (12, 22, "摩羯座")]
+
+def _zodiac_of(d):
+    """由生日(date 或 YYYY-MM-DD 字串)推算星座；無法判定回傳空字串。
+    當日 >= 該月星座起始日 → 該月星座；否則 → 前一個月的星座。"""
+    try:
+        if not isinstance(d, (date, datetime)):
+            d = pd.to_datetime(str(d))
+        m, day = int(d.month), int(d.day)
+    except Exception:
+        return ""
+    _, start_day, name = _ZODIAC[m - 1]
+    return name if day >= start_day else _ZODIAC[m - 2][2]
+
+def _lang_summary(data):
+    """語言能力 3 組 → 顯示字串，例：英文(優)、日文(普通)。"""
+    parts = []
+    for i in (1, 2, 3):
+        lg = str(data.get(f'lang_{i}', '') or '').strip()
+        lv = str(data.get(f'lang_{i}_level', '') or '').strip()
+        if lg:
+            parts.append(f"{lg}({lv})" if lv else lg)
+    return "、".join(parts)
+
+PDF_RENDER_VERSION = 4   # generate_pdf 版面改動時 +1，讓所有舊 PDF 快取(含 PG 持久快取)失效
+
+# generate_pdf 實際印出的欄位（依版面區塊）；PDF 快取 key 只雜湊這些欄，
+# hr_comment / docs_* / mgmt_cand_no 等不上 PDF 的欄位變動不會讓 PDF 重建。generate_pdf 新增欄位時要同步補上。
+PDF_RENDERED_FIELDS = (
+    # 標題 / 1. 基本資料
+    "resume_type", "name_cn", "name_en", "interview_unit", "email", "phone", "dob",
+    "marital_status", "blood_type", "address", "emergency_contact", "emergency_phone",
+    "lang_1", "lang_1_level", "lang_2", "lang_2_level", "lang_3", "lang_3_level",
+    "commute_method", "commute_time",
+    # 2. 學歷
+    *(f"edu_{i}_{f}" for i in (1, 2, 3) for f in ("school", "major", "degree", "state", "start", "end")),
+    # 3. 工作經歷
+    *(f"exp_{i}_{f}" for i in (1, 2, 3, 4)
+      for f in ("co", "title", "start", "end", "boss", "phone", "salary", "reason")),
+    # 4. 其他資料
+    "source", "relative_name", "teach_exp", "travel_history", "military_status",
+    "chronic_disease", "family_support", "family_debt",
+    # 5. 分公司排班
+    "branch_region", "branch_location", "accept_rotation", "shift_avail", "holiday_shift",
+    "rotate_shift", "family_support_shift", "care_dependent", "financial_burden",
+    # 6. 專業技能與自傳 / 7. 簽名行
+    "skills", "self_intro", "top3_conditions", "signed_at",
+)
+
+class _PdfEngine:
+    """PDF 引擎：字型註冊(解析數 MB 的 CJK TTF)、色彩、ParagraphStyle/TableStyle、頁首頁尾都與個別履歷無關，
+    每個程序只建一次；generate_pdf 每次只建跟資料有關的 Paragraph/Table。
+    Table/Paragraph 等 flowable 在 build 時會被改寫狀態，不跨文件共用(背景預產與頁面可能同時產生)。"""
+    def __init__(self, font_path='TaipeiSansTCBeta-Regular.ttf', qr_path='qrcode.png'):
+        # ── 字型 ──────────────────────────────────────────────────────
+        self.font_name = font_name = 'Helvetica'
+        try:
+            pdfmetrics.registerFont(TTFont('TaipeiSans', font_path))
+            self.font_name = font_name = 'TaipeiSans'
+        except Exception: pass
+
+        # ── 色彩 ──────────────────────────────────────────────────────
+        self.HDR_BG = HDR_BG = colors.HexColor('#1F3864')   # 深藍 – 區塊標題背景
+        self.LBL_BG = LBL_BG = colors.HexColor('#BDD7EE')   # 淡藍 – 標籤欄背景
+
+        # ── 樣式 ──────────────────────────────────────────────────────
+        self.styleN = ParagraphStyle('Normal', fontName=font_name, fontSize=10, leading=14)
+        self.styleH = ParagraphStyle('Heading1', fontName=font_name, fontSize=16, leading=20, alignment=TA_CENTER)
+        self.styleS = ParagraphStyle('Small',   fontName=font_name, fontSize=9,  leading=13)
+        self.styleC = ParagraphStyle('Cell',    fontName=font_name, fontSize=8,  leading=11)
+        self.styleXS = ParagraphStyle('XS',     fontName=font_name, fontSize=7,  leading=10)
+
+        # ── 深藍色區塊標題列 ──────────────────────────────────────────
+        self.hdr_style = TableStyle([
+            ('BACKGROUND',    (0,0), (-1,-1), HDR_BG),
+            ('TEXTCOLOR',     (0,0), (-1,-1), colors.white),
+            ('FONTNAME',      (0,0), (-1,-1), font_name),
+            ('FONTSIZE',      (0,0), (-1,-1), 10),
+            ('TOPPADDING',    (0,0), (-1,-1), 4),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+            ('LEFTPADDING',   (0,0), (-1,-1), 8),
+            ('RIGHTPADDING',  (0,0), (-1,-1), 8),
+        ])
+
+        # ── 共用標籤欄樣式（4欄表格：col 0, col 2 為標籤）────────────
+        self.lbl_style = TableStyle([
+            ('FONTNAME',      (0,0), (-1,-1), font_name),
+            ('FONTSIZE',      (0,0), (-1,-1), 9),
+            ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND',    (0,0), (0,-1),  LBL_BG),
+            ('BACKGROUND',    (2,0), (2,-1),  LBL_BG),
+            ('ALIGN',         (0,0), (-1,-1), 'LEFT'),
+            ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+            ('TOPPADDING',    (0,0), (-1,-1), 5),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 5),
+            ('LEFTPADDING',   (0,0), (-1,-1), 6),
+        ])
+
+        # ── 學歷 / 工作經歷（首列為表頭）─────────────────────────────
+        def _grid(size):
+            return TableStyle([
+                ('FONTNAME',      (0,0), (-1,-1), font_name),
+                ('FONTSIZE',      (0,0), (-1,-1), size),
+                ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
+                ('BACKGROUND',    (0,0), (-1, 0), LBL_BG),
+                ('ALIGN',         (0,0), (-1,-1), 'LEFT'),
+                ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+                ('TOPPADDING',    (0,0), (-1,-1), 4),
+                ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+            ])
+        self.edu_style = _grid(9)
+        self.exp_style = _grid(8)
+
+        # ── 分公司排班 / 專業技能（2欄，col 0 為標籤）────────────────
+        def _side(valign, pad):
+            return TableStyle([
+                ('FONTNAME',      (0,0), (-1,-1), font_name),
+                ('FONTSIZE',      (0,0), (-1,-1), 9),
+                ('GRID',          (0,0), (-1,-1), 0.5, colors.grey),
+                ('BACKGROUND',    (0,0), (0,-1),  LBL_BG),
+                ('VALIGN',        (0,0), (-1,-1), valign),
+                ('TOPPADDING',    (0,0), (-1,-1), pad),
+                ('BOTTOMPADDING', (0,0), (-1,-1), pad),
+                ('LEFTPADDING',   (0,0), (-1,-1), 6),
+            ])
+        self.br_style = _side('MIDDLE', 4)
+        self.bio_style = _side('TOP', 5)
+
+        # ── QR code 圖檔（讀一次，每份 PDF 以 BytesIO 重用）──────────
+        try:
+            with open(qr_path, "rb") as f:
+                self.qr_png = f.read()
+        except OSError:
+            self.qr_png = None
+
+    def sec_hdr(self, text, width=535):
+        t = Table([[text]], colWidths=[width])
+        t.setStyle(self.hdr_style)
+        return t
+
+    # ── 頁首頁尾 callback（D2）────────────────────────────────────
+    def draw_page(self, c, doc):
+        c.saveState()
+        c.setFont(self.font_name, 7)
+        c.setFillColor(self.HDR_BG)
+        c.drawString(30, A4[1] - 16, "聯成電腦 人才招募系統")   # 不印產出日期：底稿依內容雜湊長期快取，日期會停在首次產生那天
+        c.setStrokeColor(colors.HexColor('#AAAAAA'))
+        c.setLineWidth(0.3)
+        c.line(30, A4[1] - 20, A4[0] - 30, A4[1] - 20)
+        c.line(30, 20, A4[0] - 30, 20)
+        c.setFont(self.font_name, 7)
+        c.setFillColor(colors.HexColor('#888888'))
+        c.drawCentredString(A4[0] / 2, 8, f"第 {doc.page} 頁")
+        c.restoreState()
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+def _engine():
+    """程序內共用的 _PdfEngine(第一次產生 PDF 時建立)。"""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = _PdfEngine()
+    return _ENGINE
+
+def generate_pdf(data):
+    """履歷 PDF 未簽名底稿(印空白簽名欄)；簽名一律由 stamp_signature 疊圖層。"""
+    return _render(data, _engine())
+
+def _render(data, eng):
+    buffer = io.BytesIO()
+    styleN, styleH, styleS, styleC, styleXS = eng.styleN, eng.styleH, eng.styleS, eng.styleC, eng.styleXS
+    sec_hdr, lbl_style = eng.sec_hdr, eng.lbl_style
+
+    title = "聯成電腦面試人員履歷表" if data.get('resume_type') != 'Branch' else "聯成電腦 (分公司) 面試人員履歷表"
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=42, bottomMargin=30)
+    # ── PDF Metadata（D4）─────────────────────────────────────────
+    doc.title = title
+    doc.author = "聯成電腦 人資部"
+    doc.subject = "面試人員履歷表"
+    doc.creator = "聯成電腦人才招募系統"
+    elements = []
+
+    # ── 輔助：把文字包成 Paragraph，長文字自動換行不超出格線 ────────
+    def wp(text):
+        return Paragraph(str(text) if text else '', styleC)
+
+    # ── 標題 ──────────────────────────────────────────────────────
+    elements.append(Paragraph(title, styleH))
+    elements.append(Spacer(1, 8))
+
+    # ── 1. 基本資料（全寬 535pt，無照片欄）──────────────────────
+    elements.append(sec_hdr("▌ 基本資料"))
+    elements.append(Spacer(1, 2))
+
+    p_data = [
+        ["姓　名",   wp(f"{data.get('name_cn','')}  {data.get('name_en','')}"),
+         "面試單位", wp(str(data.get('interview_unit','') or '一般人員'))],
+        ["電子信箱", wp(data.get('email','')),
+         "聯絡電話", wp(data.get('phone',''))],
+        ["出生日期", wp(f"{data.get('dob','')}  {_zodiac_of(data.get('dob',''))}"),
+         "婚姻/血型", wp(f"{data.get('marital_status','')} / {data.get('blood_type','')}")],
+        ["通訊地址", wp(data.get('address','')),
+         "緊急聯絡", wp(f"{data.get('emergency_contact','')} {data.get('emergency_phone','')}")],
+        ["語言能力", wp(_lang_summary(data)),
+         "交通方式", wp(f"{data.get('commute_method','')} 約{data.get('commute_time','')}分")],
+    ]
+    info_tbl = Table(p_data, colWidths=[75, 192, 75, 193])
+    info_tbl.setStyle(lbl_style)
+    elements.append(info_tbl)
+    elements.append(Spacer(1, 8))
+
+    # ── 2. 學歷 ───────────────────────────────────────────────────
+    elements.append(sec_hdr("▌ 學歷"))
+    edu_data = [["起訖年月", "學校名稱", "科系", "學位", "狀態"]]
+    for i in range(1, 4):
+        s = data.get(f'edu_{i}_school', '')
+        if not s: continue
+        s_date = f"{data.get(f'edu_{i}_start','')} ~ {data.get(f'edu_{i}_end','')}"
+        edu_data.append([wp(s_date), wp(s), wp(data.get(f'edu_{i}_major','')),
+                         wp(data.get(f'edu_{i}_degree','')), wp(data.get(f'edu_{i}_state',''))])
+    t2 = Table(edu_data, colWidths=[100, 155, 130, 80, 70])
+    t2.setStyle(eng.edu_style)
+    elements.append(Spacer(1, 2))
+    elements.append(t2)
+    elements.append(Spacer(1, 8))
+
+    # ── 3. 工作經歷 ───────────────────────────────────────────────
+    elements.append(sec_hdr("▌ 工作經歷"))
+    def wpx(text):
+        return Paragraph(str(text) if text else '', styleXS)
+    exp_data = [["起訖年月", "公司名稱", "職稱", "主管/電話", "薪資", "離職原因"]]
+    for i in range(1, 5):
+        co = data.get(f'exp_{i}_co', '')
+        if not co: continue
+        s_date = f"{data.get(f'exp_{i}_start','')} ~ {data.get(f'exp_{i}_end','')}"
+        boss = f"{data.get(f'exp_{i}_boss','')} {data.get(f'exp_{i}_phone','')}"
+        exp_data.append([wpx(s_date), wpx(co), wpx(data.get(f'exp_{i}_title','')),
+                         wpx(boss), wpx(data.get(f'exp_{i}_salary','')),
+                         wpx(data.get(f'exp_{i}_reason',''))])
+    t3 = Table(exp_data, colWidths=[80, 100, 70, 110, 55, 120])
+    t3.setStyle(eng.exp_style)
+    elements.append(Spacer(1, 2))
+    elements.append(t3)
+    elements.append(Spacer(1, 8))
+
+    # ── 4. 其他資料 ───────────────────────────────────────────────
+    elements.append(sec_hdr("▌ 其他資料"))
+    other_data = [
+        ["應徵管道", wp(data.get('source','')),         "任職親友", wp(data.get('relative_name',''))],
+        ["補教經驗", wp(data.get('teach_exp','')),       "出國史",   wp(data.get('travel_history',''))],
+        ["兵　　役", wp(data.get('military_status','')), "慢性病",   wp(data.get('chronic_disease',''))],
+        ["獨力扶養", wp(data.get('family_support','')),  "獨力負擔", wp(data.get('family_debt',''))],
+    ]
+    t4 = Table(other_data, colWidths=[65, 202, 65, 203])
+    t4.setStyle(lbl_style)
+    elements.append(Spacer(1, 2))
+    elements.append(t4)
+    elements.append(Spacer(1, 8))
+
+    # ── 5. 分公司排班（Branch 限定）──────────────────────────────
+    if data.get('resume_type') == 'Branch':
+        elements.append(sec_hdr("▌ 分公司排班意願調查"))
+        br_data = [
+            ["希望區域",             data.get('branch_region','')],
+            ["希望分校",             data.get('branch_location','')],
+            ["配合輪調",             data.get('accept_rotation','')],
+            ["配合輪班",             data.get('shift_avail','')],
+            ["國定假日輪值",         data.get('holiday_shift','')],
+            ["早晚輪班(9-18/14-22)", data.get('rotate_shift','')],
+            ["家人同意輪班",         data.get('family_support_shift','')],
+            ["經濟/扶養需求",        f"扶養: {data.get('care_dependent','')} / 負擔: {data.get('financial_burden','')}"],
+        ]
+        t5 = Table(br_data, colWidths=[150, 385])
+        t5.setStyle(eng.br_style)
+        elements.append(Spacer(1, 2))
+        elements.append(t5)
+        elements.append(Spacer(1, 8))
+
+    # ── 6. 專業技能與自傳 ─────────────────────────────────────────
+    elements.append(sec_hdr("▌ 專業技能與自傳"))
+    bio_data = [
+        ["專業技能", Paragraph(str(data.get('skills','')),    styleS)],
+        ["成就特質", Paragraph(str(data.get('self_intro','')), styleS)],
+        ["條件優勢", Paragraph(str(data.get('top3_conditions','')), styleS)],
+    ]
+    t6 = Table(bio_data, colWidths=[65, 470])
+    t6.setStyle(eng.bio_style)
+    elements.append(Spacer(1, 2))
+    elements.append(t6)
+    elements.append(Spacer(1, 16))
+
+    # ── 7. 簽名行 ─────────────────────────────────────────────────
+    elements.append(Paragraph("─" * 60, styleN))
+    elements.append(Spacer(1, 6))
+    elements.append(Paragraph("本人所填資料均屬事實，若有不實，願接受免職處分。", styleN))
+    # 底稿一律印空白簽名欄並保留固定大小的簽名區(錨點記在 PDF 內)，簽名由 stamp_signature 疊上
+    elements.append(Spacer(1, 4))
+    elements.append(_SignatureSlot(eng))
+
+    if eng.qr_png:
+        elements.append(Spacer(1, 10))
+        elements.append(PDFImage(io.BytesIO(eng.qr_png), width=60, height=60))
+
+    doc.build(elements, onFirstPage=eng.draw_page, onLaterPages=eng.draw_page)
+    buffer.seek(0)
+    return buffer
+
+# ── 簽名圖層 ──────────────────────────────────────────────────────
+# 簽名不重排整份履歷：底稿(未簽名)的簽名區以書籤(大綱項目「簽名欄」→ 目的地 SIG_ANCHOR)記下頁碼與左上角座標，
+# 簽名時另畫一頁只有簽名的圖層(白底蓋掉空白簽名欄 + 簽名圖 + 簽署日期)，用 pypdf 疊到該頁。
+# 重簽只換圖層，底稿沿用快取。
+SIG_ANCHOR = "signature_slot"
+SIG_OUTLINE_TITLE = "簽名欄"
+SIG_SLOT_W, SIG_SLOT_H = 535, 92
+_BLANK_SIGN = "應徵人員親簽：＿＿＿＿＿＿＿＿＿　日期：　　　年　　月　　日"
+
+class _SignatureSlot(Flowable):
+    """固定大小的簽名區：畫空白簽名欄，並在區塊左上角記錄書籤(錨點)。"""
+    def __init__(self, eng):
+        super().__init__()
+        self.eng = eng
+        self.width, self.height = SIG_SLOT_W, SIG_SLOT_H
+
+    def wrap(self, aw, ah):
+        return self.width, self.height
+
+    def draw(self):
+        c = self.canv
+        c.setFont(self.eng.font_name, 10)
+        c.drawString(0, self.height - 12, _BLANK_SIGN)
+        left, top = c.absolutePosition(0, self.height)
+        c.bookmarkPage(SIG_ANCHOR, fit="XYZ", left=left, top=top)
+        # ReportLab 只輸出有被引用的目的地：以公開 API 掛一個大綱項目引用它，pypdf 由大綱讀回
+        c.addOutlineEntry(SIG_OUTLINE_TITLE, SIG_ANCHOR, level=0)
+
+def _find_sig_anchor(reader):
+    """底稿中的簽名錨點 Destination；找大綱項目，舊底稿(具名目的地 /Dests)也認得。查無回 None。"""
+    def _walk(items):
+        for it in items:
+            if isinstance(it, list):
+                hit = _walk(it)
+                if hit is not None: return hit
+            elif getattr(it, "title", None) == SIG_OUTLINE_TITLE:
+                return it
+        return None
+    dest = _walk(reader.outline)
+    if dest is None:
+        dests = reader.named_destinations   # /Dests 字典的 key 以 PDF name 形式("/signature_slot")回傳
+        dest = dests.get(SIG_ANCHOR) or dests.get("/" + SIG_ANCHOR)
+    return dest
+
+def stamp_signature(base_pdf, signature, signed_at=""):
+    """底稿 PDF bytes + 簽名 PNG bytes → 已簽名 PDF bytes(只疊圖層，不重排版)。"""
+    reader = PdfReader(io.BytesIO(base_pdf))
+    dest = _find_sig_anchor(reader)
+    if dest is None:
+        raise ValueError("底稿 PDF 沒有簽名錨點")
+    page_no = reader.get_destination_page_number(dest)
+    left, top = float(dest.left), float(dest.top)
+    page = reader.pages[page_no]
+    eng = _engine()
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=(float(page.mediabox.width), float(page.mediabox.height)))
+    c.setFillColor(colors.white)
+    c.rect(left, top - SIG_SLOT_H, SIG_SLOT_W, SIG_SLOT_H, stroke=0, fill=1)
+    c.setFillColor(colors.black)
+    c.setFont(eng.font_name, 10)
+    c.drawString(left, top - 12, "應徵人員親簽：")
+    c.drawImage(ImageReader(io.BytesIO(signature)), left, top - 78, width=160, height=60, mask='auto')
+    c.drawString(left, top - SIG_SLOT_H + 2, f"簽署日期：{signed_at}")
+    c.save()
+
+    writer = PdfWriter(clone_from=reader)
+    writer.pages[page_no].merge_page(PdfReader(io.BytesIO(buf.getvalue())).pages[0])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def render_pdf_file(data, path):
+    """批次匯出子程序用：產生未簽名底稿直接寫檔(不經主程序記憶體)，回傳檔案大小。"""
+    buf = generate_pdf(data)
+    with open(path, "wb") as f:
+        f.write(buf.getbuffer())
+    return os.path.getsize(path)
+
+
+def _bench_sample():
+    """基準測試用的完整履歷(每個上版欄位都有值、分公司版面，最長的情況)。"""
+    data = {k: f"測試{k}" for k in PDF_RENDERED_FIELDS}
+    data.update(resume_type="Branch", dob="1990-05-20", email="bench@example.com", signed_at="")
+    data["self_intro"] = "自傳內容。" * 200
+    return data
+
+
+if __name__ == "__main__":
+    # 基準測試：python resume_pdf.py [份數]
+    # cold = 每份都重建引擎(等同舊版每次重新註冊字型/建樣式)；warm = 共用已建好的引擎
+    import sys
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    sample = _bench_sample()
+    t0 = time.perf_counter()
+    _engine()
+    print(f"引擎初始化（一次）：{(time.perf_counter() - t0) * 1000:.1f} ms")
+    for label, make in (("cold", _PdfEngine), ("warm", _engine)):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            _render(sample, make())
+        print(f"{label}: {n} 份，平均 {(time.perf_counter() - t0) * 1000 / n:.1f} ms/份")
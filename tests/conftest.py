@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 專案根目錄的模組(cache_versions.py、blob_store.py)不是套件，直接加入 import 路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+
+import pytest
+
+from blob_store import (LocalBlobStore, PGBlobStore, claim_blob, content_key, content_sha256,
+                        drop_orphan_blobs)
+
+
+class _FakeDB:
+    """只認 blob_store 用到的幾句 SQL：onboarding_docs 的 storage_key 引用與 advisory lock。"""
+    def __init__(self):
+        self.refs = []          # onboarding_docs 各列的 storage_key
+        self.locked = []
+        self.transactions = 0
+        self.statements = []
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield _FakeCursor(self)
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.db.statements.append(sql)
+        if "pg_advisory_xact_lock" in sql:
+            self.db.locked.append(params[0]); self._rows = []
+        elif "unnest" in sql:
+            self._rows = [(k,) for k in params[0] if k not in self.db.refs]
+        elif sql.startswith("SELECT 1 FROM onboarding_docs"):
+            self._rows = [(1,)] if params[0] in self.db.refs else []
+        else:
+            self._rows = []
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalBlobStore(str(tmp_path))
+
+
+def _add(db, store, data):
+    key = content_key(content_sha256(data))
+    with db.transaction() as cur:
+        wrote = claim_blob(cur, store, key, data)
+        db.refs.append(key)   # 等同 INSERT onboarding_docs
+    return key, wrote
+
+
+def test_shared_blob_survives_until_last_reference_is_deleted(store):
+    db = _FakeDB()
+    key, wrote1 = _add(db, store, b"same file")
+    _, wrote2 = _add(db, store, b"same file")
+    assert (wrote1, wrote2) == (True, False)
+
+    db.refs.remove(key)   # 刪第一列並 commit
+    assert drop_orphan_blobs(db.transaction, store, [key]) == []
+    assert store.get(key) == b"same file"
+
+    db.refs.remove(key)   # 刪最後一列
+    assert drop_orphan_blobs(db.transaction, store, [key]) == [key]
+    assert store.get(key) is None
+
+
+def test_orphan_check_runs_in_its_own_locked_transaction(store):
+    db = _FakeDB()
+    key, _ = _add(db, store, b"doc")
+    db.refs.clear()
+    before = db.transactions
+    drop_orphan_blobs(db.transaction, store, [key, None, key])
+    assert db.transactions == before + 1
+    assert db.locked[-1] == key
+
+
+def test_pg_store_writes_through_the_callers_cursor():
+    def _exec(*a, **k):
+        raise AssertionError("不應另借連線")
+
+    db = _FakeDB()
+    store = PGBlobStore(_exec)
+    key = content_key(content_sha256(b"doc"))
+    with db.transaction() as cur:
+        assert claim_blob(cur, store, key, b"doc")
+    db.statements.clear()
+    drop_orphan_blobs(db.transaction, store, [key])
+    assert any(s.startswith("DELETE FROM doc_blobs") for s in db.statements)
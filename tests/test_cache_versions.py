@@ -0,0 +1,52 @@
+from cache_versions import CacheVersions, invalidate
+
+
+class _Backend:
+    def __init__(self):
+        self.notified = []
+
+    def notify(self, table=None, key=None):
+        self.notified.append((table, key))
+
+
+def _versions():
+    v = CacheVersions()
+    v.listening = True   # 不加 30 秒時間桶，版本比較才穩定
+    return v
+
+
+def test_keyed_write_leaves_other_keys_cached():
+    v, b = _versions(), _Backend()
+    mine, other = v.key_stamp("resumes", "a@x.com"), v.key_stamp("resumes", "b@x.com")
+    table = v.stamp("resumes")
+    invalidate(v, b, "resumes", "A@x.com")
+    assert v.key_stamp("resumes", "b@x.com") == other
+    assert v.key_stamp("resumes", "a@x.com") != mine
+    assert v.stamp("resumes") != table
+    assert b.notified == [("resumes", "A@x.com")]
+
+
+def test_keyed_write_leaves_other_tables_alone():
+    v = _versions()
+    users, row = v.stamp("users"), v.key_stamp("users", "a@x.com")
+    invalidate(v, None, "resumes", "a@x.com")
+    assert v.stamp("users") == users
+    assert v.key_stamp("users", "a@x.com") == row
+
+
+def test_table_wide_write_drops_every_key():
+    v = _versions()
+    row = v.key_stamp("resumes", "b@x.com")
+    invalidate(v, None, "resumes")
+    assert v.key_stamp("resumes", "b@x.com") != row
+
+
+def test_notify_failure_still_bumps_locally():
+    class _Down:
+        def notify(self, table=None, key=None):
+            raise OSError("connection lost")
+
+    v = _versions()
+    row = v.key_stamp("users", "a@x.com")
+    invalidate(v, _Down(), "users", ["a@x.com", "b@x.com"])
+    assert v.key_stamp("users", "a@x.com") != row
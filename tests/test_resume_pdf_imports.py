@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_resume_pdf_does_not_load_streamlit_or_app():
+    """批次匯出的 spawn 子程序只 import resume_pdf：整條 import 鏈不可載入 streamlit 或 app。"""
+    pytest.importorskip("reportlab")
+    pytest.importorskip("pypdf")
+    code = ("import sys, resume_pdf; "
+            "print(','.join(m for m in ('streamlit', 'app') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""